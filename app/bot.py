@@ -1,7 +1,11 @@
 # app/bot.py
+import asyncio
 import logging
-import httpx
+from collections import OrderedDict
+from typing import Hashable, Optional
+
 from aiogram import Bot, Dispatcher, Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import (
     Message,
@@ -16,7 +20,9 @@ from fastapi import FastAPI, Request
 from starlette.responses import Response
 
 from .config import settings
-from .snapshot import render_depth_png
+from .render_pool import PoolSaturated
+from .snapshot import FORMATS as SNAPSHOT_FORMATS
+from .snapshot_service import depth_snapshot
 from .depth_hub import hub as depth_hub
 from .trade_hub import trade_hub  # mevcutsa sorun olmaz
 
@@ -117,6 +123,14 @@ def snapshot_keyboard(symbol: str) -> InlineKeyboardMarkup:
                 InlineKeyboardButton(
                     text="🧪 Mobil (x3)", callback_data=f"snap|{sym}|mobile|3"
                 ),
+                InlineKeyboardButton(
+                    text="⚡ Hızlı", callback_data=f"snap|{sym}|mobile|1|jpeg|n"
+                ),
+            ],
+            [
+                InlineKeyboardButton(
+                    text="🖼️ PNG (kayıpsız)", callback_data=f"snap|{sym}|wide|2|png"
+                ),
             ],
         ]
     )
@@ -147,29 +161,77 @@ def _clean_symbol(txt: str) -> str:
     return s
 
 
+# -------------------- Snapshot gönderimi -------------------- #
+
+# snapshot key (veri sürümü + çıktı parametreleri) -> Telegram file_id (LRU)
+_photo_ids: "OrderedDict[Hashable, str]" = OrderedDict()
+
+
+async def _send_snapshot(
+    chat_id: int,
+    sym: str,
+    size: str = "mobile",
+    scale: int = 2,
+    fmt: Optional[str] = None,
+    native: bool = False,
+    caption: str = "",
+) -> bool:
+    """
+    Snapshot'ı süreç içinde üretir (cache + render havuzu) ve gönderir. Aynı
+    key daha önce yüklendiyse bayt yerine Telegram'ın file_id'si gönderilir.
+    Görüntü üretilemezse False.
+    """
+    fmt = fmt or settings.SNAPSHOT_BOT_FORMAT
+    if fmt not in SNAPSHOT_FORMATS:
+        fmt = "png"
+    try:
+        key, img = await depth_snapshot(sym, size=size, scale=scale, fmt=fmt, native=native)
+    except (PoolSaturated, asyncio.TimeoutError):
+        return False
+
+    file_id = _photo_ids.get(key)
+    if file_id is not None:
+        try:
+            await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption)
+            _photo_ids.move_to_end(key)
+            return True
+        except TelegramBadRequest:
+            # file_id geçersiz (ör. bot token değişti): yeniden yükle
+            _photo_ids.pop(key, None)
+
+    ext = SNAPSHOT_FORMATS[fmt][2]
+    file = BufferedInputFile(img.body, filename=f"{sym}_{size}.{ext}")
+    sent = await bot.send_photo(chat_id=chat_id, photo=file, caption=caption)
+    if sent.photo:
+        _photo_ids[key] = sent.photo[-1].file_id  # en büyük boyut
+        while len(_photo_ids) > settings.SNAPSHOT_FILE_ID_CACHE:
+            _photo_ids.popitem(last=False)
+    return True
+
+
 # -------------------- Snapshot callback -------------------- #
 
 
 @dp.callback_query(F.data.startswith("snap|"))
 async def on_snap(cq: CallbackQuery):
     try:
-        _, sym, size, scale = (cq.data or "").split("|", 3)
+        # snap|SYM|size|scale[|fmt[|n]]  (n = native, supersampling yok)
+        parts = (cq.data or "").split("|")
+        sym, size, scale = parts[1:4]
+        fmt = parts[4] if len(parts) > 4 else None
+        native = len(parts) > 5 and parts[5] == "n"
         await cq.answer("Hazırlanıyor…")
-
-        # API üzerinden PNG (stateless, pratik)
-        api = settings.API_BASE.rstrip("/")
-        url = (
-            f"{api}/api/snapshot/depth.png?symbol={sym}&size={size}&scale={int(scale)}"
+        ok = await _send_snapshot(
+            cq.message.chat.id,
+            sym,
+            size=size,
+            scale=int(scale),
+            fmt=fmt,
+            native=native,
+            caption=f"{sym} • {size} snapshot",
         )
-        async with httpx.AsyncClient(timeout=20.0) as cli:
-            r = await cli.get(url)
-        if r.status_code != 200 or not r.content:
+        if not ok:
             await cq.answer("Snapshot alınamadı.", show_alert=True)
-            return
-        file = BufferedInputFile(r.content, filename=f"{sym}_{size}.png")
-        await bot.send_photo(
-            chat_id=cq.message.chat.id, photo=file, caption=f"{sym} • {size} snapshot"
-        )
     except Exception as e:
         log.exception("snapshot error: %s", e)
         await cq.answer("Snapshot alınamadı, lütfen tekrar deneyin.", show_alert=True)
@@ -275,17 +337,13 @@ async def cmd_snapshot_free(message: Message):
             "Hangi sembol için? Örnek: `ASTOR snapshot al`", parse_mode="Markdown"
         )
         return
-    # Basit geniş PNG:
-    api = settings.API_BASE.rstrip("/")
-    url = f"{api}/api/snapshot/depth.png?symbol={sym}&size=wide&scale=2"
+    # Basit geniş görüntü:
     try:
-        async with httpx.AsyncClient(timeout=20.0) as cli:
-            r = await cli.get(url)
-        if r.status_code != 200 or not r.content:
+        ok = await _send_snapshot(
+            message.chat.id, sym, size="wide", scale=2, caption=f"{sym} • snapshot"
+        )
+        if not ok:
             await message.answer("Snapshot alınamadı, tekrar dener misin?")
-            return
-        photo = BufferedInputFile(r.content, filename=f"{sym}_snapshot.png")
-        await message.answer_photo(photo, caption=f"{sym} • snapshot")
     except Exception:
         await message.answer("Snapshot sırasında bir hata oldu.")
 
@@ -0,0 +1,119 @@
+# app/broadcast.py
+# -*- coding: utf-8 -*-
+"""
+Tek kodla, çok gönder: aynı mesajı çok sayıda WebSocket istemcisine yayın.
+
+Mesaj her wire formatı için bir kez kodlanır (JSON metni / ikili çerçeve)
+ve aynı çerçeve her istemcinin kendi outbox'ına bırakılır; istemci başına
+serileştirme yapılmaz. Gönderimi istemcinin kendi yazıcı görevi (pump)
+yapar, yavaş istemci diğerlerini bekletmez. Aynı anahtarlı bekleyen
+çerçeve en yenisiyle değiştirilir; kuyruk taşarsa ``resync()`` (tam durum)
+bekleyenlerin yerini alır.
+Mesaj başına kodlama süresi ``stats()`` ile izlenir.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from starlette.websockets import WebSocket
+
+from . import wire
+from .client_channel import ConflatingOutbox, pump, summarize
+
+log = logging.getLogger("broadcast")
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        name: str,
+        queue_size: int = 8,
+        resync: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.name = name
+        self._queue_size = queue_size
+        self._resync = resync
+        # ws -> (format, outbox, yazıcı görev)
+        self._clients: Dict[WebSocket, Tuple[str, ConflatingOutbox, asyncio.Task]] = {}
+        self._messages = 0
+        self._dropped = 0
+        self._conflated = 0
+        self._slow = 0
+        self._encode_ns_total = 0
+        self._encode_ns_last = 0
+        self._encode_ns_max = 0
+
+    def add(self, ws: WebSocket, fmt: str = wire.JSON) -> None:
+        ob = ConflatingOutbox(self._queue_size, resync=self._resync)
+        task = asyncio.create_task(self._writer(ws, ob, fmt))
+        self._clients[ws] = (fmt, ob, task)
+
+    async def _writer(self, ws: WebSocket, ob: ConflatingOutbox, fmt: str) -> None:
+        if await pump(ws, ob, fmt) == "slow":
+            self._slow += 1
+
+    def discard(self, ws: WebSocket) -> None:
+        entry = self._clients.pop(ws, None)
+        if entry is None:
+            return
+        _, ob, task = entry
+        task.cancel()
+        self._dropped += ob.dropped
+        self._conflated += ob.conflated
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def send_to(self, ws: WebSocket, message: Any, key: Optional[Hashable] = None) -> None:
+        """Tek istemciye (ör. ilk snapshot); yayınlarla aynı sırada gider."""
+        entry = self._clients.get(ws)
+        if entry is not None:
+            entry[1].offer(message, key)
+
+    def replace(self, ws: WebSocket, message: Any) -> None:
+        """İstemcinin bekleyenlerini atıp yalnızca ``message``'ı bırakır."""
+        entry = self._clients.get(ws)
+        if entry is not None:
+            entry[1].replace(message)
+
+    def backlog(self) -> int:
+        """En yavaş istemcinin bekleyen mesaj sayısı."""
+        return max((ob.qsize() for _, ob, _ in self._clients.values()), default=0)
+
+    def broadcast(self, message: Any, key: Optional[Hashable] = None) -> int:
+        """Mesajı tüm istemcilerin outbox'ına bırakır; istemci sayısını döner."""
+        if not self._clients:
+            return 0
+        t0 = time.perf_counter_ns()
+        frames: Dict[str, Union[str, bytes]] = {}
+        for fmt, _, _ in self._clients.values():
+            if fmt not in frames:
+                frames[fmt] = wire.encode(message, fmt)
+        dt = time.perf_counter_ns() - t0
+        self._messages += 1
+        self._encode_ns_total += dt
+        self._encode_ns_last = dt
+        if dt > self._encode_ns_max:
+            self._encode_ns_max = dt
+
+        for fmt, ob, _ in self._clients.values():
+            ob.offer(frames[fmt], key)
+        return len(self._clients)
+
+    def stats(self) -> Dict[str, Any]:
+        n = self._messages
+        live = [ob for _, ob, _ in self._clients.values()]
+        return {
+            "clients": len(live),
+            "messages": n,
+            "dropped": self._dropped + sum(ob.dropped for ob in live),
+            "conflated": self._conflated + sum(ob.conflated for ob in live),
+            "slow_disconnects": self._slow,
+            "queues": summarize(live),
+            "encode_us_avg": round(self._encode_ns_total / n / 1000, 2) if n else None,
+            "encode_us_last": round(self._encode_ns_last / 1000, 2),
+            "encode_us_max": round(self._encode_ns_max / 1000, 2),
+        }
@@ -0,0 +1,216 @@
+# app/client_channel.py
+# -*- coding: utf-8 -*-
+"""
+İstemci bağlantısı başına sınırlı giden kuyruk (outbox) ve yazıcı görev.
+
+Yayıncı (feed / broadcaster) ``offer()`` ile senkron olarak yazar ve asla
+beklemez; her bağlantının kendi ``pump()`` görevi kuyruğu kendi hızında
+boşaltır. Yavaş istemci yalnızca kendi kuyruğunu etkiler:
+
+  ConflatingOutbox : depth / quote / heatmap. Aynı anahtarlı bekleyen
+                     mesaj en sonuncusuyla değiştirilir (ya da ``merge``
+                     ile birleştirilir); sınır aşılırsa bekleyenler atılıp
+                     ``resync()`` (tam durum) konur.
+  OrderedOutbox    : trade. Sırayla, kayıpsız teslim; kuyruk ``grace``
+                     süresince sınırın üstünde kalırsa (ya da 4 katını
+                     aşarsa) istemci SlowConsumer ile kapatılır.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from . import wire
+
+log = logging.getLogger("client_channel")
+
+# RFC 6455: 1013 Try Again Later
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class SlowConsumer(Exception):
+    """İstemci kuyruğu sınırın üstünde kaldı."""
+
+
+class Outbox:
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, limit)
+        self._wake = asyncio.Event()
+        self.dropped = 0
+        self.conflated = 0
+        self.high_water = 0
+        self.overflow = False
+
+    # ---- yazıcı tarafı (alt sınıflar) ----
+    def offer(self, msg: Any, key: Optional[Hashable] = None) -> None:
+        raise NotImplementedError
+
+    def replace(self, msg: Any) -> None:
+        """Bekleyenleri atıp yalnızca ``msg``'i bırakır (tam durum)."""
+        raise NotImplementedError
+
+    def qsize(self) -> int:
+        raise NotImplementedError
+
+    def _pop(self) -> Any:
+        raise NotImplementedError
+
+    def _pushed(self) -> None:
+        n = self.qsize()
+        if n > self.high_water:
+            self.high_water = n
+        self._wake.set()
+
+    # ---- okuyucu tarafı ----
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    async def get(self) -> Any:
+        while True:
+            if self.overflow:
+                raise SlowConsumer()
+            if self.qsize():
+                return self._pop()
+            self._wake.clear()
+            await self._wake.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.qsize(),
+            "high_water": self.high_water,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+        }
+
+
+class ConflatingOutbox(Outbox):
+    def __init__(
+        self,
+        limit: int,
+        key: Optional[Callable[[Any], Optional[Hashable]]] = None,
+        merge: Optional[Callable[[Any, Any], Any]] = None,
+        resync: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        super().__init__(limit)
+        self._key = key
+        self._merge = merge
+        self._resync = resync
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._seq = itertools.count()
+
+    def qsize(self) -> int:
+        return len(self._pending)
+
+    def offer(self, msg: Any, key: Optional[Hashable] = None) -> None:
+        if key is None and self._key is not None:
+            key = self._key(msg)
+        pending = self._pending
+        if key is not None and key in pending:
+            old = pending[key]
+            pending[key] = self._merge(old, msg) if self._merge else msg
+            self.conflated += 1
+            self._wake.set()
+            return
+        if len(pending) >= self.limit:
+            full = self._resync() if self._resync else None
+            if full is not None:
+                self.dropped += len(pending)
+                self.replace(full)
+                return
+            pending.popitem(last=False)
+            self.dropped += 1
+        pending[key if key is not None else ("_", next(self._seq))] = msg
+        self._pushed()
+
+    def replace(self, msg: Any) -> None:
+        self._pending.clear()
+        if msg is not None:
+            self._pending[("_", next(self._seq))] = msg
+        self._pushed()
+
+    def _pop(self) -> Any:
+        return self._pending.popitem(last=False)[1]
+
+
+class OrderedOutbox(Outbox):
+    def __init__(self, limit: int, grace: float = 5.0) -> None:
+        super().__init__(limit)
+        self.grace = grace
+        self._q: deque = deque()
+        self._over_since = 0.0
+
+    def qsize(self) -> int:
+        return len(self._q)
+
+    def offer(self, msg: Any, key: Optional[Hashable] = None) -> None:
+        if self.overflow:
+            self.dropped += 1
+            return
+        q = self._q
+        q.append(msg)
+        n = len(q)
+        if n > self.limit:
+            now = time.monotonic()
+            if not self._over_since:
+                self._over_since = now
+            elif now - self._over_since >= self.grace or n > 4 * self.limit:
+                # sıra/kayıpsızlık korunamıyor: istemci kapatılacak
+                self.overflow = True
+                self.dropped += n
+                q.clear()
+        elif self._over_since:
+            self._over_since = 0.0
+        self._pushed()
+
+    def replace(self, msg: Any) -> None:
+        self._q.clear()
+        self._over_since = 0.0
+        if msg is not None:
+            self._q.append(msg)
+        self._pushed()
+
+    def _pop(self) -> Any:
+        msg = self._q.popleft()
+        if self._over_since and len(self._q) <= self.limit:
+            self._over_since = 0.0
+        return msg
+
+
+async def pump(ws: WebSocket, outbox: Outbox, fmt: str = wire.JSON) -> str:
+    """
+    Outbox'ı istemciye yazar. Dönüş: kapanma nedeni
+    ("closed" / "slow" / "error").
+    """
+    try:
+        while True:
+            msg = await outbox.get()
+            await wire.send_frame(ws, wire.encode(msg, fmt))
+    except SlowConsumer:
+        try:
+            await ws.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+        return "slow"
+    except (WebSocketDisconnect, RuntimeError):
+        return "closed"
+    except Exception:
+        log.exception("client writer failed")
+        return "error"
+
+
+def summarize(outboxes: Iterable[Outbox]) -> Dict[str, Any]:
+    """Bir grup outbox için kuyruk derinliği özeti."""
+    n = pending = peak = 0
+    for ob in outboxes:
+        n += 1
+        q = ob.qsize()
+        pending += q
+        if q > peak:
+            peak = q
+    return {"clients": n, "pending": pending, "pending_max": peak}
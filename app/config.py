@@ -26,6 +26,48 @@ class Settings:
     JWT_REFRESH_INTERVAL_SEC = int(os.getenv("JWT_REFRESH_INTERVAL_SEC", "260"))
     MARKET_CONNECT_TEMPLATE_B64 = os.getenv("MARKET_CONNECT_TEMPLATE_B64", "")
     TRADE_CONNECT_TEMPLATE_B64 = os.getenv("TRADE_CONNECT_TEMPLATE_B64", "")
+    # Upstream havuzu: bağlantı başına en fazla konu ve dengeleme periyodu
+    UPSTREAM_MAX_TOPICS_PER_CONN = int(os.getenv("UPSTREAM_MAX_TOPICS_PER_CONN", "50"))
+    UPSTREAM_REBALANCE_SEC = float(os.getenv("UPSTREAM_REBALANCE_SEC", "30"))
+    # Sürekli açık veri alımı: izleyici olmasa da hub'ları sıcak tutulan semboller
+    INGEST_WATCHLIST = tuple(
+        s.strip().upper() for s in os.getenv("INGEST_WATCHLIST", "").split(",") if s.strip()
+    )
+    INGEST_FEEDS = tuple(
+        s.strip().lower()
+        for s in os.getenv("INGEST_FEEDS", "depth,trade,market").split(",")
+        if s.strip()
+    )
+    INGEST_PROMOTE_MAX = int(os.getenv("INGEST_PROMOTE_MAX", "20"))
+    INGEST_PROMOTE_TTL_SEC = float(os.getenv("INGEST_PROMOTE_TTL_SEC", "900"))
+    # /ws/depth: periyodik tam tablo (keyframe) aralığı; arada yalnızca yamalar
+    DEPTH_KEYFRAME_SEC = float(os.getenv("DEPTH_KEYFRAME_SEC", "10"))
+    # İstemci outbox'ı: trade kuyruğu bu süre sınır üstünde kalırsa bağlantı kapatılır
+    CLIENT_SLOW_GRACE_SEC = float(os.getenv("CLIENT_SLOW_GRACE_SEC", "5"))
+    # Heatmap flush aralığı yük altında bu sınırlar arasında uyarlanır
+    HEATMAP_FLUSH_MIN_SEC = float(os.getenv("HEATMAP_FLUSH_MIN_SEC", "0.1"))
+    HEATMAP_FLUSH_MAX_SEC = float(os.getenv("HEATMAP_FLUSH_MAX_SEC", "1.0"))
+    # heatmap evreni: "fixed" (HEATMAP_SYMBOLS) | "all" (sectoral-brief'teki tüm semboller)
+    HEATMAP_UNIVERSE = os.getenv("HEATMAP_UNIVERSE", "fixed").strip().lower()
+    # sektör listesi / evren yenileme aralığı
+    HEATMAP_UNIVERSE_REFRESH_SEC = float(os.getenv("HEATMAP_UNIVERSE_REFRESH_SEC", "900"))
+    # Snapshot PNG cache: aynı (sembol, boyut, ölçek, veri sürümü) için yeniden çizim yok
+    SNAPSHOT_CACHE_TTL_SEC = float(os.getenv("SNAPSHOT_CACHE_TTL_SEC", "3"))
+    SNAPSHOT_CACHE_MAX_BYTES = int(os.getenv("SNAPSHOT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    # Snapshot çizimi event loop dışında, süreç havuzunda
+    SNAPSHOT_WORKERS = int(os.getenv("SNAPSHOT_WORKERS", "2"))
+    # çalışan + kuyrukta bekleyen çizim sınırı; aşılırsa 503
+    SNAPSHOT_QUEUE_MAX = int(os.getenv("SNAPSHOT_QUEUE_MAX", "8"))
+    SNAPSHOT_RENDER_TIMEOUT_SEC = float(os.getenv("SNAPSHOT_RENDER_TIMEOUT_SEC", "10"))
+    # izlenmeyen sembolün snapshot'ı: depth/trade/market ilk mesajları için azami bekleme,
+    # ardından akışların açık kalma süresi (tekrar eden istekler sıcak) ve sembol sınırı
+    SNAPSHOT_FETCH_TIMEOUT_SEC = float(os.getenv("SNAPSHOT_FETCH_TIMEOUT_SEC", "2.5"))
+    SNAPSHOT_FETCH_LINGER_SEC = float(os.getenv("SNAPSHOT_FETCH_LINGER_SEC", "30"))
+    SNAPSHOT_FETCH_MAX = int(os.getenv("SNAPSHOT_FETCH_MAX", "32"))
+    # bot snapshot'larının biçimi (png|webp|jpeg); Telegram fotoğrafı zaten yeniden sıkıştırır
+    SNAPSHOT_BOT_FORMAT = os.getenv("SNAPSHOT_BOT_FORMAT", "jpeg").strip().lower()
+    # aynı snapshot (veri sürümü) tekrar gönderilirken yeniden yükleme yerine Telegram file_id
+    SNAPSHOT_FILE_ID_CACHE = int(os.getenv("SNAPSHOT_FILE_ID_CACHE", "512"))
     _HM_DEFAULT = (
         "ASTOR",
         "AKBNK",
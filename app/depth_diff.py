@@ -0,0 +1,59 @@
+# app/depth_diff.py
+# -*- coding: utf-8 -*-
+"""
+Ardışık iki DepthBook arasındaki hücre farkı.
+
+Yama (patch) ``[satır, kolon, değer]`` üçlülerinden oluşur; satır 0..9,
+kolon ``DEPTH_COLUMNS`` içindeki sıradır (DepthBook.rows() anahtarları),
+değer kademe kalktıysa None. Fark dizi düzeyinde alınır: değişmeyen
+kolonlar tek karşılaştırmayla atlanır.
+"""
+from __future__ import annotations
+
+from typing import Any, List, Optional
+
+from .depth_parser import DEPTH_LEVELS, DepthBook
+
+# rows() kolonları ve karşılık gelen DepthBook dizileri
+DEPTH_COLUMNS = (
+    "bid_order",
+    "bid_qty",
+    "bid_price",
+    "ask_price",
+    "ask_qty",
+    "ask_order",
+)
+_ARRAYS = (
+    "bid_orders",
+    "bid_qty",
+    "bid_price",
+    "ask_price",
+    "ask_qty",
+    "ask_orders",
+)
+
+# Bu kadar hücreden fazlası değiştiyse yama yerine keyframe daha küçük
+MAX_PATCH_CELLS = DEPTH_LEVELS * len(DEPTH_COLUMNS) // 2
+
+
+def diff_books(prev: DepthBook, cur: DepthBook) -> Optional[List[List[Any]]]:
+    """
+    prev -> cur yaması. Değişiklik çoksa (MAX_PATCH_CELLS üstü) None:
+    çağıran tam tablo göndermeli.
+    """
+    out: List[List[Any]] = []
+    for col, name in enumerate(_ARRAYS):
+        a = getattr(prev, name)
+        b = getattr(cur, name)
+        if a == b:
+            continue
+        na = len(a)
+        nb = len(b)
+        for i in range(max(na, nb)):
+            va = a[i] if i < na else None
+            vb = b[i] if i < nb else None
+            if va != vb:
+                out.append([i, col, vb])
+        if len(out) > MAX_PATCH_CELLS:
+            return None
+    return out
@@ -0,0 +1,114 @@
+# app/depth_feed.py
+# -*- coding: utf-8 -*-
+"""
+Paylaşımlı depth akışı: sembol başına tek upstream aboneliği.
+
+Semboller depth oturum havuzundaki shard'lara dağıtılır. Her DepthSnapshot
+bir kez decode edilir, depth_hub'a yazılır ve /ws/depth/{symbol}
+istemcilerinin tamamına dağıtılır.
+
+İstemciye giden mesajlar:
+  keyframe: {"symbol", "version", "levels"}   bağlanınca, DEPTH_KEYFRAME_SEC'te
+                                             bir ve yama büyükse
+  yama    : {"symbol", "version", "patch"}    yalnızca değişen hücreler
+``version`` depth_hub sürümüdür ve her yayında bir artar; istemci boşluk
+görürse {"op": "keyframe"} gönderip tam tablo ister.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from .config import settings
+from .client_channel import ConflatingOutbox, Outbox
+from .depth_diff import diff_books
+from .depth_hub import DepthEntry, hub as depth_hub
+from .depth_parser import decode_depth
+from .depth_proxy import MatrixDepthSession
+from .session_pool import SessionPool
+from .symbol_feed import SymbolFeed
+
+log = logging.getLogger("depth_feed")
+
+
+class DepthFeed(SymbolFeed):
+    name = "depth"
+
+    def __init__(self) -> None:
+        super().__init__(queue_size=4)
+        self.pool = SessionPool(
+            "depth",
+            factory=lambda cb: MatrixDepthSession(on_publish=cb),
+            on_publish=self._on_publish,
+        )
+        self._decode_errors = 0
+        self._unchanged = 0
+        self._keyframe_sec = settings.DEPTH_KEYFRAME_SEC
+        self._keyframe_at: Dict[str, float] = {}
+        self._keyframes = 0
+        self._patches = 0
+
+    async def _start(self, symbol: str) -> None:
+        await self.pool.add(symbol)
+
+    async def _stop(self, symbol: str) -> None:
+        self._keyframe_at.pop(symbol, None)
+        await self.pool.remove(symbol)
+
+    async def _on_publish(self, sym: str, topic: str, payload: memoryview) -> None:
+        if sym not in self._refs:
+            return
+        try:
+            book = decode_depth(payload)
+        except ValueError:
+            self._decode_errors += 1
+            return
+        prev = depth_hub.get(sym)
+        entry = depth_hub.put(sym, book)
+        if entry is None:
+            # defter değişmedi: yeniden yayınlamaya gerek yok
+            self._unchanged += 1
+            return
+        # Yama/tablo yalnızca izleyici varsa üretilir (sıcak tutulan semboller için değil)
+        if not self.has_subscribers(sym):
+            return
+        now = time.monotonic()
+        patch = None
+        if prev is not None and now - self._keyframe_at.get(sym, 0.0) < self._keyframe_sec:
+            patch = diff_books(prev.book, book)
+        if patch is None:
+            self._keyframe_at[sym] = now
+            self._keyframes += 1
+            self.publish(sym, self._message(sym, entry), keep_last=False)
+        else:
+            self._patches += 1
+            self.publish(
+                sym,
+                {"symbol": sym, "version": entry.version, "patch": patch},
+                keep_last=False,
+            )
+
+    @staticmethod
+    def _message(sym: str, entry: DepthEntry) -> Dict[str, Any]:
+        return {"symbol": sym, "version": entry.version, "levels": entry.levels}
+
+    def _outbox(self, symbol: str) -> Outbox:
+        # yama zinciri taşarsa bekleyenler yerine güncel keyframe
+        return ConflatingOutbox(self._queue_size, resync=lambda: self._prime(symbol))
+
+    def _prime(self, symbol: str) -> Optional[Dict[str, Any]]:
+        entry = depth_hub.get(symbol)
+        return self._message(symbol, entry) if entry is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        out = super().stats()
+        out["decode_errors"] = self._decode_errors
+        out["unchanged"] = self._unchanged
+        out["keyframes"] = self._keyframes
+        out["patches"] = self._patches
+        out["pool"] = self.pool.stats()
+        return out
+
+
+depth_feed = DepthFeed()
@@ -1,28 +1,56 @@
 # app/depth_hub.py
-import asyncio
-from typing import Dict, List, Any
+"""
+Sürümlü (versioned) depth deposu.
+
+Tek yazar (depth_feed) her ``put`` çağrısında sembolün sıra numarasını
+artırır; defter (DepthBook) değişmediyse sürüm artmaz. Kayıtlar değişmez
+(immutable) olduğundan okumalar kilitsizdir: ``get(symbol)`` son kaydı
+beklemeden döner (snapshot_service, depth_feed ilk boyama). Henüz veri
+yoksa ilk mesajı beklemek snapshot_fetch'in işidir.
+"""
 from time import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .depth_parser import DepthBook
+
+
+class DepthEntry(NamedTuple):
+    version: int
+    ts: int
+    book: DepthBook
+
+    @property
+    def levels(self) -> List[Dict[str, Any]]:
+        """Sunum için 10 satırlık tablo (defter başına bir kez üretilir)."""
+        return self.book.rows()
 
 
 class DepthHub:
     def __init__(self) -> None:
-        self._lock = asyncio.Lock()
-        self._store: Dict[str, Dict[str, Any]] = {}
-
-    async def set(self, symbol: str, levels: List[Dict[str, Any]]) -> None:
-        async with self._lock:
-            self._store[symbol] = {"levels": levels, "ts": int(time() * 1000)}
-
-    async def get_last(self, symbol: str, timeout: float = 0.0):
-        # timeout param’ı API uyumu için; burada kullanılmıyor
-        async with self._lock:
-            d = self._store.get(symbol)
-            return d["levels"] if d else []
-
-    async def get_ts(self, symbol: str):
-        async with self._lock:
-            d = self._store.get(symbol)
-            return d["ts"] if d else None
+        self._store: Dict[str, DepthEntry] = {}
+
+    # ---- yazma (tek yazar, event loop içinde) ----
+    def put(self, symbol: str, book: DepthBook) -> Optional[DepthEntry]:
+        """Yeni defteri yazar; değişiklik yoksa None döner."""
+        prev = self._store.get(symbol)
+        if prev is not None and prev.book == book:
+            return None
+        entry = DepthEntry(
+            (prev.version if prev else 0) + 1, int(time() * 1000), book
+        )
+        self._store[symbol] = entry
+        return entry
+
+    # ---- okuma (kilitsiz) ----
+    def get(self, symbol: str) -> Optional[DepthEntry]:
+        return self._store.get(symbol)
+
+    def version(self, symbol: str) -> int:
+        e = self._store.get(symbol)
+        return e.version if e else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"symbols": len(self._store)}
 
 
 hub = DepthHub()
@@ -1,28 +1,121 @@
-from typing import List, Dict, Any
+# app/depth_parser.py
+"""
+DepthSnapshot payload'ını sayısal, kompakt bir yapıya (DepthBook) çözer:
+ilk 10 kademe paralel dizilerde tutulur, seviye başına dict ve fiyat
+string'i üretilmez. Metne çevirme yalnızca sunum katmanında
+(snapshot._fmt_price, depth.js fmtP) yapılır.
+
+Wire çözümlemesi protobuf'un C (upb) ayrıştırıcısıyla yapılır; saf Python
+ayrıştırıcı bu mesajda ~3 kat daha yavaş ölçüldü.
+"""
+from array import array
+from typing import Any, Dict, List, Optional
+
+from google.protobuf.message import DecodeError
+
 from app.matriks_pb2 import DepthSnapshot  # protoc çıktısı
 
-def decode_depth_snapshot(payload: bytes) -> List[Dict[str, Any]]:
+DEPTH_LEVELS = 10
+
+
+class DepthBook:
+    """Paralel dizilerde en fazla DEPTH_LEVELS kademe; en iyi fiyat 0. indeks."""
+
+    __slots__ = (
+        "symbol",
+        "ts",
+        "bid_price",
+        "bid_qty",
+        "bid_orders",
+        "ask_price",
+        "ask_qty",
+        "ask_orders",
+        "_rows",
+    )
+
+    def __init__(self) -> None:
+        self.symbol = ""
+        self.ts = 0
+        self.bid_price = array("d")
+        self.bid_qty = array("q")
+        self.bid_orders = array("q")
+        self.ask_price = array("d")
+        self.ask_qty = array("q")
+        self.ask_orders = array("q")
+        self._rows: Optional[List[Dict[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return max(len(self.bid_price), len(self.ask_price))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DepthBook):
+            return NotImplemented
+        return (
+            self.bid_price == other.bid_price
+            and self.ask_price == other.ask_price
+            and self.bid_qty == other.bid_qty
+            and self.ask_qty == other.ask_qty
+            and self.bid_orders == other.bid_orders
+            and self.ask_orders == other.ask_orders
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        Sunum/JSON için birleşik 10 satırlık tablo (bir kez hesaplanır, paylaşılır).
+        Kolonlar: level, bid_order, bid_qty, bid_price, ask_price, ask_qty, ask_order
+        """
+        rows = self._rows
+        if rows is not None:
+            return rows
+        nb = len(self.bid_price)
+        na = len(self.ask_price)
+        rows = []
+        for i in range(DEPTH_LEVELS):
+            b = i < nb
+            a = i < na
+            rows.append(
+                {
+                    "level": i + 1,
+                    "bid_order": self.bid_orders[i] if b else None,
+                    "bid_qty": self.bid_qty[i] if b else None,
+                    "bid_price": self.bid_price[i] if b else None,
+                    "ask_price": self.ask_price[i] if a else None,
+                    "ask_qty": self.ask_qty[i] if a else None,
+                    "ask_order": self.ask_orders[i] if a else None,
+                }
+            )
+        self._rows = rows
+        return rows
+
+
+def decode_depth(payload) -> DepthBook:
+    """PUBLISH payload'ı -> DepthBook. Bozuk girdide ValueError."""
+    snap = DepthSnapshot()
+    try:
+        snap.ParseFromString(payload)
+    except DecodeError as e:
+        raise ValueError(f"bad depth payload: {e}") from None
+    book = DepthBook()
+    book.symbol = snap.symbol
+    book.ts = snap.snapshot_ts
+    bp, bq, bo = book.bid_price.append, book.bid_qty.append, book.bid_orders.append
+    for lv in snap.bids[:DEPTH_LEVELS]:
+        bp(lv.price)
+        bq(lv.qty)
+        bo(lv.orders)
+    ap, aq, ao = book.ask_price.append, book.ask_qty.append, book.ask_orders.append
+    for lv in snap.asks[:DEPTH_LEVELS]:
+        ap(lv.price)
+        aq(lv.qty)
+        ao(lv.orders)
+    return book
+
+
+def decode_depth_snapshot(payload) -> List[Dict[str, Any]]:
     """
-    PUBLISH payload'ından DepthSnapshot parse eder ve 10 kademelik birleşik tablo döner.
+    Geriye dönük uyumluluk: 10 kademelik birleşik tablo (fiyatlar sayı).
     Kolonlar: level, bid_order, bid_qty, bid_price, ask_price, ask_qty, ask_order
     """
-    snap = DepthSnapshot()
-    snap.ParseFromString(payload)
-
-    # bids ve asks’i level hizalayıp 10 satır çıkaralım
-    # Not: Sağlayıcı en iyi fiyat 0. indexte -> level = i+1
-    rows: List[Dict[str, Any]] = []
-    max_len = max(len(snap.bids), len(snap.asks), 10)
-    for i in range(min(max_len, 10)):
-        bid = snap.bids[i] if i < len(snap.bids) else None
-        ask = snap.asks[i] if i < len(snap.asks) else None
-        rows.append({
-            "level": i + 1,
-            "bid_order": (bid.orders if bid else None),
-            "bid_qty": (bid.qty if bid else None),
-            "bid_price": (f"{bid.price:.2f}" if bid else None),
-            "ask_price": (f"{ask.price:.2f}" if ask else None),
-            "ask_qty": (ask.qty if ask else None),
-            "ask_order": (ask.orders if ask else None),
-        })
-    return rows
\ No newline at end of file
+    return decode_depth(payload).rows()
@@ -0,0 +1,193 @@
+# app/heatmap.py
+# -*- coding: utf-8 -*-
+"""
+Heatmap için artımlı güncelleme takibi.
+
+Değişiklikler quote_hub tablosunun satır dirty bitlerinde birikir;
+``mark()`` yalnızca yayın döngüsünü uyandırıp uyandırmamayı söyler.
+``flush()`` heatmap kolonlarının dirty bitlerini alıp yalnızca değişen
+sembolleri yeni bir sürümle (version) yayınlar.
+Her sembolün son değiştiği sürüm tutulur, böylece ``since(v)`` v'den
+sonra değişen sembolleri geçmiş tutmadan çıkarabilir.
+
+Mesajlar:
+  snapshot: {"type": "snapshot", "epoch", "version", "ts", "quotes": [tüm semboller]}
+  delta   : {"type": "delta", "epoch", "version", "base", "ts", "quotes": [değişenler]}
+İstemci ``epoch`` ve ``base`` kendi durumuna eşitse deltayı uygular; değilse
+{"op": "resume", "epoch": e, "version": v} gönderir. ``epoch`` süreç başına
+rastgele seçilir: sunucu yeniden başlayınca sürümler sıfırdan sayılır ve eski
+bir ``since`` değeri yeni sayaçta geçerli görünebilir; epoch uyuşmazsa
+snapshot gider.
+
+Sektör içi görünümler (drill-down) aynı sürüm dizisini paylaşır; mesajlar
+yalnızca üyelere süzülür (``members``). Değişmeyen üyeler zaten günceldir,
+bu yüzden süzülmüş delta da ``base`` -> ``version`` geçişi için yeterlidir.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import AbstractSet, Any, Dict, Iterable, List, Optional, Set
+
+from .quote_hub import mask, quote_hub
+
+# Heatmap'i etkileyen quote alanları
+HEATMAP_FIELDS = ("last", "prev_close", "change_pct")
+_HEATMAP_BITS = mask(*HEATMAP_FIELDS)
+
+
+def new_epoch() -> int:
+    """Süreç/örnek kimliği (u32, 0 değil): sürüm sayacının hangi ömre ait olduğu."""
+    return int.from_bytes(os.urandom(4), "big") or 1
+
+
+class HeatmapTracker:
+    def __init__(
+        self, symbols: Iterable[str], min_interval: float = 0.1, max_interval: float = 1.0
+    ) -> None:
+        quote_hub.track(_HEATMAP_BITS)
+        self.epoch = new_epoch()
+        self.version = 0
+        self._sym_version: Dict[str, int] = {}
+        self.symbols: tuple = ()
+        self._symbol_set: Set[str] = set()
+        self.set_symbols(symbols)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+        self._flushes = 0
+        self._tiles_sent = 0
+
+    def set_symbols(self, symbols: Iterable[str]) -> bool:
+        """Evreni değiştirir; değiştiyse True (istemcilere snapshot gerekir)."""
+        syms = tuple(dict.fromkeys(s.upper() for s in symbols))
+        if syms == self.symbols:
+            return False
+        added = set(syms) - self._symbol_set
+        self.symbols = syms
+        self._symbol_set = set(syms)
+        # yeni semboller since() ile eski sürümden devam edenlere de gitsin
+        if added:
+            self.version += 1
+            for s in added:
+                self._sym_version[s] = self.version
+        return True
+
+    # ---- akış tarafı ----
+    def mark(self, symbol: str, changed: Dict[str, Any]) -> bool:
+        """quote_hub.merge çıktısı heatmap'i etkiliyorsa True (değişiklik tabloda bekler)."""
+        if symbol not in self._symbol_set:
+            return False
+        for k in HEATMAP_FIELDS:
+            if k in changed:
+                return True
+        return False
+
+    @property
+    def pending(self) -> int:
+        return quote_hub.dirty_count(_HEATMAP_BITS)
+
+    # ---- yayın tarafı ----
+    @staticmethod
+    def _tiles(syms: Iterable[str]) -> List[Dict[str, Any]]:
+        # kolonlar doğrudan okunur; satır başına yalnızca 4 indeks
+        t = quote_hub
+        last, prev, pct = t.column("last"), t.column("prev_close"), t.column("change_pct")
+        stamp = t.stamp
+        out = []
+        for s in syms:
+            i = t.id_of(s)
+            if i is None or not stamp[i]:
+                continue
+            out.append({
+                "symbol": s,
+                "last": last[i],
+                "prev_close": prev[i],
+                "change_pct": pct[i],
+                "updated_at": int(stamp[i] * 1000),
+            })
+        return out
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Bekleyen değişiklikleri yeni sürümlü delta olarak döner (yoksa None)."""
+        ids = quote_hub.take_dirty(_HEATMAP_BITS)
+        changed = {quote_hub.symbol(i) for i in ids} & self._symbol_set
+        if not changed:
+            return None
+        base = self.version
+        self.version += 1
+        for s in changed:
+            self._sym_version[s] = self.version
+        # sabit sıra: istemci tarafında kararlı yerleşim
+        quotes = self._tiles(s for s in self.symbols if s in changed)
+        self._flushes += 1
+        self._tiles_sent += len(quotes)
+        return self._delta(base, quotes)
+
+    def _delta(self, base: int, quotes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "type": "delta",
+            "epoch": self.epoch,
+            "version": self.version,
+            "base": base,
+            "ts": int(time.time() * 1000),
+            "quotes": quotes,
+        }
+
+    def _universe(self, members: Optional[AbstractSet[str]]) -> Iterable[str]:
+        if members is None:
+            return self.symbols
+        return (s for s in self.symbols if s in members)
+
+    def snapshot(self, members: Optional[AbstractSet[str]] = None) -> Dict[str, Any]:
+        return {
+            "type": "snapshot",
+            "epoch": self.epoch,
+            "version": self.version,
+            "ts": int(time.time() * 1000),
+            "quotes": self._tiles(self._universe(members)),
+        }
+
+    def since(
+        self, epoch: Optional[int], version: int, members: Optional[AbstractSet[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        ``version``'dan bu yana değişenler; epoch farklıysa (sunucu yeniden
+        başladı) ya da sürüm bilinmiyorsa (ileri/negatif) tam snapshot.
+        """
+        if epoch != self.epoch or version < 0 or version > self.version:
+            return self.snapshot(members)
+        sv = self._sym_version
+        quotes = self._tiles(s for s in self._universe(members) if sv.get(s, 0) > version)
+        return self._delta(version, quotes)
+
+    @staticmethod
+    def view(message: Dict[str, Any], members: AbstractSet[str]) -> Dict[str, Any]:
+        """flush() deltasını bir sektörün üyelerine süzer (sürümler aynı kalır)."""
+        out = dict(message)
+        out["quotes"] = [q for q in message["quotes"] if q["symbol"] in members]
+        return out
+
+    # ---- uyarlanır aralık ----
+    def adapt(self, sent: int, backlog: int) -> float:
+        """
+        Flush aralığını yüke göre ayarlar: istemci kuyrukları birikiyorsa ya da
+        evrenin yarısından fazlası değişiyorsa yavaşla, sakinse hızlan.
+        """
+        busy = backlog > 1 or sent * 2 > len(self.symbols)
+        if busy:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        else:
+            self.interval = max(self.min_interval, self.interval * 0.8)
+        return self.interval
+
+    def stats(self) -> Dict[str, Any]:
+        n = self._flushes
+        return {
+            "epoch": self.epoch,
+            "version": self.version,
+            "pending": self.pending,
+            "interval_ms": round(self.interval * 1000),
+            "flushes": n,
+            "tiles_per_flush": round(self._tiles_sent / n, 2) if n else None,
+        }
@@ -0,0 +1,177 @@
+# app/ingest.py
+# -*- coding: utf-8 -*-
+"""
+İzleyiciden bağımsız, sürekli açık veri alımı (ingestion).
+
+depth_hub / trade_hub normalde yalnızca bir tarayıcı /ws/depth veya /ws/trade
+açıkken dolar; izlenmeyen sembolün snapshot'ı boş gelir. IngestService:
+
+  - INGEST_WATCHLIST'teki sembolleri kalıcı olarak (pinned) açık tutar,
+  - yakın zamanda istenen sembolleri (/ws/*) otomatik terfi ettirir;
+    INGEST_PROMOTE_TTL_SEC boyunca istenmezse bırakır, en fazla
+    INGEST_PROMOTE_MAX sembol tutar (LRU).
+
+Akışlar depth/trade/market feed'lerinde birer referans tutularak açık kalır;
+izleyiciler aynı upstream'i paylaşır, ilk boyama son mesajla anında yapılır.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from .config import settings
+from .depth_feed import depth_feed
+from .market_feed import market_feed
+from .symbol_feed import SymbolFeed
+from .trade_feed import trade_feed
+
+log = logging.getLogger("ingest")
+
+_FEEDS: Dict[str, SymbolFeed] = {
+    "depth": depth_feed,
+    "trade": trade_feed,
+    "market": market_feed,
+}
+
+
+class IngestService:
+    def __init__(
+        self,
+        watchlist: Optional[List[str]] = None,
+        feeds: Optional[List[str]] = None,
+        promote_max: Optional[int] = None,
+        promote_ttl: Optional[float] = None,
+    ) -> None:
+        wl = settings.INGEST_WATCHLIST if watchlist is None else watchlist
+        self.watchlist: Set[str] = {s.strip().upper() for s in wl if s.strip()}
+        names = settings.INGEST_FEEDS if feeds is None else feeds
+        self.feeds: List[SymbolFeed] = [_FEEDS[n] for n in names if n in _FEEDS]
+        self.promote_max = settings.INGEST_PROMOTE_MAX if promote_max is None else promote_max
+        self.promote_ttl = settings.INGEST_PROMOTE_TTL_SEC if promote_ttl is None else promote_ttl
+        self.sweep_sec = 30.0
+
+        self._lock = asyncio.Lock()
+        # sembol -> referansı alınabilen feed'ler (yalnızca bunlar bırakılır)
+        self._held: Dict[str, List[SymbolFeed]] = {}
+        self._promoted: "OrderedDict[str, float]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()  # touch() görevleri (referans tutulur)
+        self._running = False
+        self._promotions = 0
+        self._demotions = 0
+
+    # ---- yaşam döngüsü ----
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        for sym in sorted(self.watchlist):
+            await self._hold(sym)
+        self._task = asyncio.create_task(self._sweep_loop())
+        log.info(
+            "ingest started: %d pinned, feeds=%s",
+            len(self.watchlist),
+            ",".join(f.name for f in self.feeds),
+        )
+
+    async def stop(self) -> None:
+        self._running = False
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for sym in list(self._held):
+            await self._drop(sym)
+        self._promoted.clear()
+
+    # ---- terfi ----
+    def touch(self, symbol: str) -> bool:
+        """
+        Sembol istendi: terfi listesinde tazele, gerekirse akışı aç.
+        Sembol zaten sıcaksa True döner.
+        """
+        sym = (symbol or "").strip().upper()
+        if not sym or not self._running:
+            return False
+        warm = sym in self._held
+        if sym in self.watchlist or self.promote_max <= 0:
+            return warm
+        self._promoted[sym] = time.monotonic()
+        self._promoted.move_to_end(sym)
+        if not warm:
+            self._promotions += 1
+            self._spawn(self._hold(sym))
+        while len(self._promoted) > self.promote_max:
+            old, _ = self._promoted.popitem(last=False)
+            self._spawn(self._drop(old))
+        return warm
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("ingest: task failed", exc_info=task.exception())
+
+    # ---- referanslar ----
+    async def _hold(self, sym: str) -> None:
+        async with self._lock:
+            if sym in self._held or not self._running:
+                return
+            got = self._held[sym] = []
+            for feed in self.feeds:
+                try:
+                    await feed.acquire(sym)
+                except Exception:
+                    log.exception("ingest: %s %s start failed", feed.name, sym)
+                else:
+                    got.append(feed)
+
+    async def _drop(self, sym: str) -> None:
+        async with self._lock:
+            if sym in self.watchlist and self._running:
+                return
+            if sym in self._promoted and self._running:
+                return
+            if sym not in self._held:
+                return
+            for feed in self._held.pop(sym):
+                try:
+                    await feed.release(sym)
+                except Exception:
+                    log.exception("ingest: %s %s stop failed", feed.name, sym)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_sec)
+            cutoff = time.monotonic() - self.promote_ttl
+            expired = [s for s, ts in self._promoted.items() if ts < cutoff]
+            for sym in expired:
+                self._promoted.pop(sym, None)
+                self._demotions += 1
+                await self._drop(sym)
+            if expired:
+                log.info("ingest: demoted %s", ",".join(expired))
+
+    # ---- istatistik ----
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "feeds": [f.name for f in self.feeds],
+            "pinned": sorted(self.watchlist),
+            "promoted": list(self._promoted),
+            "held": len(self._held),
+            "promotions": self._promotions,
+            "demotions": self._demotions,
+        }
+
+
+ingest = IngestService()
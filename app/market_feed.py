@@ -0,0 +1,93 @@
+# app/market_feed.py
+# -*- coding: utf-8 -*-
+"""
+Paylaşımlı market akışı: tüm /ws/market istemcileri ortak upstream havuzunu kullanır.
+
+İlk izleyici geldiğinde sembolün konusu havuzdaki bir oturuma SUBSCRIBE edilir,
+son izleyici ayrıldığında UNSUBSCRIBE edilir. Her PUBLISH sunucuda bir kez
+decode edilip quote_hub'a işlenir; istemcilere yalnızca değişen normalize
+alanlar ``{"symbol", "quote": {...}}`` olarak gider. Yeni abone önce tam
+kotayı alır.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Optional
+
+from .client_channel import ConflatingOutbox, Outbox
+from .market_parser import QUOTE_FIELDS, decode_market_quote
+from .market_proxy import MatrixMarketSession
+from .quote_hub import quote_hub
+from .session_pool import SessionPool
+from .symbol_feed import SymbolFeed
+
+log = logging.getLogger("market_feed")
+
+
+def _quote_key(msg: Dict[str, Any]) -> str:
+    return "quote"
+
+
+def _merge_quote(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    out = {"symbol": new["symbol"], "quote": {**old["quote"], **new["quote"]}}
+    if old.get("full") or new.get("full"):
+        out["full"] = True
+    return out
+
+
+class MarketFeed(SymbolFeed):
+    name = "market"
+
+    def __init__(self) -> None:
+        super().__init__(queue_size=16)
+        self.pool = SessionPool(
+            "market",
+            factory=lambda cb: MatrixMarketSession(on_publish=cb),
+            on_publish=self._on_publish,
+        )
+        self._decode_errors = 0
+        self._unchanged = 0
+
+    async def _start(self, symbol: str) -> None:
+        await self.pool.add(symbol)
+
+    async def _stop(self, symbol: str) -> None:
+        await self.pool.remove(symbol)
+
+    def _on_publish(self, sym: str, topic: str, payload: memoryview) -> None:
+        if sym not in self._refs:
+            return
+        try:
+            decoded = decode_market_quote(payload)
+        except ValueError:
+            self._decode_errors += 1
+            return
+        changed = quote_hub.merge(sym, decoded)
+        if not changed:
+            self._unchanged += 1
+            return
+        if self.has_subscribers(sym):
+            changed.pop("prev_close", None)  # istemcide bid ile aynı
+            # delta: abone kuyruğunda son tam kota tutulmaz (_prime kullanılır)
+            self.publish(sym, {"symbol": sym, "quote": changed}, keep_last=False)
+
+    def _outbox(self, symbol: str) -> Outbox:
+        # gönderilmemiş deltalar alan bazında tek mesajda birleşir
+        return ConflatingOutbox(self._queue_size, key=_quote_key, merge=_merge_quote)
+
+    def _prime(self, symbol: str) -> Optional[Dict[str, Any]]:
+        q = quote_hub.peek(symbol)
+        if not q:
+            return None
+        full = {k: q[k] for k in QUOTE_FIELDS if q.get(k) is not None}
+        return {"symbol": symbol, "quote": full, "full": True}
+
+    def stats(self) -> Dict[str, Any]:
+        out = super().stats()
+        out["decode_errors"] = self._decode_errors
+        out["unchanged"] = self._unchanged
+        out["pool"] = self.pool.stats()
+        return out
+
+
+market_feed = MarketFeed()
@@ -0,0 +1,103 @@
+# app/market_parser.py
+# -*- coding: utf-8 -*-
+"""
+Market (RawSnapshot) payload'ının sunucu tarafı decoder'ı.
+
+Sağlayıcı aynı değeri birden fazla alanda gönderebiliyor; her normalize
+anahtar için alan öncelik listesi ``_PICK`` tablosundadır (depth.js
+mapFields ile aynı sıra). Yalnızca payload'da bulunan değerler döner;
+birleştirme (merge) ve change_pct hesabı quote_hub'dadır.
+"""
+from __future__ import annotations
+
+import struct
+from typing import Dict, Optional, Tuple
+
+_F64 = struct.Struct("<d").unpack_from
+
+# normalize anahtar -> alan numaraları (öncelik sırasıyla)
+_PICK: Tuple[Tuple[str, Tuple[int, ...]], ...] = (
+    ("last", (5, 25)),
+    ("bid", (10, 42)),  # fark hesabında GERÇEK ÖNCEKİ = bid (bizim kural)
+    ("ask", (6,)),
+    ("high", (8, 13, 54)),
+    ("low", (12, 55)),
+    ("ceiling", (26, 21)),
+    ("floor", (27, 22)),
+    ("volume", (14, 48)),
+    ("turnover", (15, 38, 80, 81, 28, 33)),
+    ("best_bid", (9, 62, 47)),  # sağlayıcının "prev_close"u; ekranda ALIŞ
+)
+
+# Delta olarak istemciye giden alanlar
+QUOTE_FIELDS: Tuple[str, ...] = tuple(k for k, _ in _PICK) + ("change_pct",)
+
+
+def _varint(buf, i: int) -> Tuple[int, int]:
+    x = 0
+    s = 0
+    while True:
+        b = buf[i]
+        i += 1
+        x |= (b & 0x7F) << s
+        if b < 0x80:
+            return x, i
+        s += 7
+        if s > 63:
+            raise ValueError("varint too long")
+
+
+def decode_market_quote(payload) -> Dict[str, float]:
+    """
+    PUBLISH payload'ı -> {last, bid, ask, high, low, ceiling, floor, volume,
+    turnover, best_bid, prev_close} (yalnızca mevcut olanlar).
+    Bozuk girdide ValueError.
+    """
+    buf = payload if type(payload) is bytes else bytes(payload)
+    L = len(buf)
+    i = 0
+    m: Dict[int, float] = {}
+    try:
+        while i < L:
+            tag = buf[i]
+            if tag < 0x80:
+                i += 1
+            else:
+                tag, i = _varint(buf, i)
+            wt = tag & 7
+            if wt == 1:
+                if i + 8 > L:
+                    raise ValueError("f64 out of range")
+                m[tag >> 3] = _F64(buf, i)[0]
+                i += 8
+            elif wt == 0:
+                v, i = _varint(buf, i)
+                m[tag >> 3] = float(v)
+            elif wt == 2:
+                ln, i = _varint(buf, i)
+                i += ln
+            elif wt == 5:
+                i += 4
+            else:
+                break
+    except IndexError:
+        raise ValueError("truncated market payload") from None
+
+    out: Dict[str, float] = {}
+    get = m.get
+    for key, fields in _PICK:
+        for f in fields:
+            v = get(f)
+            if v is not None:
+                out[key] = v
+                break
+    bid = out.get("bid")
+    if bid is not None:
+        out["prev_close"] = bid
+    return out
+
+
+def change_pct(last: Optional[float], prev: Optional[float]) -> Optional[float]:
+    if last is None or not prev:
+        return None
+    return (last - prev) / prev * 100.0
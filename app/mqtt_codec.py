@@ -0,0 +1,178 @@
+# app/mqtt_codec.py
+# -*- coding: utf-8 -*-
+"""
+Artımlı (incremental) MQTT akış çözücüsü.
+
+Matriks WS frame'leri MQTT bayt akışını taşır; bir MQTT paketi iki frame'e
+bölünebilir, bir frame birden fazla paket taşıyabilir. MqttStreamDecoder:
+
+  - frame'ler arasında yarım kalan paketi saklar ve bir sonrakiyle birleştirir,
+  - PUBLISH payload'larını kopyalamadan ``memoryview`` olarak verir,
+  - topic'leri bir kez decode edip intern eder (aynı topic -> aynı str),
+  - CONNACK / SUBACK / UNSUBACK / PINGRESP paketlerini tek yerde dispatch eder,
+  - bozuk uzunlukta (VLQ > 4 bayt ya da ``max_packet``'ten büyük) tamponu atıp
+    yeniden senkron olur (``resyncs``).
+
+Bağlantı başına bir decoder kullanılır.
+"""
+from __future__ import annotations
+
+import sys
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+# MQTT paket tipleri (üst 4 bit)
+CONNACK = 0x02
+PUBLISH = 0x03
+SUBACK = 0x09
+UNSUBACK = 0x0B
+PINGRESP = 0x0D
+
+_TOPIC_CACHE_MAX = 8192
+# Bundan büyük Remaining Length bozuk akış sayılır (tampon sınırsız büyümesin)
+MAX_PACKET = 1 << 20
+
+
+class MqttStreamDecoder:
+    __slots__ = (
+        "_rest",
+        "_topics",
+        "on_connack",
+        "on_suback",
+        "on_unsuback",
+        "on_pingresp",
+        "packets",
+        "publishes",
+        "reassembled",
+        "resyncs",
+        "max_packet",
+    )
+
+    def __init__(
+        self,
+        on_connack: Optional[Callable[[int], None]] = None,
+        on_suback: Optional[Callable[[int], None]] = None,
+        on_unsuback: Optional[Callable[[int], None]] = None,
+        on_pingresp: Optional[Callable[[], None]] = None,
+        max_packet: int = MAX_PACKET,
+    ) -> None:
+        self._rest = b""
+        self._topics: Dict[bytes, str] = {}
+        self.on_connack = on_connack
+        self.on_suback = on_suback
+        self.on_unsuback = on_unsuback
+        self.on_pingresp = on_pingresp
+        self.packets = 0
+        self.publishes = 0
+        self.reassembled = 0
+        self.resyncs = 0
+        self.max_packet = max_packet
+
+    @property
+    def pending(self) -> int:
+        """Bir sonraki frame'i bekleyen yarım paket bayt sayısı."""
+        return len(self._rest)
+
+    def reset(self) -> None:
+        self._rest = b""
+
+    def _topic(self, raw: bytes) -> str:
+        # kısa topic baytları anahtar; str decode + intern konu başına bir kez
+        topics = self._topics
+        t = topics.get(raw)
+        if t is None:
+            if len(topics) >= _TOPIC_CACHE_MAX:
+                topics.clear()
+            t = sys.intern(raw.decode("utf-8", "ignore"))
+            topics[raw] = t
+        return t
+
+    def _control(self, ptype: int, body: memoryview) -> None:
+        if ptype == CONNACK:
+            if self.on_connack is not None:
+                self.on_connack(body[1] if len(body) >= 2 else 0xFF)
+        elif ptype == SUBACK:
+            if self.on_suback is not None and len(body) >= 2:
+                self.on_suback((body[0] << 8) | body[1])
+        elif ptype == UNSUBACK:
+            if self.on_unsuback is not None and len(body) >= 2:
+                self.on_unsuback((body[0] << 8) | body[1])
+        elif ptype == PINGRESP:
+            if self.on_pingresp is not None:
+                self.on_pingresp()
+
+    def feed(self, frame) -> Iterator[Tuple[str, memoryview]]:
+        """
+        Bir WS binary frame'ini işler; PUBLISH paketleri için (topic, payload) yield eder.
+        Kontrol paketleri ilgili callback'e gider. Eksik kalan son paket saklanır.
+        """
+        if self._rest:
+            data = self._rest + bytes(frame)
+            self._rest = b""
+            self.reassembled += 1
+        elif isinstance(frame, bytes):
+            data = frame
+        else:
+            data = bytes(frame)
+        mv = memoryview(data)
+        topics = self._topics
+        L = len(data)
+        i = 0
+        packets = publishes = 0
+        try:
+            while i < L:
+                start = i
+                fixed = data[i]
+                i += 1
+                # Remaining Length (VLQ, en fazla 4 bayt)
+                if i < L and data[i] < 0x80:
+                    rem = data[i]
+                    i += 1
+                else:
+                    rem = 0
+                    shift = 0
+                    while True:
+                        if i >= L:
+                            self._rest = data[start:]
+                            return
+                        b = data[i]
+                        i += 1
+                        rem |= (b & 0x7F) << shift
+                        if not (b & 0x80):
+                            break
+                        shift += 7
+                        if shift > 21:
+                            # bozuk akış: tamponu at, yeniden senkron ol
+                            self._rest = b""
+                            self.resyncs += 1
+                            return
+                if rem > self.max_packet:
+                    # bozuk/aşırı büyük uzunluk: saklanırsa tampon sınırsız büyür
+                    self._rest = b""
+                    self.resyncs += 1
+                    return
+                end = i + rem
+                if end > L:
+                    self._rest = data[start:]
+                    return
+                packets += 1
+                if fixed >> 4 != PUBLISH:
+                    self._control(fixed >> 4, mv[i:end])
+                    i = end
+                    continue
+                if rem < 2:
+                    i = end
+                    continue
+                j = i + 2 + ((data[i] << 8) | data[i + 1])
+                if j > end:
+                    i = end
+                    continue
+                raw = data[i + 2 : j]
+                topic = topics.get(raw) or self._topic(raw)
+                if fixed & 0x06:  # QoS>0 -> packet id
+                    j += 2
+                publishes += 1
+                i = end
+                yield topic, mv[j:end]
+        finally:
+            self.packets += packets
+            self.publishes += publishes
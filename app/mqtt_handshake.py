@@ -0,0 +1,209 @@
+# app/mqtt_handshake.py
+# -*- coding: utf-8 -*-
+"""
+Olay güdümlü MQTT el sıkışması.
+
+Eski akış: EA== -> sleep -> CONNECT -> 0.5 sn'lik dilimlerle CONNACK yoklama
+-> sleep -> gg== -> sleep -> SUBSCRIBE gövdesi -> (trade) SUBACK yoklama.
+
+Yeni akış: EA==, CONNECT ve SUBSCRIBE paketleri beklemeden art arda gönderilir
+(MQTT 3.1.1, CONNECT'ten hemen sonra başka paket gönderilmesine izin verir).
+CONNACK ve SUBACK, decoder callback'lerinden çözülen future'lardır; okuma
+döngüsü sabit uyku/yoklama olmadan yalnızca CONNACK son tarihine kadar bekler.
+
+Bağlantı başına ölçülenler (ms, WS açılışından itibaren):
+  open_ms           WS/TLS bağlantısının kurulması
+  connack_ms        CONNACK
+  suback_ms         ilk SUBACK
+  first_publish_ms  ilk PUBLISH (kullanıcının ilk veriyi gördüğü an)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .mqtt_codec import MqttStreamDecoder
+
+log = logging.getLogger("mqtt_handshake")
+
+PREAMBLE = b"\x10"  # EA==
+
+SendFn = Callable[[Any, bytes, str], Awaitable[None]]
+
+_RECENT: Dict[str, Deque[Dict[str, Optional[float]]]] = {}
+_RECENT_MAX = 32
+
+
+def _ms(t0: float, t: Optional[float]) -> Optional[float]:
+    return None if t is None else round((t - t0) * 1000.0, 1)
+
+
+class MqttHandshake:
+    """Tek bağlantının el sıkışma durumu; decoder callback'lerine bağlanır."""
+
+    def __init__(
+        self,
+        kind: str,
+        decoder: MqttStreamDecoder,
+        connack_timeout: float = 10.0,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        self.kind = kind
+        self.connack_timeout = connack_timeout
+        self.connack: asyncio.Future = loop.create_future()
+        self._subacks: Dict[int, asyncio.Future] = {}
+        self.state = "dialing"
+
+        self.t_dial = time.monotonic()
+        self.t_open: Optional[float] = None
+        self.t_connack: Optional[float] = None
+        self.t_suback: Optional[float] = None
+        self.t_first_publish: Optional[float] = None
+        self._deadline: Optional[float] = None
+
+        decoder.on_connack = self._on_connack
+        decoder.on_suback = self._on_suback
+
+    # ---- decoder callback'leri ----
+    def _on_connack(self, rc: int) -> None:
+        if self.connack.done():
+            return
+        self.t_connack = time.monotonic()
+        self.connack.set_result(rc)
+        if rc == 0:
+            self.state = "connected"
+            log.info("%s: CONNACK ok in %.0f ms", self.kind, (self.t_connack - self._t0) * 1000)
+        else:
+            self.state = "refused"
+
+    def _on_suback(self, pid: int) -> None:
+        if self.t_suback is None:
+            self.t_suback = time.monotonic()
+            log.debug("%s: SUBACK pid=%d", self.kind, pid)
+        fut = self._subacks.pop(pid, None)
+        if fut is not None and not fut.done():
+            fut.set_result(pid)
+
+    @property
+    def _t0(self) -> float:
+        return self.t_open if self.t_open is not None else self.t_dial
+
+    # ---- gönderim ----
+    async def begin(
+        self,
+        ws,
+        send: SendFn,
+        connect_packet: bytes,
+        subscribes: Iterable[Tuple[int, bytes]] = (),
+    ) -> None:
+        """EA== + CONNECT + SUBSCRIBE'ları bekleme olmadan gönderir."""
+        self.t_open = time.monotonic()
+        self._deadline = self.t_open + self.connack_timeout
+        self.state = "connecting"
+        await send(ws, PREAMBLE, "EA== preamble")
+        await send(ws, connect_packet, "CONNECT")
+        for pid, packet in subscribes:
+            self.expect_suback(pid)
+            await send(ws, packet, "SUBSCRIBE")
+
+    def expect_suback(self, pid: int) -> asyncio.Future:
+        fut = self._subacks.get(pid)
+        if fut is None:
+            fut = self._subacks[pid] = asyncio.get_running_loop().create_future()
+        return fut
+
+    # ---- bekleme ----
+    async def wait_connack(self, abort: Optional[asyncio.Future] = None) -> Optional[int]:
+        """
+        CONNACK future'ını son tarihe kadar bekler. ``abort`` (ör. okuyucu görevi)
+        önce biterse beklemeyi bırakır. Zaman aşımında None döner (akış devam eder).
+        """
+        waiters = {self.connack} if abort is None else {self.connack, abort}
+        await asyncio.wait(waiters, timeout=self.remaining(), return_when=asyncio.FIRST_COMPLETED)
+        if not self.connack.done():
+            self.expire()
+            return None
+        self.raise_if_refused()
+        return self.connack.result()
+
+    def remaining(self) -> Optional[float]:
+        """CONNACK için kalan süre; CONNACK geldiyse None."""
+        if self.connack.done() or self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def recv_timeout(self, idle: Optional[float]) -> Optional[float]:
+        """Okuma zaman aşımı: CONNACK beklenirken son tarihe kadar, sonra ``idle``."""
+        rem = self.remaining()
+        if rem is None:
+            return idle
+        return rem if idle is None else min(rem, idle)
+
+    def expire(self) -> bool:
+        """Son tarih geçtiyse bir kez uyarır; True dönerse CONNACK gelmemiştir."""
+        if self.connack.done() or self._deadline is None:
+            return False
+        if time.monotonic() < self._deadline:
+            return False
+        self._deadline = None
+        self.state = "unacked"
+        log.warning("%s: CONNACK alınamadı (%.0fs); devam.", self.kind, self.connack_timeout)
+        return True
+
+    def raise_if_refused(self) -> None:
+        if self.connack.done() and self.connack.result() != 0:
+            raise RuntimeError(f"{self.kind}: CONNACK refused rc={self.connack.result()}")
+
+    # ---- ölçüm ----
+    def publish_seen(self) -> None:
+        if self.t_first_publish is not None:
+            return
+        self.t_first_publish = time.monotonic()
+        if self.state != "refused":
+            self.state = "streaming"
+        m = self.metrics()
+        log.info(
+            "%s: first PUBLISH in %s ms (open %s ms, CONNACK %s ms)",
+            self.kind,
+            m["first_publish_ms"],
+            m["open_ms"],
+            m["connack_ms"],
+        )
+        _RECENT.setdefault(self.kind, deque(maxlen=_RECENT_MAX)).append(m)
+
+    def metrics(self) -> Dict[str, Optional[float]]:
+        t0 = self._t0
+        return {
+            "open_ms": _ms(self.t_dial, self.t_open),
+            "connack_ms": _ms(t0, self.t_connack),
+            "suback_ms": _ms(t0, self.t_suback),
+            "first_publish_ms": _ms(t0, self.t_first_publish),
+        }
+
+    def __repr__(self) -> str:
+        return f"<MqttHandshake {self.kind} {self.state} {self.metrics()}>"
+
+
+def handshake_stats() -> Dict[str, Dict[str, Any]]:
+    """Tür başına son bağlantıların el sıkışma süreleri (medyan + son)."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for kind, items in _RECENT.items():
+        row: Dict[str, Any] = {"connections": len(items), "last": items[-1] if items else None}
+        for key in ("connack_ms", "first_publish_ms"):
+            vals: List[float] = sorted(v[key] for v in items if v[key] is not None)
+            row[f"p50_{key}"] = vals[len(vals) // 2] if vals else None
+        out[kind] = row
+    return out
@@ -0,0 +1,333 @@
+# app/mqtt_session.py
+# -*- coding: utf-8 -*-
+"""
+Uzun ömürlü Matriks MQTT-over-WS oturumu.
+
+Tek bağlantı üzerinde konu (topic) kümesi çalışma anında değişebilir:
+add() SUBSCRIBE, remove() UNSUBSCRIBE paketi gönderir. Bağlantı koparsa
+yeniden bağlanılır ve güncel konu kümesine tekrar abone olunur.
+Gelen her PUBLISH, on_publish(topic, payload) ile üst katmana verilir
+(senkron fonksiyon ya da coroutine olabilir; payload bir memoryview'dir).
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import inspect
+import logging
+import random
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from websockets.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from .config import settings
+from .connect_builder import _enc_vlq, replace_jwt_in_connect
+from .mqtt_codec import MqttStreamDecoder
+from .mqtt_handshake import MqttHandshake
+from .token_manager import TokenManager
+
+log = logging.getLogger("mqtt_session")
+
+_HEARTBEAT = base64.b64decode("wAA=")  # PINGREQ 0xC0 0x00
+
+
+def symbol_from_topic(topic: str) -> Optional[str]:
+    """'mx/symbol/ASELS@lvl2' -> 'ASELS'"""
+    if not topic:
+        return None
+    tail = topic.rsplit("/", 1)[-1]
+    if "@" in tail:
+        tail = tail.split("@", 1)[0]
+    sym = tail.strip().upper()
+    return sym or None
+
+
+def _build_topic_list(topics: Iterable[str], with_qos: bool) -> bytes:
+    out = bytearray()
+    for t in topics:
+        tb = t.encode("utf-8")
+        out += len(tb).to_bytes(2, "big") + tb
+        if with_qos:
+            out.append(0)  # qos=0
+    return bytes(out)
+
+
+def build_subscribe_packet(topics: Sequence[str], pid: int) -> bytes:
+    """Tam SUBSCRIBE paketi: 0x82 + RL + PID + [len+topic+qos]*"""
+    body = pid.to_bytes(2, "big") + _build_topic_list(topics, True)
+    return b"\x82" + _enc_vlq(len(body)) + body
+
+
+def build_unsubscribe_packet(topics: Sequence[str], pid: int) -> bytes:
+    """Tam UNSUBSCRIBE paketi: 0xA2 + RL + PID + [len+topic]*"""
+    body = pid.to_bytes(2, "big") + _build_topic_list(topics, False)
+    return b"\xa2" + _enc_vlq(len(body)) + body
+
+
+class MatrixSession:
+    """
+    Dinamik konu kümeli tek upstream bağlantı.
+    Alt sınıflar url/şablon/topic formatını ve SUBSCRIBE/UNSUBSCRIBE gövdesini belirler.
+    """
+
+    kind = "session"
+    max_topics_per_packet = 50
+    ping_interval = 25
+    ping_timeout = 15
+    heartbeat_sec = 55.0
+    stall_timeout = 65.0
+    connack_timeout = 10.0
+
+    def __init__(
+        self,
+        url: str,
+        connect_template: Optional[bytes],
+        token_manager: TokenManager,
+        on_publish: Callable[[str, bytes], Any],
+    ) -> None:
+        self.url = url
+        self.origin = settings.MATRIX_ORIGIN
+        self.subprotocol = settings.MATRIX_SUBPROTOCOL
+        self.connect_template = connect_template
+        self.token_manager = token_manager
+        self.on_publish = on_publish
+
+        self._symbols: Set[str] = set()
+        self._ws = None
+        self._send_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pid = random.randint(0x2000, 0x7FFF)
+        self._decoder = MqttStreamDecoder()
+        self._handshake: Optional[MqttHandshake] = None
+        self._connect_template()  # şablon yoksa oturum kurulurken hata
+
+    # ---- CONNECT şablonu ----
+    def _connect_template(self) -> bytes:
+        """
+        Her bağlantıda okunur: verilmişse sabit şablon, yoksa settings'teki
+        güncel değer (/admin/connect-template sonraki bağlanışta etkili olur).
+        """
+        if self.connect_template is not None:
+            return self.connect_template
+        return self._settings_template()
+
+    def _settings_template(self) -> bytes:
+        raise NotImplementedError
+
+    # ---- topic biçimi (alt sınıf) ----
+    def _topic(self, symbol: str) -> str:
+        raise NotImplementedError
+
+    def _topics(self, symbols: Sequence[str]) -> List[str]:
+        return [self._topic(s) for s in symbols]
+
+    def _sub_packet(self, symbols: Sequence[str], pid: int) -> bytes:
+        return build_subscribe_packet(self._topics(symbols), pid)
+
+    def _unsub_packet(self, symbols: Sequence[str], pid: int) -> bytes:
+        return build_unsubscribe_packet(self._topics(symbols), pid)
+
+    # ---- durum ----
+    @property
+    def symbols(self) -> Set[str]:
+        return set(self._symbols)
+
+    @property
+    def connected(self) -> bool:
+        hs = self._handshake
+        return self._ws is not None and hs is not None and hs.connack.done()
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def _next_pid(self) -> int:
+        self._pid = self._pid + 1 if self._pid < 0xFFFF else 1
+        return self._pid
+
+    def _chunks(self, symbols: Sequence[str]) -> List[List[str]]:
+        size = self.max_topics_per_packet
+        syms = list(symbols)
+        return [syms[i : i + size] for i in range(0, len(syms), size)]
+
+    # ---- yaşam döngüsü ----
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._ws = None
+
+    # ---- çalışma anında abonelik ----
+    async def add(self, symbols: Iterable[str]) -> List[str]:
+        new = [s.upper() for s in symbols if s.upper() not in self._symbols]
+        if not new:
+            return []
+        self._symbols.update(new)
+        await self._send_packets(new, self._sub_packet, "SUBSCRIBE")
+        return new
+
+    async def remove(self, symbols: Iterable[str]) -> List[str]:
+        gone = [s.upper() for s in symbols if s.upper() in self._symbols]
+        if not gone:
+            return []
+        self._symbols.difference_update(gone)
+        await self._send_packets(gone, self._unsub_packet, "UNSUBSCRIBE")
+        return gone
+
+    async def _send_packets(self, symbols: Sequence[str], build, note: str) -> None:
+        ws = self._ws
+        if ws is None:
+            # bağlı değil: bağlanınca güncel küme toplu abone edilir
+            return
+        try:
+            for chunk in self._chunks(symbols):
+                await self._send(ws, build(chunk, self._next_pid()), f"{note} {len(chunk)}")
+        except Exception:
+            log.warning("%s: %s failed; will resync on reconnect", self.kind, note)
+
+    async def _send(self, ws, b: bytes, note: str = "") -> None:
+        async with self._send_lock:
+            await self._send_raw(ws, b, note)
+
+    async def _send_raw(self, ws, b: bytes, note: str = "") -> None:
+        # kilit çağıranda (_send ya da _begin)
+        await ws.send(b)
+        log.debug("WS→UP %s %-24s len=%d", self.kind, note, len(b))
+
+    async def _begin(self, ws, hs: MqttHandshake, connect_packet: bytes) -> None:
+        """
+        EA== + CONNECT + güncel kümeye SUBSCRIBE, beklemeden art arda ve tek
+        kilit altında: araya başka paket (ör. eşzamanlı add()) giremez. _ws
+        kilit içinde atanır; sonraki add() kendi SUBSCRIBE'ını bu dizinin
+        arkasından yollar, önceki add() zaten ``subs`` içindedir.
+        """
+        async with self._send_lock:
+            subs = []
+            for chunk in self._chunks(sorted(self._symbols)):
+                pid = self._next_pid()
+                subs.append((pid, self._sub_packet(chunk, pid)))
+            self._ws = ws
+            await hs.begin(ws, self._send_raw, connect_packet, subs)
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                await self._connect_once()
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("%s: stream error; reconnecting", self.kind)
+            finally:
+                self._ws = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 1.7, 15.0)
+
+    async def _connect_once(self) -> None:
+        headers = {
+            "Origin": self.origin,
+            "Pragma": "no-cache",
+            "Cache-Control": "no-cache",
+            "User-Agent": "Mozilla/5.0",
+        }
+        subprotocols = [self.subprotocol] if self.subprotocol else None
+
+        jwt = self.token_manager.get()
+        if not jwt:
+            raise RuntimeError("JWT yok/expired. /admin/jwt ile güncelle.")
+        connect_packet = replace_jwt_in_connect(self._connect_template(), jwt.encode())
+
+        self._decoder = MqttStreamDecoder()
+        hs = self._handshake = MqttHandshake(self.kind, self._decoder, self.connack_timeout)
+
+        async with connect(
+            self.url,
+            extra_headers=headers,
+            subprotocols=subprotocols,
+            ping_interval=self.ping_interval,
+            ping_timeout=self.ping_timeout,
+            close_timeout=10,
+            max_queue=None,
+        ) as ws:
+            log.info("%s: connected (%d topics)", self.kind, len(self._symbols))
+
+            # Okuyucu önce başlar: CONNACK/SUBACK/erken PUBLISH kaçmaz
+            reader = asyncio.create_task(self._read_loop(ws, hs))
+            hb_task: Optional[asyncio.Task] = None
+            try:
+                await self._begin(ws, hs, connect_packet)
+
+                await hs.wait_connack(abort=reader)
+
+                async def _hb():
+                    while True:
+                        try:
+                            await self._send(ws, _HEARTBEAT, "heartbeat")
+                        except Exception:
+                            break
+                        await asyncio.sleep(self.heartbeat_sec)
+
+                hb_task = asyncio.create_task(_hb())
+                await reader
+            finally:
+                if hb_task is not None:
+                    hb_task.cancel()
+                reader.cancel()
+                await asyncio.gather(reader, return_exceptions=True)
+
+    async def _read_loop(self, ws, hs: MqttHandshake) -> None:
+        try:
+            while True:
+                try:
+                    raw = await asyncio.wait_for(
+                        ws.recv(), timeout=hs.recv_timeout(self.stall_timeout)
+                    )
+                except asyncio.TimeoutError:
+                    if hs.remaining() is not None:
+                        hs.expire()  # CONNACK son tarihi (erken uyanışta sessizce tekrar)
+                        continue
+                    if self._symbols:
+                        log.warning("%s: upstream stalled; reconnecting", self.kind)
+                        return
+                    continue
+                if not isinstance(raw, (bytes, bytearray)):
+                    continue
+                await self._dispatch(raw)
+                hs.raise_if_refused()
+        except ConnectionClosed:
+            pass
+
+    def _publishes(self, frame: bytes) -> Iterable[Tuple[str, Any]]:
+        """Frame'deki (topic, payload) çiftleri; alt sınıf payload'ı toplu çözebilir."""
+        return self._decoder.feed(frame)
+
+    async def _dispatch(self, frame: bytes) -> None:
+        hs = self._handshake
+        for topic, payload in self._publishes(frame):
+            if not topic:
+                continue
+            if hs is not None and hs.t_first_publish is None:
+                hs.publish_seen()
+            try:
+                res = self.on_publish(topic, payload)
+                if res is not None and inspect.isawaitable(res):
+                    await res
+            except Exception:
+                log.exception("%s: on_publish failed (%s)", self.kind, topic)
+
+    def stats(self) -> dict:
+        hs = self._handshake
+        return {
+            "kind": self.kind,
+            "connected": self.connected,
+            "topics": len(self._symbols),
+            "decoder_resyncs": self._decoder.resyncs,
+            "handshake": hs.metrics() if hs is not None else None,
+        }
@@ -1,24 +1,210 @@
-import asyncio
-from typing import Dict, Any, Optional
+# app/quote_hub.py
+# -*- coding: utf-8 -*-
+"""
+Kolon tabanlı (columnar) kota tablosu.
 
+Her sembole ilk görüldüğünde sabit bir satır numarası (id) verilir; her
+normalize alan ayrı bir kolondur (satır numarasıyla indekslenen liste,
+eksik değer None). ``merge`` satırı yerinde günceller, yalnızca değişen
+alanları döner; dict kopyası ve kilit yoktur (event loop içinde tek adım).
+Kolonlar ``array("d")`` yerine liste: okuma/yazmada float kutulama
+olmadığından indeksleme daha ucuz (bkz. scripts/bench_quote_table).
 
-class QuoteHub:
+Satır başına:
+  - ``stamp`` (time.time() saniye, 0 = hiç kota gelmedi; ms'e okurken çevrilir)
+  - ``row_version``: satırın son değiştiği tablo sürümü (snapshot cache anahtarı)
+  - ``dirty``: son ``take_dirty`` çağrısından beri değişen kolonların bit maskesi
+    (yalnızca ``track()`` ile izlenen kolonlar; kimsenin almadığı bitler birikmesin)
+
+Okuyucular kolonları doğrudan indeksler (``column()``, ``id_of()``,
+``updated_ms()``) ya da
+satır görünümü (``peek()`` -> QuoteRow, dict gibi ``get``/``[]``) kullanır;
+tüm tabloyu kopyalamak gerekmez.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .market_parser import change_pct
+
+# market_parser alanları + türetilenler (prev_close = bid, change_pct)
+COLUMNS = (
+    "last", "bid", "ask", "high", "low", "ceiling", "floor",
+    "volume", "turnover", "best_bid", "prev_close", "change_pct",
+)
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+_BIT = {name: 1 << i for i, name in enumerate(COLUMNS)}
+_LAST = _COL["last"]
+_PREV = _COL["prev_close"]
+_PCT = _COL["change_pct"]
+_PCT_BIT = _BIT["change_pct"]
+_PRICE_BITS = _BIT["last"] | _BIT["prev_close"]
+_MISSING = object()
+
+
+def mask(*fields: str) -> int:
+    """Alan adları -> dirty bit maskesi."""
+    m = 0
+    for f in fields:
+        m |= _BIT[f]
+    return m
+
+
+class QuoteRow:
+    """Tek satırın canlı görünümü (kopya değil); dict gibi okunur."""
+
+    __slots__ = ("_t", "id", "symbol")
+
+    def __init__(self, table: "QuoteTable", rid: int, symbol: str) -> None:
+        self._t = table
+        self.id = rid
+        self.symbol = symbol
+
+    def get(self, key: str, default: Any = None) -> Any:
+        c = _COL.get(key)
+        if c is not None:
+            v = self._t._cols[c][self.id]
+            return default if v is None else v
+        if key == "updated_at":
+            return self._t.updated_ms(self.id) or default
+        if key == "symbol":
+            return self.symbol
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        v = self.get(key, _MISSING)
+        if v is _MISSING:
+            raise KeyError(key)
+        return v
+
+
+class QuoteTable:
     def __init__(self) -> None:
-        self._lock = asyncio.Lock()
-        self._q: Dict[str, Dict[str, Any]] = {}
+        self._ids: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._rows: List[QuoteRow] = []
+        self._cols: List[List[Optional[float]]] = [[] for _ in COLUMNS]
+        self.stamp: List[float] = []
+        self.row_version: List[int] = []
+        self.dirty: List[int] = []
+        self._dirty_rows: List[int] = []  # dirty != 0 olan satırlar (tarama O(değişen))
+        self._tracked = 0
+        self.version = 0
+        # merge sonrası (symbol, değişen alanlar, satır görünümü) ile çağrılır
+        self._listeners: List[Callable[[str, Dict[str, Any], QuoteRow], None]] = []
+
+    # ---- satırlar ----
+    def intern(self, symbol: str) -> int:
+        """Sembolün satır numarası; yoksa boş (None) yeni satır açar."""
+        i = self._ids.get(symbol)
+        if i is None:
+            i = self._ids[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+            self._rows.append(QuoteRow(self, i, symbol))
+            for col in self._cols:
+                col.append(None)
+            self.stamp.append(0.0)
+            self.row_version.append(0)
+            self.dirty.append(0)
+        return i
+
+    def id_of(self, symbol: str) -> Optional[int]:
+        return self._ids.get(symbol)
+
+    def symbol(self, rid: int) -> str:
+        return self._symbols[rid]
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def column(self, name: str) -> List[Optional[float]]:
+        """Alanın tüm satırları (salt okunur kullanın; None = eksik)."""
+        return self._cols[_COL[name]]
+
+    def updated_ms(self, rid: int) -> int:
+        return int(self.stamp[rid] * 1000)
+
+    # ---- okuma ----
+    def peek(self, symbol: str) -> Optional[QuoteRow]:
+        """Kota gelmiş satırın görünümü; yoksa None."""
+        i = self._ids.get(symbol)
+        if i is None or not self.stamp[i]:
+            return None
+        return self._rows[i]
+
+    def track(self, bits: int) -> None:
+        """``bits`` kolonları için dirty biti tutulmaya başlar."""
+        self._tracked |= bits
+
+    def take_dirty(self, bits: int) -> List[int]:
+        """``bits`` kolonlarından biri değişmiş satırlar; bu bitler temizlenir."""
+        d = self.dirty
+        out = [i for i in self._dirty_rows if d[i] & bits]
+        if out:
+            keep = ~bits
+            for i in out:
+                d[i] &= keep
+            self._dirty_rows = [i for i in self._dirty_rows if d[i]]
+        return out
+
+    def dirty_count(self, bits: int) -> int:
+        d = self.dirty
+        return sum(1 for i in self._dirty_rows if d[i] & bits)
+
+    # ---- yazma (senkron; await yok) ----
+    def merge(self, symbol: str, decoded: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        decode_market_quote çıktısını satıra yerinde işler ve yalnızca değişen
+        alanları döner (change_pct dahil). Değişiklik yoksa boş dict.
+        """
+        i = self._ids.get(symbol)
+        if i is None:
+            i = self.intern(symbol)
+        cols = self._cols
+        changed: Dict[str, Any] = {}
+        bits = 0
+        for key, value in decoded.items():
+            c = _COL.get(key)
+            if c is not None and value is not None:
+                col = cols[c]
+                if col[i] != value:
+                    col[i] = value
+                    changed[key] = value
+                    bits |= 1 << c
+        if not bits:
+            return changed
+
+        # change_pct yalnızca last/prev_close değiştiğinde yeniden hesaplanır;
+        # hesaplanamazsa önceki değer korunur
+        if bits & _PRICE_BITS:
+            pct = change_pct(cols[_LAST][i], cols[_PREV][i])
+            if pct is not None and pct != cols[_PCT][i]:
+                cols[_PCT][i] = pct
+                changed["change_pct"] = pct
+                bits |= _PCT_BIT
 
-    async def set(self, symbol: str, q: Dict[str, Any]) -> None:
-        async with self._lock:
-            self._q[symbol] = q
+        self.stamp[i] = time.time()
+        self.version += 1
+        self.row_version[i] = self.version
+        tracked = bits & self._tracked
+        if tracked:
+            if not self.dirty[i]:
+                self._dirty_rows.append(i)
+            self.dirty[i] |= tracked
+        if self._listeners:
+            row = self._rows[i]
+            for cb in self._listeners:
+                cb(symbol, changed, row)
+        return changed
 
-    async def get(self, symbol: str) -> Optional[Dict[str, Any]]:
-        async with self._lock:
-            return self._q.get(symbol)
+    def listen(self, cb: Callable[[str, Dict[str, Any], QuoteRow], None]) -> None:
+        """Kota değişikliklerini dinler (heatmap, sektör toplamları)."""
+        if cb not in self._listeners:
+            self._listeners.append(cb)
 
-    async def snapshot(self) -> Dict[str, Dict[str, Any]]:
-        """Return a shallow copy of the current quote map."""
-        async with self._lock:
-            return dict(self._q)
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": len(self._symbols), "version": self.version}
 
 
-quote_hub = QuoteHub()
+quote_hub = QuoteTable()
@@ -0,0 +1,159 @@
+# app/render_pool.py
+# -*- coding: utf-8 -*-
+"""
+Snapshot çizimi için sınırlı süreç havuzu.
+
+Pillow çizimi + LANCZOS + PNG kodlama CPU'ya bağlı ve GIL'i tutuyor; event
+loop'ta çalışırsa tüm canlı WebSocket akışları o süre boyunca donar. Çizim
+``spawn`` ile açılan worker süreçlerinde yapılır; her worker açılışta font
+ve taban katmanlarını hazırlar (``snapshot.warm``). ``spawn`` ana modülü
+worker'da yeniden içe aktarır; run.py bu yüzden ``__main__`` korumalıdır.
+
+Çalışan + kuyrukta bekleyen iş sayısı ``queue_max`` ile sınırlıdır; dolunca
+``PoolSaturated`` yükselir (endpoint 503 döner). Sayaç işin kendisi bitince
+düşer: zaman aşımına uğrayan iş worker'da sürdükçe yer tutar. ``start()``
+worker başına bir ısınma işi gönderir (executor süreçleri tembel açar); ilk
+istek spawn + warm süresini beklemez. Worker içi çizim süresi ve kuyrukta
+bekleme ayrı ayrı ölçülür.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+
+log = logging.getLogger("render_pool")
+
+
+class PoolSaturated(Exception):
+    """Çizim kuyruğu dolu; istemci sonra tekrar denemeli."""
+
+
+# ---- worker tarafı ----
+def _init_worker() -> None:
+    from .snapshot import warm
+
+    warm(scales=(1, 2))
+
+
+def _warm_job() -> int:
+    return os.getpid()  # ısınma _init_worker'da; iş yalnızca süreci açtırır
+
+
+def _render_job(kwargs: Dict[str, Any]) -> Tuple[bytes, float]:
+    from .snapshot import render_depth_png
+
+    t0 = time.perf_counter()
+    png = render_depth_png(**kwargs)
+    return png, (time.perf_counter() - t0) * 1000
+
+
+# ---- sunucu tarafı ----
+class RenderPool:
+    def __init__(self, workers: int = 2, queue_max: int = 8, timeout: float = 10.0) -> None:
+        self.workers = max(1, workers)
+        self.queue_max = max(self.workers, queue_max)
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight = 0
+        self._done = 0
+        self._shed = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._restarts = 0
+        self._render_ms_total = 0.0
+        self._render_ms_max = 0.0
+        self._wait_ms_total = 0.0
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            log.info("render pool started: %d workers, queue_max=%d", self.workers, self.queue_max)
+            # executor worker'ları ilk submit'te açar: her worker için bir ısınma işi
+            for _ in range(self.workers):
+                self._pool.submit(_warm_job)
+
+    def stop(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def render(self, **kwargs: Any) -> bytes:
+        """render_depth_png(**kwargs) bir worker'da; havuz doluysa PoolSaturated."""
+        if self._inflight >= self.queue_max:
+            self._shed += 1
+            raise PoolSaturated()
+        self.start()
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        try:
+            cf = self._pool.submit(_render_job, kwargs)
+            self._inflight += 1
+            # sayaç iş gerçekten bitince (ya da kuyrukta iptal edilince) düşer
+            cf.add_done_callback(lambda _f: self._call_soon(loop, self._job_done))
+            png, render_ms = await asyncio.wait_for(asyncio.wrap_future(cf), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise
+        except BrokenProcessPool:
+            # worker öldü (OOM vb.): havuzu yeniden kur
+            self._errors += 1
+            self._restarts += 1
+            log.error("render pool broken; restarting")
+            self.stop()
+            raise
+        except Exception:
+            self._errors += 1
+            raise
+        total_ms = (time.perf_counter() - t0) * 1000
+        self._done += 1
+        self._render_ms_total += render_ms
+        self._wait_ms_total += max(0.0, total_ms - render_ms)
+        if render_ms > self._render_ms_max:
+            self._render_ms_max = render_ms
+        return png
+
+    def _job_done(self) -> None:
+        self._inflight -= 1
+
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, cb) -> None:
+        # executor'ün yönetim thread'inden çağrılır
+        try:
+            loop.call_soon_threadsafe(cb)
+        except RuntimeError:
+            pass  # loop kapandı (kapanış)
+
+    def stats(self) -> Dict[str, Any]:
+        n = self._done
+        return {
+            "workers": self.workers,
+            "queue_max": self.queue_max,
+            "inflight": self._inflight,
+            "done": n,
+            "shed": self._shed,
+            "timeouts": self._timeouts,
+            "errors": self._errors,
+            "restarts": self._restarts,
+            "render_ms_avg": round(self._render_ms_total / n, 2) if n else None,
+            "render_ms_max": round(self._render_ms_max, 2),
+            "wait_ms_avg": round(self._wait_ms_total / n, 2) if n else None,
+        }
+
+
+render_pool = RenderPool(
+    workers=settings.SNAPSHOT_WORKERS,
+    queue_max=settings.SNAPSHOT_QUEUE_MAX,
+    timeout=settings.SNAPSHOT_RENDER_TIMEOUT_SEC,
+)
@@ -23,26 +23,36 @@ def _headers(jwt_token: str) -> dict:
         "Pragma": "no-cache",
     }
 
-@router.get("/api/sectoral-brief")
-async def sectoral_brief(
-    mid: Optional[str] = Query(None),
-    ngsw_bypass: Optional[bool] = Query(True, alias="ngsw-bypass")
-):
+class SectoralBriefError(Exception):
+    """Upstream sectoral-brief alınamadı; ``http_status`` proxy'nin döneceği HTTP kodu."""
+
+    def __init__(self, error: str, http_status: int = 502, **extra) -> None:
+        super().__init__(error)
+        self.error = error
+        self.http_status = http_status
+        self.extra = extra
+
+    def response(self) -> Response:
+        return Response(
+            content=json.dumps({"error": self.error, **self.extra}),
+            status_code=self.http_status,
+            media_type="application/json",
+        )
+
+
+async def load_sectoral_brief(mid: Optional[str] = None) -> list:
     """
-    Matriks sectoral-brief proxy.
-    - JWT: token_manager.get() + INITIAL_JWT fallback
-    - URL: mid paramını upstream’e geçirir; yoksa epoch ms üretir.
-    - 200 değilse 502/504 döner; 500 yerine log’la birlikte kontrollü hata.
+    sectoral-brief listesini döner (cache'li); proxy ve heatmap evreni ortak kullanır.
+    Hata durumunda SectoralBriefError.
     """
-
     # mid yoksa üret (epoch ms)
     if not mid:
         mid = str(int(time.time() * 1000))
 
-    # cache anahtarı
+    # cache anahtarı; mid verilmediyse son başarılı yanıt da geçerli
     ck = f"{mid}"
     now = time.time()
-    ent = _CACHE.get(ck)
+    ent = _CACHE.get(ck) or _CACHE.get("")
     if ent and (now - ent["t"] < _TTL):
         return ent["data"]
 
@@ -56,11 +66,7 @@ async def sectoral_brief(
         jwt_token = settings.INITIAL_JWT or ""
     if not jwt_token:
         logging.error("sectoral-brief: JWT alınamadı")
-        return Response(
-            content=json.dumps({"error": "jwt_unavailable"}),
-            status_code=502,
-            media_type="application/json",
-        )
+        raise SectoralBriefError("jwt_unavailable")
 
     # Upstream URL (mid + ngsw-bypass=true)
     upstream_url = f"https://api.matriksdata.com/dumrul/v1/sectoral-brief?mid={mid}&ngsw-bypass=true"
@@ -69,31 +75,35 @@ async def sectoral_brief(
     try:
         async with httpx.AsyncClient(timeout=8.0) as cli:
             r = await cli.get(upstream_url, headers=_headers(jwt_token))
-        if r.status_code != 200:
-            logging.error("sectoral-brief upstream %s: %s", r.status_code, r.text[:300])
-            return Response(
-                content=json.dumps({"error": "upstream_non_200", "status": r.status_code}),
-                status_code=502,
-                media_type="application/json",
-            )
-        data = r.json()
-        if not isinstance(data, list):
-            logging.error("sectoral-brief bad payload: %s", str(data)[:300])
-            return Response(
-                content=json.dumps({"error": "bad_payload"}),
-                status_code=502,
-                media_type="application/json",
-            )
-        _CACHE[ck] = {"t": now, "data": data}
-        return data
-
     except httpx.TimeoutException:
         logging.exception("sectoral-brief timeout")
-        return Response(
-            content=json.dumps({"error": "timeout"}),
-            status_code=504,
-            media_type="application/json",
-        )
+        raise SectoralBriefError("timeout", 504)
+    if r.status_code != 200:
+        logging.error("sectoral-brief upstream %s: %s", r.status_code, r.text[:300])
+        raise SectoralBriefError("upstream_non_200", status=r.status_code)
+    data = r.json()
+    if not isinstance(data, list):
+        logging.error("sectoral-brief bad payload: %s", str(data)[:300])
+        raise SectoralBriefError("bad_payload")
+    _CACHE[ck] = _CACHE[""] = {"t": now, "data": data}
+    return data
+
+
+@router.get("/api/sectoral-brief")
+async def sectoral_brief(
+    mid: Optional[str] = Query(None),
+    ngsw_bypass: Optional[bool] = Query(True, alias="ngsw-bypass")
+):
+    """
+    Matriks sectoral-brief proxy.
+    - JWT: token_manager.get() + INITIAL_JWT fallback
+    - URL: mid paramını upstream’e geçirir; yoksa epoch ms üretir.
+    - 200 değilse 502/504 döner; 500 yerine log’la birlikte kontrollü hata.
+    """
+    try:
+        return await load_sectoral_brief(mid)
+    except SectoralBriefError as e:
+        return e.response()
     except Exception:
         logging.exception("sectoral-brief unknown error")
         return Response(
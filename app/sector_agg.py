@@ -0,0 +1,200 @@
+# app/sector_agg.py
+# -*- coding: utf-8 -*-
+"""
+Sektör toplamları: /api/sectoral-brief listelerinden sektör -> üyeler
+eşlemesi ve kota geldikçe artımlı güncellenen sektör özetleri.
+
+Her sembolün son katkısı (change_pct, turnover) saklanır; yeni kota
+geldiğinde eski katkı çıkarılıp yenisi eklenir, böylece güncelleme
+sembolün üye olduğu sektör sayısı kadar iş yapar (tüm üyeler taranmaz).
+
+Satır: {sector, name, count, priced, avg_change, wchange, adv, dec, unch,
+turnover}. wchange = işlem hacmi (turnover) ağırlıklı değişim.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .heatmap import new_epoch
+from .quote_hub import quote_hub
+
+
+def parse_sectors(data: Any) -> Dict[str, Tuple[str, Tuple[str, ...]]]:
+    """sectoral-brief yanıtı -> {sektör kodu: (ad, üyeler)}."""
+    out: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+    if not isinstance(data, list):
+        return out
+    for sec in data:
+        if not isinstance(sec, dict):
+            continue
+        code = str(sec.get("symbolCode") or sec.get("code") or "").strip().upper()
+        syms = sec.get("symbols")
+        if not code or not isinstance(syms, list):
+            continue
+        members = tuple(
+            dict.fromkeys(str(s).strip().upper() for s in syms if s and str(s).strip())
+        )
+        if not members:
+            continue
+        name = str(sec.get("name") or sec.get("title") or sec.get("description") or code)
+        out[code] = (name, members)
+    return out
+
+
+class _Sector:
+    __slots__ = ("code", "name", "members", "priced", "sum_pct", "w_sum", "w_pct",
+                 "adv", "dec", "unch")
+
+    def __init__(self, code: str, name: str, members: Tuple[str, ...]) -> None:
+        self.code = code
+        self.name = name
+        self.members = members
+        self.priced = 0
+        self.sum_pct = 0.0
+        self.w_sum = 0.0
+        self.w_pct = 0.0
+        self.adv = 0
+        self.dec = 0
+        self.unch = 0
+
+    def apply(self, pct: Optional[float], turnover: float, sign: int) -> None:
+        if pct is None:
+            return
+        self.priced += sign
+        self.sum_pct += sign * pct
+        if turnover > 0:
+            self.w_sum += sign * turnover
+            self.w_pct += sign * turnover * pct
+        if pct > 0:
+            self.adv += sign
+        elif pct < 0:
+            self.dec += sign
+        else:
+            self.unch += sign
+
+    def row(self) -> Dict[str, Any]:
+        n = self.priced
+        return {
+            "sector": self.code,
+            "name": self.name,
+            "count": len(self.members),
+            "priced": n,
+            "avg_change": self.sum_pct / n if n else None,
+            "wchange": self.w_pct / self.w_sum if self.w_sum > 0 else None,
+            "adv": self.adv,
+            "dec": self.dec,
+            "unch": self.unch,
+            "turnover": self.w_sum,
+        }
+
+
+class SectorAggregator:
+    def __init__(self) -> None:
+        self._sectors: Dict[str, _Sector] = {}
+        self._of: Dict[str, Tuple[str, ...]] = {}  # sembol -> sektör kodları
+        self._contrib: Dict[str, Tuple[Optional[float], float]] = {}
+        self.epoch = new_epoch()
+        self.version = 0
+        self._changed: Set[str] = set()
+        self._sec_version: Dict[str, int] = {}
+
+    # ---- üyelik ----
+    def load(self, sectors: Dict[str, Tuple[str, Tuple[str, ...]]]) -> None:
+        """Sektör listesini (yeniden) kurar; toplamlar quote_hub'dan yeniden hesaplanır."""
+        self._sectors = {c: _Sector(c, n, m) for c, (n, m) in sectors.items()}
+        of: Dict[str, List[str]] = {}
+        for code, sec in self._sectors.items():
+            for s in sec.members:
+                of.setdefault(s, []).append(code)
+        self._of = {s: tuple(c) for s, c in of.items()}
+        self._contrib = {}
+        for s in self._of:
+            q = quote_hub.peek(s)
+            if q:
+                self.update(s, q)
+        # herkes tam liste almalı
+        self.version += 1
+        self._changed.clear()
+        self._sec_version = {c: self.version for c in self._sectors}
+
+    def universe(self) -> Tuple[str, ...]:
+        """Tüm sektörlerdeki semboller (sektör kodları hariç)."""
+        return tuple(s for s in self._of if s not in self._sectors)
+
+    def members(self, code: str) -> Tuple[str, ...]:
+        sec = self._sectors.get(code.upper())
+        return sec.members if sec else ()
+
+    # ---- artımlı güncelleme ----
+    def update(self, symbol: str, quote: Dict[str, Any]) -> bool:
+        codes = self._of.get(symbol)
+        if not codes:
+            return False
+        pct = quote.get("change_pct")
+        turnover = float(quote.get("turnover") or 0.0)
+        new = (pct, turnover)
+        old = self._contrib.get(symbol)
+        if old == new:
+            return False
+        self._contrib[symbol] = new
+        for c in codes:
+            sec = self._sectors[c]
+            if old is not None:
+                sec.apply(old[0], old[1], -1)
+            sec.apply(pct, turnover, +1)
+            self._changed.add(c)
+        return True
+
+    def on_quote(self, symbol: str, changed: Dict[str, Any], merged: Dict[str, Any]) -> bool:
+        """quote_hub dinleyicisi; bir sektör satırı değiştiyse True."""
+        if "change_pct" in changed or "turnover" in changed:
+            return self.update(symbol, merged)
+        return False
+
+    # ---- mesajlar ----
+    def _msg(self, base: Optional[int], rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        msg = {
+            "type": "sectors",
+            "epoch": self.epoch,
+            "version": self.version,
+            "ts": int(time.time() * 1000),
+            "rows": rows,
+        }
+        if base is not None:
+            msg["base"] = base
+        return msg
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Değişen sektör satırları (yeni sürümle); yoksa None."""
+        if not self._changed:
+            return None
+        changed, self._changed = self._changed, set()
+        base = self.version
+        self.version += 1
+        for c in changed:
+            self._sec_version[c] = self.version
+        rows = [self._sectors[c].row() for c in self._sectors if c in changed]
+        return self._msg(base, rows)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self._msg(None, [sec.row() for sec in self._sectors.values()])
+
+    def since(self, epoch: Optional[int], version: int) -> Dict[str, Any]:
+        if epoch != self.epoch or version < 0 or version > self.version:
+            return self.snapshot()
+        sv = self._sec_version
+        rows = [sec.row() for c, sec in self._sectors.items() if sv.get(c, 0) > version]
+        return self._msg(version, rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sectors": len(self._sectors),
+            "symbols": len(self._of),
+            "epoch": self.epoch,
+            "version": self.version,
+            "pending": len(self._changed),
+        }
+
+
+sector_agg = SectorAggregator()
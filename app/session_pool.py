@@ -0,0 +1,273 @@
+# app/session_pool.py
+# -*- coding: utf-8 -*-
+"""
+Parçalı (sharded) upstream bağlantı havuzu.
+
+Depth, trade ve market akışları sembol başına konuları bu havuz üzerinden
+açar. Her bağlantı (shard) en fazla ``max_topics`` sembol taşır; yeni sembol
+mesaj hızına (msg/s) göre en az yüklü shard'a yerleştirilir. Periyodik
+dengeleme, sıcak sembolleri yoğun shard'dan boş olana taşır:
+
+  1) hedef shard'da SUBSCRIBE (make-before-break)
+  2) hedeften ilk PUBLISH gelince sahiplik hedefe geçer
+  3) kaynak shard'da UNSUBSCRIBE
+
+Geçiş boyunca yalnızca sahip shard'ın mesajları iletilir (iki akış
+karışmaz). İki bağlantı devir anında hizalanmaz: hedefin ilk mesajı kaynağın
+zaten ilettiği bir mesajın tekrarı olabilir (trade_feed işlemleri trade_id ile
+ayıklar). Hedeften ``migrate_timeout`` içinde veri gelmezse devir verisiz
+tamamlanır.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .config import settings
+from .mqtt_session import MatrixSession, symbol_from_topic
+
+log = logging.getLogger("session_pool")
+
+SessionFactory = Callable[[Callable[[str, memoryview], Any]], MatrixSession]
+
+
+class _Shard:
+    __slots__ = ("idx", "session", "symbols")
+
+    def __init__(self, idx: int) -> None:
+        self.idx = idx
+        self.session: MatrixSession
+        self.symbols: set = set()
+
+
+class SessionPool:
+    def __init__(
+        self,
+        name: str,
+        factory: SessionFactory,
+        on_publish: Callable[[str, str, memoryview], Any],
+        max_topics: Optional[int] = None,
+        rebalance_sec: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self._factory = factory
+        self._on_publish = on_publish
+        self.max_topics = max(1, max_topics or settings.UPSTREAM_MAX_TOPICS_PER_CONN)
+        self.rebalance_sec = rebalance_sec or settings.UPSTREAM_REBALANCE_SEC
+        self.imbalance = 1.5
+        self.migrate_timeout = 10.0
+
+        self._lock = asyncio.Lock()
+        self._shards: List[_Shard] = []
+        self._next_idx = 0
+        self._owner: Dict[str, _Shard] = {}
+        self._pending: Dict[str, _Shard] = {}
+        self._pending_since: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._rate: Dict[str, float] = {}
+        self._migrations = 0
+        self._rebalance_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()  # _detach görevleri (referans tutulur)
+
+    # ---- yük ----
+    def _load(self, shard: _Shard) -> float:
+        rate = self._rate
+        return sum(rate.get(s, 0.0) for s in shard.symbols)
+
+    def _default_rate(self) -> float:
+        if not self._rate:
+            return 0.0
+        return sum(self._rate.values()) / len(self._rate)
+
+    def _occupancy(self, shard: _Shard) -> int:
+        """Taşıdığı + kendisine taşınmakta olan semboller."""
+        return len(shard.symbols) + sum(1 for p in self._pending.values() if p is shard)
+
+    def _pick_shard(self, exclude: Optional[_Shard] = None) -> Optional[_Shard]:
+        best: Optional[_Shard] = None
+        best_load = 0.0
+        for sh in self._shards:
+            if sh is exclude or self._occupancy(sh) >= self.max_topics:
+                continue
+            load = self._load(sh)
+            if best is None or load < best_load:
+                best, best_load = sh, load
+        return best
+
+    def _new_shard(self) -> _Shard:
+        idx = self._next_idx
+        self._next_idx += 1
+        shard = _Shard(idx)
+        shard.session = self._factory(self._make_handler(shard))
+        self._shards.append(shard)
+        log.info("%s: shard #%d opened", self.name, idx)
+        return shard
+
+    async def _drop_if_empty(self, shard: _Shard) -> None:
+        if shard.symbols or any(p is shard for p in self._pending.values()):
+            return
+        if shard in self._shards:
+            self._shards.remove(shard)
+            log.info("%s: shard #%d closed", self.name, shard.idx)
+            await shard.session.stop()
+
+    # ---- abonelik ----
+    async def add(self, symbol: str) -> None:
+        sym = symbol.upper()
+        async with self._lock:
+            if sym in self._owner:
+                return
+            shard = self._pick_shard() or self._new_shard()
+            shard.symbols.add(sym)
+            self._owner[sym] = shard
+            self._rate.setdefault(sym, self._default_rate())
+            shard.session.start()
+            await shard.session.add([sym])
+            self._ensure_rebalancer()
+
+    async def remove(self, symbol: str) -> None:
+        sym = symbol.upper()
+        async with self._lock:
+            shard = self._owner.pop(sym, None)
+            target = self._pending.pop(sym, None)
+            self._pending_since.pop(sym, None)
+            self._rate.pop(sym, None)
+            self._counts.pop(sym, None)
+            for sh in (shard, target):
+                if sh is None:
+                    continue
+                sh.symbols.discard(sym)
+                await sh.session.remove([sym])
+                await self._drop_if_empty(sh)
+            if not self._shards and self._rebalance_task:
+                self._rebalance_task.cancel()
+                self._rebalance_task = None
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._owner
+
+    # ---- yönlendirme ----
+    def _make_handler(self, shard: _Shard):
+        def _handler(topic: str, payload: memoryview):
+            sym = symbol_from_topic(topic)
+            if not sym:
+                return None
+            owner = self._owner.get(sym)
+            if owner is not shard:
+                if self._pending.get(sym) is not shard:
+                    return None
+                # hedef shard ilk veriyi verdi: sahipliği devret
+                self._complete_migration(sym)
+            self._counts[sym] = self._counts.get(sym, 0) + 1
+            return self._on_publish(sym, topic, payload)
+
+        return _handler
+
+    def _complete_migration(self, sym: str) -> None:
+        target = self._pending.pop(sym, None)
+        self._pending_since.pop(sym, None)
+        source = self._owner.get(sym)
+        if target is None or source is None:
+            return
+        self._owner[sym] = target
+        source.symbols.discard(sym)
+        target.symbols.add(sym)
+        self._migrations += 1
+        log.info("%s: %s migrated shard #%d -> #%d", self.name, sym, source.idx, target.idx)
+        task = asyncio.create_task(self._detach(source, sym))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("%s: detach failed", self.name, exc_info=task.exception())
+
+    async def _detach(self, shard: _Shard, sym: str) -> None:
+        async with self._lock:
+            if self._owner.get(sym) is shard:
+                return
+            await shard.session.remove([sym])
+            await self._drop_if_empty(shard)
+
+    # ---- dengeleme ----
+    def _ensure_rebalancer(self) -> None:
+        if self._rebalance_task is None or self._rebalance_task.done():
+            self._rebalance_task = asyncio.create_task(self._rebalance_loop())
+
+    async def _rebalance_loop(self) -> None:
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.rebalance_sec)
+            now = time.monotonic()
+            self._update_rates(now - last)
+            last = now
+            try:
+                await self.rebalance()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("%s: rebalance failed", self.name)
+
+    def _update_rates(self, elapsed: float) -> None:
+        if elapsed <= 0:
+            return
+        counts, self._counts = self._counts, {}
+        for sym in list(self._rate):
+            inst = counts.get(sym, 0) / elapsed
+            self._rate[sym] = 0.5 * self._rate[sym] + 0.5 * inst
+
+    async def rebalance(self) -> Optional[str]:
+        """Bir tur dengeleme: en yüklü shard'dan en uygun sembolü taşır."""
+        async with self._lock:
+            now = time.monotonic()
+            for sym, since in list(self._pending_since.items()):
+                if now - since > self.migrate_timeout:
+                    # sessiz sembol: hedeften veri gelmedi, yine de devret
+                    self._complete_migration(sym)
+
+            if len(self._shards) < 2:
+                return None
+            loads = {sh: self._load(sh) for sh in self._shards}
+            hot = max(self._shards, key=loads.__getitem__)
+            cold = self._pick_shard(exclude=hot)
+            if cold is None or len(hot.symbols) < 2:
+                return None
+            if loads[hot] <= loads[cold] * self.imbalance or loads[hot] - loads[cold] < 1.0:
+                return None
+
+            gap = (loads[hot] - loads[cold]) / 2.0
+            candidates = [s for s in hot.symbols if s not in self._pending]
+            if not candidates:
+                return None
+            sym = min(candidates, key=lambda s: abs(self._rate.get(s, 0.0) - gap))
+            if self._rate.get(sym, 0.0) >= loads[hot] - loads[cold]:
+                return None
+
+            self._pending[sym] = cold
+            self._pending_since[sym] = now
+            cold.session.start()
+            await cold.session.add([sym])
+            return sym
+
+    # ---- istatistik ----
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_topics": self.max_topics,
+            "migrations": self._migrations,
+            "pending": {s: sh.idx for s, sh in self._pending.items()},
+            "shards": [
+                {
+                    "idx": sh.idx,
+                    "connected": sh.session.connected,
+                    "topics": len(sh.symbols),
+                    "msg_rate": round(self._load(sh), 2),
+                    "hot": sorted(
+                        sh.symbols, key=lambda s: self._rate.get(s, 0.0), reverse=True
+                    )[:5],
+                }
+                for sh in self._shards
+            ],
+        }
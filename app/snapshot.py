@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import List, Dict, Tuple, Optional
+from functools import lru_cache
+from typing import List, Dict, NamedTuple, Tuple, Optional
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime
 import io
@@ -28,6 +29,12 @@ def _load_font(cands: list[str], size: int):
     return ImageFont.load_default()
 
 
+@lru_cache(maxsize=64)
+def _font(bold: bool, size: int):
+    """TrueType dosyası (boyut başına) bir kez yüklenir."""
+    return _load_font(_DEF_SANS_BOLD if bold else _DEF_SANS, size)
+
+
 # --- helpers ---
 def _fmt_qty(v) -> str:
     if v in (None, ""):
@@ -57,56 +64,214 @@ _PRESETS: dict[str, Tuple[int, int, int, int]] = {
     "wide": (1600, 900, 150, 90),
 }
 
+# Dark tema
+BG = (12, 18, 24)
+PANEL = (20, 26, 32)
+LINE = (55, 66, 77)
+TXT = (235, 240, 248)
+MUTE = (168, 178, 190)
+BID = (34, 197, 94)
+ASK = (239, 68, 68)
+ZEBRA = (24, 30, 36)
+
+# Çıktı biçimleri: ad -> (Pillow formatı, media type, dosya uzantısı)
+FORMATS: dict[str, Tuple[str, str, str]] = {
+    "png": ("PNG", "image/png", "png"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+# quality verilmezse: PNG için zlib seviyesi (0-9), WebP/JPEG için kalite (1-100)
+DEFAULT_QUALITY = {"png": 3, "webp": 80, "jpeg": 85}
+
+_STAT_LABELS = ("Önceki", "Yüksek", "Düşük", "Tavan", "Taban", "Hacim")
+_TRADE_HEADS = ("Saat", "Fiyat", "Miktar", "Alıcı", "Satıcı")
+
+
+class _Layout(NamedTuple):
+    """(preset, scale) için piksel koordinatları; taban ve dinamik katman ortak kullanır."""
+
+    width: int
+    height: int
+    W: int
+    H: int
+    scale: int
+    pad: int
+    row_h: int
+    top_y: int
+    header_h: int
+    left_x: int
+    stats_y: int
+    cols_x: Tuple[int, ...]
+    list_top: int
+    mid: int
+    base_y: int
+    trades_top: int
+    th_y: int
+    ty0: int
+    trade_dx: Tuple[int, ...]
+
+
+@lru_cache(maxsize=16)
+def _layout(size: str, scale: int) -> _Layout:
+    width, height, header_h, row_h = _PRESETS.get(size, _PRESETS["mobile"])
+    PAD = 32 * scale
+    GAP = 20 * scale
+    HEADER_H, ROW_H = header_h * scale, row_h * scale
+    top_y = PAD
+    left_x = PAD + 24 * scale
+    list_top = top_y + HEADER_H + GAP
+    base_y = list_top + 100 * scale
+    trades_top = base_y + 10 * ROW_H + 30 * scale
+    return _Layout(
+        width=width,
+        height=height,
+        W=width * scale,
+        H=height * scale,
+        scale=scale,
+        pad=PAD,
+        row_h=ROW_H,
+        top_y=top_y,
+        header_h=HEADER_H,
+        left_x=left_x,
+        stats_y=top_y + 140 * scale,
+        cols_x=tuple(left_x + dx * scale for dx in (0, 280, 530, 780, 1030, 1280)),
+        list_top=list_top,
+        mid=width * scale // 2,
+        base_y=base_y,
+        trades_top=trades_top,
+        th_y=trades_top + 60 * scale,
+        ty0=trades_top + 100 * scale,
+        trade_dx=tuple(dx * scale for dx in (0, 220, 420, 640, 920)),
+    )
 
-def render_depth_png(
+
+@lru_cache(maxsize=16)
+def _base(size: str, scale: int) -> Image.Image:
+    """
+    Değişmeyen katman: paneller, başlık etiketleri, zebra satırlar ve çapraz
+    watermark. Her çizim bunun bir kopyasına yalnızca değerleri yazar.
+    """
+    L = _layout(size, scale)
+    W, H, PAD, ROW_H = L.W, L.H, L.pad, L.row_h
+    head_f = _font(True, int(36 * scale))
+    small_f = _font(False, int(28 * scale))
+
+    img = Image.new("RGB", (W, H), BG)
+    d = ImageDraw.Draw(img)
+
+    # Header panel
+    d.rounded_rectangle(
+        (PAD, L.top_y, W - PAD, L.top_y + L.header_h),
+        radius=20 * scale,
+        fill=PANEL,
+        outline=LINE,
+        width=2,
+    )
+    for x, k in zip(L.cols_x, _STAT_LABELS):
+        d.text((x, L.stats_y), k, fill=MUTE, font=small_f)
+
+    # Depth panel (10 kademe)
+    list_top, mid = L.list_top, L.mid
+    d.rounded_rectangle(
+        (PAD, list_top, W - PAD, list_top + 10 * ROW_H + 60 * scale),
+        radius=20 * scale,
+        fill=PANEL,
+        outline=LINE,
+        width=2,
+    )
+    d.text((PAD + 24 * scale, list_top + 16 * scale), "ALIŞ", fill=BID, font=head_f)
+    d.text((mid + 24 * scale, list_top + 16 * scale), "SATIŞ", fill=ASK, font=head_f)
+    for x0 in (PAD + 24 * scale, mid + 24 * scale):
+        d.text((x0, list_top + 60 * scale), "Fiyat", fill=MUTE, font=small_f)
+        d.text((x0 + 260 * scale, list_top + 60 * scale), "Miktar", fill=MUTE, font=small_f)
+        d.text((x0 + 470 * scale, list_top + 60 * scale), "Emir#", fill=MUTE, font=small_f)
+    for i in range(0, 10, 2):
+        y = L.base_y + i * ROW_H
+        d.rectangle((PAD, y - 8 * scale, W - PAD, y + ROW_H - 8 * scale), fill=ZEBRA)
+
+    # Trades panel (son 5)
+    trades_top = L.trades_top
+    d.rounded_rectangle(
+        (PAD, trades_top, W - PAD, trades_top + 5 * ROW_H + 70 * scale),
+        radius=20 * scale,
+        fill=PANEL,
+        outline=LINE,
+        width=2,
+    )
+    d.text((PAD + 24 * scale, trades_top + 16 * scale), "Son İşlemler", fill=TXT, font=head_f)
+    for h, dx in zip(_TRADE_HEADS, L.trade_dx):
+        d.text((PAD + 24 * scale + dx, L.th_y), h, fill=MUTE, font=small_f)
+    for i in range(0, 5, 2):
+        y = L.ty0 + i * ROW_H
+        d.rectangle((PAD, y - 8 * scale, W - PAD, y + ROW_H - 8 * scale), fill=ZEBRA)
+
+    # --- WATERMARK (çapraz, iki satır) ---
+    wm_top = "Borsa Live"
+    wm_bot = "App by Yusufhan Doğan"
+    wm_f1 = _font(True, int(110 * scale))
+    wm_f2 = _font(True, int(70 * scale))
+
+    overlay = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    od = ImageDraw.Draw(overlay)
+    text_w = int(
+        max(od.textlength(wm_top, font=wm_f1), od.textlength(wm_bot, font=wm_f2))
+        + 80 * scale
+    )
+    text_h = int(200 * scale)
+    slab = Image.new("RGBA", (text_w, text_h), (0, 0, 0, 0))
+    sd = ImageDraw.Draw(slab)
+    col = (255, 255, 255, 28)  # şeffaflık
+    sd.text((0, 0), wm_top, fill=col, font=wm_f1)
+    sd.text((0, int(120 * scale)), wm_bot, fill=col, font=wm_f2)
+    slab = slab.rotate(45, expand=True)
+    cx, cy = W // 2, H // 2
+    overlay.alpha_composite(slab, dest=(cx - slab.width // 2, cy - slab.height // 2))
+    return Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
+
+
+def warm(presets=None, scales=(1, 2, 3)) -> None:
+    """Font ve taban katmanlarını önceden hazırlar (ör. worker başlangıcında)."""
+    for size in presets or _PRESETS:
+        for scale in scales:
+            _base(size, scale)
+            for bold, px in ((True, 50), (True, 36), (False, 38), (False, 28)):
+                _font(bold, int(px * scale))
+
+
+def draw_depth(
     levels: List[Dict],
     trades: List[Dict],
     symbol: str,
     quote: Optional[Dict] = None,
     size: str = "mobile",
     scale: int = 2,
-) -> bytes:
+    native: bool = False,
+) -> Image.Image:
     """
     Snapshot:
       - Üst bar: Hisse, Son Fiyat, Değişim(%) ve Değişim(TL), mini istatistik (Önceki, Yüksek, Düşük, Tavan, Taban, Hacim)
       - Orta: 10 kademe (alış/satış)
       - Alt: Son 5 işlem
       - Arka: Ortada çapraz yarı saydam watermark (iki satır)
-    """
-    width, height, header_h, row_h = _PRESETS.get(size, _PRESETS["mobile"])
-    W, H = width * scale, height * scale
-    HEADER_H, ROW_H = header_h * scale, row_h * scale
-    PAD = 32 * scale
-    GAP = 20 * scale
+    Sabit katman ``_base``'ten kopyalanır; burada yalnızca değerler çizilir.
 
-    # Dark tema
-    BG = (12, 18, 24)
-    PANEL = (20, 26, 32)
-    LINE = (55, 66, 77)
-    TXT = (235, 240, 248)
-    MUTE = (168, 178, 190)
-    BID = (34, 197, 94)
-    ASK = (239, 68, 68)
+    ``scale`` > 1 iken görüntü preset boyutuna LANCZOS ile küçültülür
+    (supersampling). ``native=True`` küçültmeyi atlar: çıktı çizim
+    çözünürlüğündedir (preset x scale); scale=1 ile en hızlı yol.
+    """
+    L = _layout(size, scale)
+    W, PAD, ROW_H = L.W, L.pad, L.row_h
 
-    title_f = _load_font(_DEF_SANS_BOLD, int(50 * scale))
-    head_f = _load_font(_DEF_SANS_BOLD, int(36 * scale))
-    num_f = _load_font(_DEF_SANS, int(38 * scale))
-    small_f = _load_font(_DEF_SANS, int(28 * scale))
+    title_f = _font(True, int(50 * scale))
+    head_f = _font(True, int(36 * scale))
+    num_f = _font(False, int(38 * scale))
+    small_f = _font(False, int(28 * scale))
 
-    img = Image.new("RGB", (W, H), BG)
+    img = _base(size, scale).copy()
     d = ImageDraw.Draw(img)
 
-    # Header panel
-    top_y = PAD
-    d.rounded_rectangle(
-        (PAD, top_y, W - PAD, top_y + HEADER_H),
-        radius=20 * scale,
-        fill=PANEL,
-        outline=LINE,
-        width=2,
-    )
-
-    left_x = PAD + 24 * scale
+    top_y = L.top_y
+    left_x = L.left_x
     ts = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
     d.text(
         (W - PAD - d.textlength(ts, font=small_f), top_y + 16 * scale),
@@ -144,13 +309,7 @@ def render_depth_png(
         font=head_f,
     )
 
-    # mini stats
-    stats_y = top_y + 140 * scale
-
-    def _label(x, text, val, col=TXT):
-        d.text((x, stats_y), text, fill=MUTE, font=small_f)
-        d.text((x, stats_y + 32 * scale), val, fill=col, font=num_f)
-
+    # mini stats (etiketler tabanda)
     ceil = (quote or {}).get("ceiling")
     floor = (quote or {}).get("floor")
     if ceil is None and isinstance(prev, (int, float)):
@@ -158,138 +317,35 @@ def render_depth_png(
     if floor is None and isinstance(prev, (int, float)):
         floor = prev * 0.90
 
-    cols_x = [
-        left_x,
-        left_x + 280 * scale,
-        left_x + 530 * scale,
-        left_x + 780 * scale,
-        left_x + 1030 * scale,
-        left_x + 1280 * scale,
-    ]
-    items = [
-        ("Önceki", _fmt_price(prev)),
-        ("Yüksek", _fmt_price(hi)),
-        ("Düşük", _fmt_price(lo)),
-        ("Tavan", _fmt_price(ceil)),
-        ("Taban", _fmt_price(floor)),
-        ("Hacim", _fmt_qty(vol)),
-    ]
-    for i, (k, v) in enumerate(items):
-        _label(
-            cols_x[i],
-            k,
-            v,
-            (
-                BID
-                if k in ("Yüksek", "Tavan")
-                else (ASK if k in ("Düşük", "Taban") else TXT)
-            ),
-        )
-
-    # Depth panel (10 kademe)
-    list_top = top_y + HEADER_H + GAP
-    d.rounded_rectangle(
-        (PAD, list_top, W - PAD, list_top + 10 * ROW_H + 60 * scale),
-        radius=20 * scale,
-        fill=PANEL,
-        outline=LINE,
-        width=2,
+    values = (
+        (_fmt_price(prev), TXT),
+        (_fmt_price(hi), BID),
+        (_fmt_price(lo), ASK),
+        (_fmt_price(ceil), BID),
+        (_fmt_price(floor), ASK),
+        (_fmt_qty(vol), TXT),
     )
-    mid = W // 2
-    d.text((PAD + 24 * scale, list_top + 16 * scale), "ALIŞ", fill=BID, font=head_f)
-    d.text((mid + 24 * scale, list_top + 16 * scale), "SATIŞ", fill=ASK, font=head_f)
-
-    def head_labels(x0):
-        d.text((x0, list_top + 60 * scale), "Fiyat", fill=MUTE, font=small_f)
-        d.text(
-            (x0 + 260 * scale, list_top + 60 * scale), "Miktar", fill=MUTE, font=small_f
-        )
-        d.text(
-            (x0 + 470 * scale, list_top + 60 * scale), "Emir#", fill=MUTE, font=small_f
-        )
-
-    head_labels(PAD + 24 * scale)
-    head_labels(mid + 24 * scale)
+    for x, (v, c) in zip(L.cols_x, values):
+        d.text((x, L.stats_y + 32 * scale), v, fill=c, font=num_f)
 
-    base_y = list_top + 100 * scale
+    # 10 kademe
+    mid = L.mid
     for i in range(10):
-        y = base_y + i * ROW_H
-        if i % 2 == 0:
-            d.rectangle(
-                (PAD, y - 8 * scale, W - PAD, y + ROW_H - 8 * scale), fill=(24, 30, 36)
-            )
+        y = L.base_y + i * ROW_H
         row = levels[i] if i < len(levels) else {}
-        d.text(
-            (PAD + 24 * scale, y),
-            _fmt_price(row.get("bid_price")),
-            fill=TXT,
-            font=num_f,
-        )
-        d.text(
-            (PAD + 24 * scale + 260 * scale, y),
-            _fmt_qty(row.get("bid_qty")),
-            fill=TXT,
-            font=num_f,
-        )
-        d.text(
-            (PAD + 24 * scale + 470 * scale, y),
-            _fmt_qty(row.get("bid_order")),
-            fill=MUTE,
-            font=num_f,
-        )
-        d.text(
-            (mid + 24 * scale, y),
-            _fmt_price(row.get("ask_price")),
-            fill=TXT,
-            font=num_f,
-        )
-        d.text(
-            (mid + 24 * scale + 260 * scale, y),
-            _fmt_qty(row.get("ask_qty")),
-            fill=TXT,
-            font=num_f,
-        )
-        d.text(
-            (mid + 24 * scale + 470 * scale, y),
-            _fmt_qty(row.get("ask_order")),
-            fill=MUTE,
-            font=num_f,
-        )
-
-    # Trades panel (son 5)
-    trades_top = base_y + 10 * ROW_H + 30 * scale
-    d.rounded_rectangle(
-        (PAD, trades_top, W - PAD, trades_top + 5 * ROW_H + 70 * scale),
-        radius=20 * scale,
-        fill=PANEL,
-        outline=LINE,
-        width=2,
-    )
-    d.text(
-        (PAD + 24 * scale, trades_top + 16 * scale),
-        "Son İşlemler",
-        fill=TXT,
-        font=head_f,
-    )
-    th_y = trades_top + 60 * scale
-    heads = [
-        ("Saat", 0),
-        ("Fiyat", 220 * scale),
-        ("Miktar", 420 * scale),
-        ("Alıcı", 640 * scale),
-        ("Satıcı", 920 * scale),
-    ]
-    for h, dx in heads:
-        d.text((PAD + 24 * scale + dx, th_y), h, fill=MUTE, font=small_f)
-
-    ty0 = trades_top + 100 * scale
+        d.text((PAD + 24 * scale, y), _fmt_price(row.get("bid_price")), fill=TXT, font=num_f)
+        d.text((PAD + 24 * scale + 260 * scale, y), _fmt_qty(row.get("bid_qty")), fill=TXT, font=num_f)
+        d.text((PAD + 24 * scale + 470 * scale, y), _fmt_qty(row.get("bid_order")), fill=MUTE, font=num_f)
+        d.text((mid + 24 * scale, y), _fmt_price(row.get("ask_price")), fill=TXT, font=num_f)
+        d.text((mid + 24 * scale + 260 * scale, y), _fmt_qty(row.get("ask_qty")), fill=TXT, font=num_f)
+        d.text((mid + 24 * scale + 470 * scale, y), _fmt_qty(row.get("ask_order")), fill=MUTE, font=num_f)
+
+    # Son 5 işlem
+    dx = L.trade_dx
+    x0 = PAD + 24 * scale
     for i in range(min(5, len(trades))):
         t = trades[i]
-        y = ty0 + i * ROW_H
-        if i % 2 == 0:
-            d.rectangle(
-                (PAD, y - 8 * scale, W - PAD, y + ROW_H - 8 * scale), fill=(24, 30, 36)
-            )
+        y = L.ty0 + i * ROW_H
         # saat
         ts = t.get("ts", 0)
         try:
@@ -308,38 +364,47 @@ def render_depth_png(
         side = (t.get("side") or "").lower()[:1]
         colp = BID if side == "b" else ASK
 
-        d.text((PAD + 24 * scale + 0, y), txt_time, fill=MUTE, font=num_f)
-        d.text((PAD + 24 * scale + 220 * scale, y), price, fill=colp, font=num_f)
-        d.text((PAD + 24 * scale + 420 * scale, y), qty, fill=colp, font=num_f)
-        d.text((PAD + 24 * scale + 640 * scale, y), str(buyer), fill=TXT, font=num_f)
-        d.text((PAD + 24 * scale + 920 * scale, y), str(seller), fill=TXT, font=num_f)
+        d.text((x0 + dx[0], y), txt_time, fill=MUTE, font=num_f)
+        d.text((x0 + dx[1], y), price, fill=colp, font=num_f)
+        d.text((x0 + dx[2], y), qty, fill=colp, font=num_f)
+        d.text((x0 + dx[3], y), str(buyer), fill=TXT, font=num_f)
+        d.text((x0 + dx[4], y), str(seller), fill=TXT, font=num_f)
 
-    # --- WATERMARK (en sonda üstte ve çapraz) ---
-    wm_top = "Borsa Live"
-    wm_bot = "App by Yusufhan Doğan"
-    wm_f1 = _load_font(_DEF_SANS_BOLD, int(110 * scale))
-    wm_f2 = _load_font(_DEF_SANS_BOLD, int(70 * scale))
+    if scale > 1 and not native:
+        img = img.resize((L.width, L.height), Image.LANCZOS)
+    return img
 
-    overlay = Image.new("RGBA", (W, H), (0, 0, 0, 0))
-    od = ImageDraw.Draw(overlay)
-    text_w = int(
-        max(od.textlength(wm_top, font=wm_f1), od.textlength(wm_bot, font=wm_f2))
-        + 80 * scale
-    )
-    text_h = int(200 * scale)
-    slab = Image.new("RGBA", (text_w, text_h), (0, 0, 0, 0))
-    sd = ImageDraw.Draw(slab)
-    col = (255, 255, 255, 28)  # şeffaflık
-    sd.text((0, 0), wm_top, fill=col, font=wm_f1)
-    sd.text((0, int(120 * scale)), wm_bot, fill=col, font=wm_f2)
-    slab = slab.rotate(45, expand=True)
-    cx, cy = W // 2, H // 2
-    overlay.alpha_composite(slab, dest=(cx - slab.width // 2, cy - slab.height // 2))
-    img = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
-
-    if scale > 1:
-        img = img.resize((width, height), Image.LANCZOS)
 
+def encode_image(img: Image.Image, fmt: str = "png", quality: Optional[int] = None) -> bytes:
+    """
+    Görüntüyü ``fmt`` biçiminde kodlar. PNG'de ``quality`` zlib seviyesidir
+    (0-9; ``optimize`` kullanılmaz, en yavaş yol ve Telegram zaten yeniden
+    sıkıştırıyor), WebP/JPEG'de kalite (1-100).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
+    q = DEFAULT_QUALITY[fmt] if quality is None else int(quality)
     buf = io.BytesIO()
-    img.save(buf, format="PNG", optimize=True)
+    if fmt == "png":
+        img.save(buf, format="PNG", compress_level=max(0, min(9, q)))
+    elif fmt == "webp":
+        img.save(buf, format="WEBP", quality=max(1, min(100, q)), method=2)
+    else:
+        img.save(buf, format="JPEG", quality=max(1, min(95, q)), subsampling="4:2:0")
     return buf.getvalue()
+
+
+def render_depth_png(
+    levels: List[Dict],
+    trades: List[Dict],
+    symbol: str,
+    quote: Optional[Dict] = None,
+    size: str = "mobile",
+    scale: int = 2,
+    fmt: str = "png",
+    quality: Optional[int] = None,
+    native: bool = False,
+) -> bytes:
+    """draw_depth + encode_image; adı geriye uyum için (fmt PNG olmayabilir)."""
+    img = draw_depth(levels, trades, symbol, quote=quote, size=size, scale=scale, native=native)
+    return encode_image(img, fmt, quality)
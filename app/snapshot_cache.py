@@ -0,0 +1,129 @@
+# app/snapshot_cache.py
+# -*- coding: utf-8 -*-
+"""
+Snapshot görüntü cache'i (single-flight).
+
+Anahtar çağıranın verdiği tuple'dır; depth/trade sürümleri anahtarda
+olduğundan veri değişince yeni anahtar oluşur. Girdiler kısa bir TTL
+sonra (görüntüdeki saat metni bayatlamasın) ve toplam bayt bütçesi
+aşılınca en eski kullanılandan (LRU) atılır.
+
+Aynı anahtar için eşzamanlı istekler tek bir çizimi bekler: ilk gelen
+``render()``'ı ayrı bir görevde başlatır, diğerleri aynı göreve bağlanır.
+Çizim hata verirse bekleyenlerin hepsi aynı hatayı alır, cache'e bir şey
+yazılmaz.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+from .config import settings
+
+
+class CachedImage(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: str  # HTTP tarih biçimi
+    created: float      # monotonic
+
+    def headers(self, max_age: int = 0) -> Dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": f"private, max-age={max_age}",
+        }
+
+
+class SnapshotCache:
+    def __init__(self, ttl: float = 3.0, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedImage]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._joined = 0
+        self._evicted = 0
+        self._render_ms_total = 0.0
+
+    def _lookup(self, key: Hashable) -> Optional[CachedImage]:
+        e = self._entries.get(key)
+        if e is None:
+            return None
+        if time.monotonic() - e.created > self.ttl:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return e
+
+    def _drop(self, key: Hashable) -> None:
+        e = self._entries.pop(key, None)
+        if e is not None:
+            self._bytes -= len(e.body)
+
+    def _store(self, key: Hashable, body: bytes) -> CachedImage:
+        e = CachedImage(
+            body=body,
+            etag='"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest(),
+            last_modified=formatdate(usegmt=True),
+            created=time.monotonic(),
+        )
+        if len(body) > self.max_bytes:
+            return e  # bütçeden büyük: döndür ama saklama
+        self._drop(key)
+        self._entries[key] = e
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes and self._entries:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= len(old.body)
+            self._evicted += 1
+        return e
+
+    async def get(self, key: Hashable, render: Callable[[], Awaitable[bytes]]) -> CachedImage:
+        """Cache'teki görüntü; yoksa ``render()`` (aynı anahtar için tek çağrı)."""
+        e = self._lookup(key)
+        if e is not None:
+            self._hits += 1
+            return e
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._misses += 1
+            task = self._inflight[key] = asyncio.create_task(self._render(key, render))
+        else:
+            self._joined += 1
+        # shield: isteği yapan istemci koparsa ortak çizim iptal olmasın
+        return await asyncio.shield(task)
+
+    async def _render(self, key: Hashable, render: Callable[[], Awaitable[bytes]]) -> CachedImage:
+        t0 = time.perf_counter()
+        try:
+            return self._store(key, await render())
+        finally:
+            self._inflight.pop(key, None)
+            self._render_ms_total += (time.perf_counter() - t0) * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        renders = self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self._hits,
+            "misses": renders,
+            "joined": self._joined,
+            "evicted": self._evicted,
+            "inflight": len(self._inflight),
+            "render_ms_avg": round(self._render_ms_total / renders, 2) if renders else None,
+        }
+
+
+snapshot_cache = SnapshotCache(
+    ttl=settings.SNAPSHOT_CACHE_TTL_SEC,
+    max_bytes=settings.SNAPSHOT_CACHE_MAX_BYTES,
+)
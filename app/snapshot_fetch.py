@@ -0,0 +1,199 @@
+# app/snapshot_fetch.py
+# -*- coding: utf-8 -*-
+"""
+Snapshot için isteğe bağlı, süre sınırlı veri toplama.
+
+İzlenmeyen sembolün depth/trade/market akışları snapshot anında açılır
+(feed'lerde birer referans); her akışın ilk mesajı ya da ``timeout`` beklenir.
+Aynı sembol için eşzamanlı istekler tek toplamayı paylaşır. Son istekten
+sonra akışlar ``linger`` saniye açık kalır: art arda basılan butonlar sıcak
+veriden çizilir, sonra referanslar bırakılır. Aynı anda en fazla
+``max_symbols`` sembol tutulur (en eski bırakılır).
+
+Veri zaten varsa beklenmez (depth/market: feed'in son durumu, trade:
+trade_hub'da işlem); yoksa ilk mesaj geçici bir abonelikle beklenir. İşlem
+olmayan sembolde trade beklemesi süre dolarak biter; sembol tutulduğu sürece
+sonraki istekler yeniden beklemez.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from .client_channel import SlowConsumer
+from .config import settings
+from .depth_feed import depth_feed
+from .market_feed import market_feed
+from .symbol_feed import SymbolFeed
+from .trade_feed import trade_feed
+from .trade_hub import trade_hub
+
+log = logging.getLogger("snapshot_fetch")
+
+
+def _has_data(feed: SymbolFeed, sym: str) -> bool:
+    if feed is trade_feed:
+        return trade_hub.version(sym) > 0
+    return feed.last(sym) is not None
+
+
+class SnapshotFetcher:
+    def __init__(
+        self,
+        feeds: Optional[List[SymbolFeed]] = None,
+        timeout: float = 2.5,
+        linger: float = 30.0,
+        max_symbols: int = 32,
+    ) -> None:
+        self.feeds: List[SymbolFeed] = feeds if feeds is not None else [depth_feed, trade_feed, market_feed]
+        self.timeout = timeout
+        self.linger = linger
+        self.max_symbols = max(1, max_symbols)
+        self._pending: Dict[str, asyncio.Task] = {}
+        # referansı tutulan semboller -> son istek (monotonic); sıra = LRU
+        self._held: "OrderedDict[str, float]" = OrderedDict()
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()  # _expire görevleri (referans tutulur)
+        # sembol -> referansı alınabilen feed'ler (yalnızca bunlar bırakılır)
+        self._acquired: Dict[str, List[SymbolFeed]] = {}
+        # tutulurken bir toplama tamamlanmış semboller: akışlar açık, beklemeye gerek yok
+        self._primed: Set[str] = set()
+        self._fetches = 0
+        self._acquisitions = 0
+        self._joined = 0
+        self._timeouts = 0
+        self._wait_ms_total = 0.0
+
+    async def fetch(self, symbol: str, timeout: Optional[float] = None) -> Dict[str, bool]:
+        """
+        Sembolün akışlarını açar ve ilk mesajları bekler; feed adı -> veri geldi mi.
+        Aynı sembol için süren bir toplama varsa ona bağlanır.
+        """
+        sym = (symbol or "").strip().upper()
+        self._fetches += 1
+        task = self._pending.get(sym)
+        if task is None:
+            self._acquisitions += 1
+            task = self._pending[sym] = asyncio.create_task(
+                self._acquire(sym, self.timeout if timeout is None else timeout)
+            )
+            task.add_done_callback(lambda _t, s=sym: self._pending.pop(s, None))
+        else:
+            self._joined += 1
+        # shield: isteği yapan istemci koparsa ortak toplama iptal olmasın
+        return await asyncio.shield(task)
+
+    async def _acquire(self, sym: str, timeout: float) -> Dict[str, bool]:
+        t0 = time.perf_counter()
+        if sym not in self._held:
+            await self._open(sym)
+        self._arm(sym)
+        if sym in self._primed:
+            ready = [_has_data(f, sym) for f in self.feeds]
+        else:
+            ready = await asyncio.gather(*(self._first(f, sym, timeout) for f in self.feeds))
+            if sym in self._held:
+                self._primed.add(sym)
+            if not all(ready):
+                self._timeouts += 1
+        out = {f.name: ok for f, ok in zip(self.feeds, ready)}
+        self._wait_ms_total += (time.perf_counter() - t0) * 1000
+        self._arm(sym)  # bekleme sonrası linger yeniden başlar
+        return out
+
+    async def _first(self, feed: SymbolFeed, sym: str, timeout: float) -> bool:
+        if _has_data(feed, sym):
+            return True
+        try:
+            q = await feed.subscribe(sym)
+        except Exception:
+            # akış açılamadı (_open'da loglandı): diğer akışların sonucunu bozmasın
+            return False
+        try:
+            await asyncio.wait_for(q.get(), timeout)
+            return True
+        except (asyncio.TimeoutError, SlowConsumer):
+            return False
+        finally:
+            await feed.unsubscribe(sym, q)
+
+    # ---- referanslar ----
+    async def _open(self, sym: str) -> None:
+        self._held[sym] = time.monotonic()
+        while len(self._held) > self.max_symbols:
+            old = next((s for s in self._held if s not in self._pending), None)
+            if old is None:
+                break
+            await self._close(old)
+        got = self._acquired[sym] = []
+        for feed in self.feeds:
+            try:
+                await feed.acquire(sym)
+            except Exception:
+                log.exception("snapshot_fetch: %s %s start failed", feed.name, sym)
+            else:
+                got.append(feed)
+
+    async def _close(self, sym: str) -> None:
+        if self._held.pop(sym, None) is None:
+            return
+        self._primed.discard(sym)
+        h = self._timers.pop(sym, None)
+        if h is not None:
+            h.cancel()
+        for feed in self._acquired.pop(sym, ()):
+            try:
+                await feed.release(sym)
+            except Exception:
+                log.exception("snapshot_fetch: %s %s stop failed", feed.name, sym)
+
+    def _arm(self, sym: str) -> None:
+        if sym not in self._held:
+            return
+        self._held[sym] = time.monotonic()
+        self._held.move_to_end(sym)
+        h = self._timers.get(sym)
+        if h is not None:
+            h.cancel()
+        self._timers[sym] = asyncio.get_running_loop().call_later(self.linger, self._expire, sym)
+
+    def _expire(self, sym: str) -> None:
+        self._timers.pop(sym, None)
+        if sym in self._pending:
+            self._arm(sym)
+            return
+        task = asyncio.create_task(self._close(sym))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("snapshot_fetch: close failed", exc_info=task.exception())
+
+    async def stop(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for sym in list(self._held):
+            await self._close(sym)
+
+    def stats(self) -> Dict[str, Any]:
+        n = self._acquisitions
+        return {
+            "held": list(self._held),
+            "fetches": self._fetches,
+            "acquisitions": n,
+            "joined": self._joined,
+            "timeouts": self._timeouts,
+            "wait_ms_avg": round(self._wait_ms_total / n, 2) if n else None,
+        }
+
+
+snapshot_fetch = SnapshotFetcher(
+    timeout=settings.SNAPSHOT_FETCH_TIMEOUT_SEC,
+    linger=settings.SNAPSHOT_FETCH_LINGER_SEC,
+    max_symbols=settings.SNAPSHOT_FETCH_MAX,
+)
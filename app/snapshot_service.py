@@ -0,0 +1,85 @@
+# app/snapshot_service.py
+# -*- coding: utf-8 -*-
+"""
+Derinlik snapshot'ı: veri toplama + cache + süreç havuzunda çizim.
+
+HTTP endpoint'i (/api/snapshot/depth.png) ve bot aynı yolu süreç içinde
+kullanır; bot kendi API'sine HTTP isteği atmaz. Dönen ``key`` veri sürümünü
+(depth, trade, kota) ve çıktı parametrelerini içerir; aynı key = aynı içerik
+(yalnızca görüntüdeki saat farklı olabilir). Bot Telegram file_id'sini bu
+key ile saklar.
+
+İzlenmeyen sembolün verisi ``snapshot_fetch`` ile kısa süreli paylaşımlı
+abonelikten toplanır; kota (önceki kapanış, tavan/taban, günlük hacim)
+quote_hub'tan gelir. Trade halkasından yalnızca son fiyat tamamlanır.
+
+Hatalar çağırana bırakılır: ``PoolSaturated`` (kuyruk dolu) ve
+``asyncio.TimeoutError`` (çizim zaman aşımı).
+"""
+from __future__ import annotations
+
+from typing import Hashable, Optional, Tuple
+
+from .depth_hub import hub as depth_hub
+from .quote_hub import quote_hub
+from .render_pool import render_pool
+from .snapshot_cache import CachedImage, snapshot_cache
+from .snapshot_fetch import snapshot_fetch
+from .trade_hub import trade_hub
+
+_QUOTE_KEYS = ("last", "prev_close", "high", "low", "ceiling", "floor", "volume")
+
+
+async def depth_snapshot(
+    symbol: str,
+    size: str = "mobile",
+    scale: int = 2,
+    fmt: str = "png",
+    quality: Optional[int] = None,
+    native: bool = False,
+) -> Tuple[Hashable, CachedImage]:
+    """(cache key, görüntü); aynı veri sürümü için tek çizim."""
+    sym = symbol.upper()
+
+    # İzlenmeyen sembol: depth/trade/market akışlarını kısa süreliğine aç ve
+    # her birinin ilk mesajını (en fazla SNAPSHOT_FETCH_TIMEOUT_SEC) bekle
+    # (akış açıkken depth_hub'daki kayıt günceldir; aynı defter tekrar gelince
+    # ts güncellenmez, yaşına bakıp beklemek sessiz sembolü boşuna bekletir)
+    await snapshot_fetch.fetch(sym)
+    entry = depth_hub.get(sym)
+
+    async def _render() -> bytes:
+        levels = entry.levels if entry is not None else []
+        trades = await trade_hub.get_last(sym, limit=5) or []
+
+        # Quote: market akışından (quote_hub). Günlük alanlar (hacim, yüksek,
+        # düşük) trade halkasından tamamlanmaz: soğuk sembolde halka yalnızca
+        # aboneliğin açık olduğu birkaç saniyeyi görür; eksikse "—" çizilir.
+        row = quote_hub.peek(sym)
+        quote = {k: row.get(k) for k in _QUOTE_KEYS} if row is not None else {}
+        if quote.get("last") is None:
+            agg = trade_hub.aggregates(sym)
+            if agg:
+                quote["last"] = agg["last"]  # son işlem fiyatı her durumda doğru
+
+        # çizim event loop dışında (süreç havuzu); canlı akışlar donmaz
+        return await render_pool.render(
+            levels=levels,
+            trades=trades,
+            symbol=sym,
+            quote=quote,
+            size=size,
+            scale=scale,
+            fmt=fmt,
+            quality=quality,
+            native=native,
+        )
+
+    # aynı veri sürümü için tek çizim; eşzamanlı istekler aynı çizimi bekler
+    rid = quote_hub.id_of(sym)
+    key = (
+        sym, size, scale, fmt, quality, native,
+        entry.version if entry is not None else 0, trade_hub.version(sym),
+        quote_hub.row_version[rid] if rid is not None else 0,
+    )
+    return key, await snapshot_cache.get(key, _render)
@@ -420,36 +420,14 @@
     if (tradesEmpty) tradesEmpty.style.display = tradesList.children.length ? "none" : "";
   }
 
-  // ================= MARKET SNAPSHOT (RawSnapshot) =================
-  function vRead(buf, i) { let x = 0n, s = 0n, b = 0; do { b = buf[i++]; x |= BigInt(b & 0x7f) << s; s += 7n; } while (b & 0x80); return [Number(x), i]; }
-  function f64(buf, i) { const dv = new DataView(buf.buffer, buf.byteOffset, buf.byteLength); const v = dv.getFloat64(i, true); return [v, i + 8]; }
-  function decodeRawSnapshot(u8) {
-    let i = 0, L = u8.length, out = {};
-    while (i < L) {
-      let tag;[tag, i] = vRead(u8, i);
-      const f = (tag >> 3), wt = (tag & 7);
-      if (wt === 1) { let v;[v, i] = f64(u8, i); out[f] = v; continue; }
-      else if (wt === 0) { let v;[v, i] = vRead(u8, i); out[f] = v; continue; }
-      else if (wt === 2) { let len;[len, i] = vRead(u8, i); i += len; continue; }
-      else if (wt === 5) { i += 4; continue; }
-      else break;
-    }
-    return out;
-  }
-  function pickFirst(...vals) { for (const v of vals) { if (v != null && Number.isFinite(v)) return v; } return undefined; }
-  function mapFields(m) {
-    const last = pickFirst(m[5], m[25]);
-    const ask  = pickFirst(m[6]);
-    const bid  = pickFirst(m[10], m[42]);
-    const high = pickFirst(m[8], m[13], m[54]);
-    const low  = pickFirst(m[12], m[55]);
-    const ceil = pickFirst(m[26], m[21]);
-    const floor= pickFirst(m[27], m[22]);
-    const vol  = pickFirst(m[14], m[48]);
-    const turn = pickFirst(m[15], m[38], m[80], m[81], m[28], m[33]);
-    const prev = pickFirst(m[9], m[62], m[47]);
-    const tcnt = pickFirst(m[60], m[61]);
-    return { last, ask, bid, high, low, ceil, floor, vol, turn, prev, tcnt };
+  // ================= MARKET SNAPSHOT (sunucuda decode edilir) =================
+  // /ws/market mesajı: {symbol, quote: {değişen alanlar}, full?}; sunucu anahtarı -> qsState anahtarı
+  const QUOTE_KEYS = { last: "last", ask: "ask", bid: "bid", high: "high", low: "low", ceiling: "ceil", floor: "floor", volume: "vol", turnover: "turn", best_bid: "prev" };
+  function applyQuote(qsState, msg) {
+    const q = msg && msg.quote; if (!q) return false;
+    if (msg.full) for (const k of Object.keys(qsState)) qsState[k] = undefined;
+    for (const k in q) { const dst = QUOTE_KEYS[k]; const v = q[k]; if (dst && v != null && Number.isFinite(v)) qsState[dst] = v; }
+    return true;
   }
 
   const col = { pos: "var(--bid)", neg: "var(--ask)", amb: "#f59e0b", ask: "var(--ask)", bid: "var(--bid)" };
@@ -484,9 +462,15 @@
   // ================= WS CONNECTORS =================
   const symParam = normSym((new URLSearchParams(location.search)).get("symbol") || (window.SYMBOL || "ASTOR"));
   const WS_ORIGIN = (location.protocol === "https:" ? "wss://" : "ws://") + location.host;
+  // wire.js yüklüyse ve sayfa ?fmt=bin ile açıldıysa ikili çerçeve müzakere edilir; yoksa JSON
+  const wsOpen = (url) => (window.MxWire ? window.MxWire.open(url) : new WebSocket(url));
+  const wsDecode = (data) => (window.MxWire ? window.MxWire.decode(data) : JSON.parse(data));
 
   // depth
   let wsDepth = null, depthConnId = 0;
+  // depth_diff.DEPTH_COLUMNS ile aynı sıra
+  const DEPTH_COLS = ["bid_order", "bid_qty", "bid_price", "ask_price", "ask_qty", "ask_order"];
+  let book = null, bookVer = null, kfPending = false;
   function connectDepth(sym) {
     buildTable();
     depthConnId++;
@@ -498,14 +482,14 @@
     if (depthEmpty) depthEmpty.style.display = "";
 
     try { wsDepth && wsDepth.close(); } catch {}
-    wsDepth = null;
+    wsDepth = null; book = null; bookVer = null; kfPending = false;
     let backoff = 800;
     function scheduleReconnect() {
       if (myId !== depthConnId) return;
       setTimeout(() => connectDepth(sym), backoff + Math.floor(Math.random()*300));
       backoff = Math.min(backoff * 1.7, 10000);
     }
-    try { wsDepth = new WebSocket(wsURL); } catch { setStatus("Bağlantı hatası"); return scheduleReconnect(); }
+    try { wsDepth = wsOpen(wsURL); } catch { setStatus("Bağlantı hatası"); return scheduleReconnect(); }
 
     wsDepth.onopen = () => { if (myId !== depthConnId) return; setStatus(`Bağlı: ${sym}`); setLive(true); backoff = 800; };
     wsDepth.onclose= () => {
@@ -523,7 +507,7 @@
     wsDepth.onmessage = (ev) => {
       if (myId !== depthConnId) return;
       try {
-        const msg = JSON.parse(ev.data);
+        const msg = wsDecode(ev.data);
         if (msg && msg.status === "reconnecting") {
           if (performance.now() - lastDepthAt >= RECO_SHOW_MS) {
             setStatus(`Yeniden bağlanıyor… (${sym})`); setLive(false);
@@ -531,8 +515,24 @@
           }
           return;
         }
+        let levels = null;
         if (msg && msg.levels && msg.levels.length) {
-          renderDepth(msg.levels);
+          // keyframe: tam tablo
+          book = msg.levels.map(r => ({ ...r })); bookVer = msg.version; kfPending = false;
+          levels = book;
+        } else if (msg && msg.patch) {
+          // yama: yalnızca ardışık sürüm uygulanır, boşlukta keyframe istenir
+          if (!book || bookVer == null || msg.version !== bookVer + 1) {
+            book = null; bookVer = null;
+            if (!kfPending) { kfPending = true; try { wsDepth.send(JSON.stringify({ op: "keyframe" })); } catch {} }
+            return;
+          }
+          for (const [i, c, v] of msg.patch) { const r = book[i]; if (r) r[DEPTH_COLS[c]] = v; }
+          bookVer = msg.version;
+          levels = book;
+        }
+        if (levels) {
+          renderDepth(levels);
           lastDepthAt = performance.now();
           setStatus(`Bağlı: ${sym}`); setLive(true);
           if (depthEmpty) depthEmpty.style.display = "none";
@@ -557,15 +557,15 @@
       setTimeout(() => connectTrades(sym), backoff + Math.floor(Math.random()*300));
       backoff = Math.min(backoff * 1.7, 10000);
     }
-    try { wsTrade = new WebSocket(url); } catch { return scheduleReconnect(); }
+    try { wsTrade = wsOpen(url); } catch { return scheduleReconnect(); }
     wsTrade.onopen = () => { if (myId !== tradeConnId) return; backoff = 800; };
     wsTrade.onclose= () => { if (myId !== tradeConnId) return; if (tradesEmpty) tradesEmpty.style.display = ""; scheduleReconnect(); };
     wsTrade.onerror = () => {};
     wsTrade.onmessage = (ev) => {
       if (myId !== tradeConnId) return;
       try {
-        if (typeof ev.data === "string" && ev.data.trim().startsWith("{")) {
-          const msg = JSON.parse(ev.data); const t = msg && msg.trade;
+        if (typeof ev.data !== "string" || ev.data.trim().startsWith("{")) {
+          const msg = wsDecode(ev.data); const t = msg && msg.trade;
           if (t) { addTrade(t); return; }
         }
       } catch {}
@@ -589,7 +589,7 @@
       setTimeout(() => connectMarket(sym), backoff + Math.floor(Math.random()*300));
       backoff = Math.min(backoff * 1.7, 10000);
     }
-    try { wsMkt = new WebSocket(url); } catch { return scheduleReconnect(); }
+    try { wsMkt = wsOpen(url); } catch { return scheduleReconnect(); }
     wsMkt.onopen = () => { if (myId !== mktConnId) return; backoff = 800; };
     wsMkt.onclose= () => { if (myId !== mktConnId) return; scheduleReconnect(); };
     wsMkt.onerror = () => {};
@@ -597,10 +597,7 @@
     wsMkt.onmessage = (ev) => {
       if (myId !== mktConnId) return;
       try {
-        const bin = atob(ev.data); const u8 = new Uint8Array(bin.length); for (let i=0;i<bin.length;i++) u8[i]=bin.charCodeAt(i);
-        const raw = decodeRawSnapshot(u8);
-        const m = mapFields(raw);
-        for (const k of Object.keys(m)) if (m[k] != null && Number.isFinite(m[k])) qsState[k] = m[k];
+        if (!applyQuote(qsState, wsDecode(ev.data))) return;
         renderSnapshot(qsState);
         lastMarketMs = performance.now();
       } catch {}
@@ -74,7 +74,12 @@
   const navAkd = qs("#navAkd");
   const drawerDepth = qs("#drawerDepth");
   const drawerAkd = qs("#drawerAkd");
-  const MAX_TILES = 60;
+  // ?view=sectors: sektör kutuları; ?sector=KOD: sektör üyeleri; varsayılan tüm evren
+  const pageParams = new URLSearchParams(location.search);
+  const hmSector = normSymbol(pageParams.get("sector"));
+  const hmView = hmSector ? "sector" : (pageParams.get("view") === "sectors" ? "sectors" : "all");
+  // tüm evrende en çok hareket edenler; sektör görünümlerinde hepsi
+  const MAX_TILES = hmView === "all" ? (Number(pageParams.get("limit")) || 60) : Infinity;
 
   const tiles = new Map();
 
@@ -151,12 +156,14 @@
     tile.appendChild(head);
     tile.appendChild(body);
 
-    tile._refs = { symEl, pctEl, lastEl };
+    tile._refs = { symEl, pctEl, lastEl, labelEl };
 
     tile.addEventListener("click", () => {
       const sym = tile.dataset.symbol;
       if (!sym) return;
-      const target = `/webapp/depth?symbol=${encodeURIComponent(sym)}`;
+      const target = hmView === "sectors"
+        ? `/webapp/heatmap?sector=${encodeURIComponent(sym)}`
+        : `/webapp/depth?symbol=${encodeURIComponent(sym)}`;
       if (window.Telegram?.WebApp) {
         try {
           window.location.href = target;
@@ -187,7 +194,13 @@
     }
 
     if (refs.pctEl) refs.pctEl.textContent = fmtPercent(pct, Math.abs(Number(pct || 0)) >= 5 ? 1 : 2);
-    if (refs.lastEl) refs.lastEl.textContent = fmtNumber(last, last && Math.abs(last) >= 100 ? 1 : 2);
+    if (payload.sector) {
+      // sektör kutusu: yükselen/düşen sayısı ve sektör adı
+      if (refs.lastEl) refs.lastEl.textContent = `${payload.adv ?? 0} ▲ / ${payload.dec ?? 0} ▼`;
+      if (refs.labelEl) refs.labelEl.textContent = payload.name || payload.sector;
+    } else if (refs.lastEl) {
+      refs.lastEl.textContent = fmtNumber(last, last && Math.abs(last) >= 100 ? 1 : 2);
+    }
 
     tile.classList.toggle("positive", Number(pct) > 0);
     tile.classList.toggle("negative", Number(pct) < 0);
@@ -245,12 +258,48 @@
   let ws = null;
   let reconnectTimer = null;
   let backoff = 2000;
+  // artımlı akış: snapshot + sürümlü deltalar; yeniden bağlanınca ?since= ile devam
+  const quoteMap = new Map();
+  // epoch: sunucu sürecinin kimliği; değişirse (yeniden başlatma) sürümler geçersiz
+  let hmEpoch = null;
+  let hmVersion = null;
+  let resumePending = false;
+
+  function applyHeatmap(data) {
+    if (data.type === "snapshot" || (data.type === "sectors" && data.base == null)) {
+      quoteMap.clear();
+    } else if (hmVersion != null && (data.epoch !== hmEpoch || data.base !== hmVersion)) {
+      // sürüm boşluğu: kaldığımız yerden iste (epoch farklıysa sunucu snapshot yollar)
+      if (!resumePending) {
+        resumePending = true;
+        try { ws.send(JSON.stringify({ op: "resume", epoch: hmEpoch, version: hmVersion })); } catch (err) { }
+      }
+      return null;
+    }
+    resumePending = false;
+    hmEpoch = data.epoch;
+    hmVersion = data.version;
+    for (const q of data.quotes || []) {
+      const sym = normSymbol(q.symbol);
+      if (sym) quoteMap.set(sym, q);
+    }
+    // sektör satırı: renk için ağırlıklı değişim (yoksa ortalama)
+    for (const r of data.rows || []) {
+      const sym = normSymbol(r.sector);
+      if (sym) quoteMap.set(sym, { ...r, symbol: sym, change_pct: r.wchange ?? r.avg_change });
+    }
+    return Array.from(quoteMap.values());
+  }
 
   function connect() {
     const proto = location.protocol === "https:" ? "wss" : "ws";
-    const url = wsPath.startsWith("ws") ? wsPath : `${proto}://${location.host}${wsPath}`;
+    let url = wsPath.startsWith("ws") ? wsPath : `${proto}://${location.host}${wsPath}`;
+    if (hmView === "sector") url += (url.includes("?") ? "&" : "?") + "sector=" + encodeURIComponent(hmSector);
+    else if (hmView === "sectors") url += (url.includes("?") ? "&" : "?") + "view=sectors";
+    if (hmVersion != null) url += (url.includes("?") ? "&" : "?") + "epoch=" + hmEpoch + "&since=" + hmVersion;
+    resumePending = false;
     try { if (ws) ws.close(); } catch (err) { }
-    ws = new WebSocket(url);
+    ws = window.MxWire ? window.MxWire.open(url) : new WebSocket(url);
     setStatus("Bağlanıyor…");
     setLive(false);
 
@@ -262,7 +311,7 @@
 
     ws.addEventListener("message", (ev) => {
       let data = null;
-      try { data = JSON.parse(ev.data); }
+      try { data = window.MxWire ? window.MxWire.decode(ev.data) : JSON.parse(ev.data); }
       catch (err) { return; }
       if (data == null) return;
       if (data.status) {
@@ -272,7 +321,8 @@
       const ts = data.ts || data.time || data.updated || data.updated_at || data.timestamp;
       const timeText = timeFromTs(ts) || timeFromTs(Date.now());
       if (timeText && lastUpdateEl) lastUpdateEl.textContent = `Son Güncelleme: ${timeText}`;
-      const arr = normalizePayload(data);
+      if (data.type === "meta") return;
+      const arr = (data.type === "snapshot" || data.type === "delta" || data.type === "sectors") ? applyHeatmap(data) : normalizePayload(data);
       if (arr && arr.length) {
         const sorted = arr
           .map((item) => ({ ...item, symbol: normSymbol(item.symbol || item.sym || item.code || item.ticker) }))
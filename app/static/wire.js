@@ -0,0 +1,82 @@
+// İkili WS çerçeve çözücüsü (sunucu: app/wire.py, alt protokol "mx.bin.v1").
+// decode(ev.data) JSON mesajlarıyla aynı şekilde nesne döner; metin mesajlar JSON.parse edilir.
+(function () {
+  "use strict";
+
+  const PROTOCOL = "mx.bin.v1";
+  const DEPTH_COLS = ["bid_order", "bid_qty", "bid_price", "ask_price", "ask_qty", "ask_order"];
+  // market_parser.QUOTE_FIELDS ile aynı sıra
+  const QUOTE_FIELDS = ["last", "bid", "ask", "high", "low", "ceiling", "floor", "volume", "turnover", "best_bid", "change_pct"];
+  const utf8 = new TextDecoder();
+
+  function reader(buf) {
+    const dv = new DataView(buf);
+    const u8 = new Uint8Array(buf);
+    let i = 0;
+    const num = (v) => (Number.isNaN(v) ? null : v);
+    return {
+      u8() { return dv.getUint8(i++); },
+      u16() { const v = dv.getUint16(i, true); i += 2; return v; },
+      u32() { const v = dv.getUint32(i, true); i += 4; return v; },
+      f64() { const v = dv.getFloat64(i, true); i += 8; return num(v); },
+      str() { const n = dv.getUint8(i++); const s = utf8.decode(u8.subarray(i, i + n)); i += n; return s; },
+    };
+  }
+
+  function decodeBinary(buf) {
+    const r = reader(buf);
+    const t = r.u8();
+    if (t === 1) {
+      const symbol = r.str(), version = r.u32(), n = r.u8();
+      const levels = [];
+      for (let k = 0; k < n; k++) {
+        const row = { level: k + 1 };
+        for (const c of DEPTH_COLS) row[c] = r.f64();
+        levels.push(row);
+      }
+      return { symbol, version, levels };
+    }
+    if (t === 2) {
+      const symbol = r.str(), version = r.u32(), n = r.u16();
+      const patch = [];
+      for (let k = 0; k < n; k++) patch.push([r.u8(), r.u8(), r.f64()]);
+      return { symbol, version, patch };
+    }
+    if (t === 3) {
+      const symbol = r.str(), trade_id = r.str(), price = r.f64(), qty = r.f64();
+      const sc = r.u8(), ts = r.f64(), buyer = r.str(), seller = r.str();
+      return { symbol, trade: { symbol, trade_id, price, qty, side: sc ? String.fromCharCode(sc) : "", ts, buyer, seller } };
+    }
+    if (t === 4) {
+      const symbol = r.str(), full = r.u8() === 1, n = r.u8();
+      const quote = {};
+      for (let k = 0; k < n; k++) { const f = r.u8(); quote[QUOTE_FIELDS[f]] = r.f64(); }
+      return full ? { symbol, quote, full } : { symbol, quote };
+    }
+    if (t === 5) {
+      const delta = r.u8() === 1, epoch = r.u32(), version = r.u32(), base = r.u32(), ts = r.f64(), n = r.u16();
+      const quotes = [];
+      for (let k = 0; k < n; k++) {
+        quotes.push({ symbol: r.str(), last: r.f64(), prev_close: r.f64(), change_pct: r.f64(), updated_at: r.f64() });
+      }
+      return delta ? { type: "delta", epoch, version, base, ts, quotes } : { type: "snapshot", epoch, version, ts, quotes };
+    }
+    return null;
+  }
+
+  function decode(data) {
+    if (typeof data === "string") return JSON.parse(data);
+    return decodeBinary(data);
+  }
+
+  // İkili format isteğe bağlıdır: sayfa URL'sinde ?fmt=bin verilirse açılır, varsayılan JSON
+  const enabled = (new URLSearchParams(location.search)).get("fmt") === "bin" && typeof TextDecoder !== "undefined";
+
+  function open(url) {
+    const ws = enabled ? new WebSocket(url, [PROTOCOL]) : new WebSocket(url);
+    ws.binaryType = "arraybuffer";
+    return ws;
+  }
+
+  window.MxWire = { PROTOCOL, decode, open };
+})();
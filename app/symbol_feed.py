@@ -0,0 +1,152 @@
+# app/symbol_feed.py
+# -*- coding: utf-8 -*-
+"""
+Referans sayımlı sembol yayını (fan-out).
+
+Bir sembol için upstream akışı yalnızca bir kez açılır; bağlı tüm istemciler
+aynı decode edilmiş mesajı kendi outbox'larından (client_channel) okur. Son
+abone ayrıldığında upstream kapatılır. Yayın hiçbir zaman istemciyi beklemez;
+taşma politikası alt sınıfın ``_outbox()`` seçimidir.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+from .client_channel import ConflatingOutbox, Outbox, summarize
+
+log = logging.getLogger("symbol_feed")
+
+
+class SymbolFeed:
+    """
+    Base class for per-symbol fan-out.
+
+    Subclasses implement ``_start(symbol)`` / ``_stop(symbol)`` to open and
+    close the upstream side and call ``publish()`` for every decoded message.
+    """
+
+    name = "feed"
+
+    def __init__(self, queue_size: int = 8) -> None:
+        self._lock = asyncio.Lock()
+        self._queue_size = max(1, queue_size)
+        self._refs: Dict[str, int] = {}
+        self._subs: Dict[str, Set[Outbox]] = {}
+        self._last: Dict[str, Any] = {}
+        # ayrılan abonelerden devreden sayaçlar
+        self._dropped = 0
+        self._conflated = 0
+        self._slow = 0
+
+    # ---- refcount ----
+    async def acquire(self, symbol: str) -> None:
+        sym = symbol.upper()
+        async with self._lock:
+            n = self._refs.get(sym, 0)
+            self._refs[sym] = n + 1
+            if n == 0:
+                log.info("%s: upstream start %s", self.name, sym)
+                try:
+                    await self._start(sym)
+                except BaseException:
+                    # başlatılamadı: referansı geri al, sonraki acquire yeniden dener
+                    self._refs.pop(sym, None)
+                    raise
+
+    async def release(self, symbol: str) -> None:
+        sym = symbol.upper()
+        async with self._lock:
+            n = self._refs.get(sym, 0)
+            if n <= 1:
+                self._refs.pop(sym, None)
+                self._last.pop(sym, None)
+                if n == 1:
+                    log.info("%s: upstream stop %s", self.name, sym)
+                    await self._stop(sym)
+            else:
+                self._refs[sym] = n - 1
+
+    # ---- subscribers ----
+    async def subscribe(self, symbol: str) -> Outbox:
+        sym = symbol.upper()
+        q = self._outbox(sym)
+        self._subs.setdefault(sym, set()).add(q)
+        last = self._prime(sym)
+        if last is not None:
+            q.offer(last)
+        try:
+            await self.acquire(sym)
+        except Exception:
+            self._discard(sym, q)
+            raise
+        return q
+
+    async def unsubscribe(self, symbol: str, q: Outbox) -> None:
+        sym = symbol.upper()
+        self._discard(sym, q)
+        await self.release(sym)
+
+    def _discard(self, sym: str, q: Outbox) -> None:
+        subs = self._subs.get(sym)
+        if subs is None or q not in subs:
+            return
+        subs.discard(q)
+        if not subs:
+            self._subs.pop(sym, None)
+        self._dropped += q.dropped
+        self._conflated += q.conflated
+        if q.overflow:
+            self._slow += 1
+
+    def publish(self, symbol: str, message: Any, keep_last: bool = True) -> int:
+        """Mesajı sembolün tüm abonelerine bırakır; taşmayı her outbox kendisi çözer."""
+        if keep_last:
+            self._last[symbol] = message
+        subs = self._subs.get(symbol)
+        if not subs:
+            return 0
+        for q in subs:
+            q.offer(message)
+        return len(subs)
+
+    def resync(self, symbol: str, q: Outbox) -> None:
+        """Bekleyenleri atıp tam durumu (_prime) koyar; delta akışlarında boşluk onarımı."""
+        msg = self._prime(symbol)
+        if msg is not None:
+            q.replace(msg)
+
+    def last(self, symbol: str) -> Optional[Any]:
+        return self._prime(symbol.upper())
+
+    def has_subscribers(self, symbol: str) -> bool:
+        return bool(self._subs.get(symbol))
+
+    def stats(self) -> Dict[str, Any]:
+        live = [q for subs in self._subs.values() for q in subs]
+        out = {
+            "symbols": len(self._refs),
+            "subscribers": len(live),
+            "dropped": self._dropped + sum(q.dropped for q in live),
+            "conflated": self._conflated + sum(q.conflated for q in live),
+            "slow_disconnects": self._slow,
+            "refs": dict(self._refs),
+        }
+        out["queues"] = summarize(live)
+        return out
+
+    # ---- hooks ----
+    def _outbox(self, symbol: str) -> Outbox:
+        """Yeni abonenin kuyruğu (varsayılan: taşmada en eskiyi at)."""
+        return ConflatingOutbox(self._queue_size)
+
+    def _prime(self, symbol: str) -> Optional[Any]:
+        """Yeni aboneye ilk gönderilecek mesaj (varsayılan: son yayın)."""
+        return self._last.get(symbol)
+
+    async def _start(self, symbol: str) -> None:
+        raise NotImplementedError
+
+    async def _stop(self, symbol: str) -> None:
+        raise NotImplementedError
@@ -0,0 +1,103 @@
+# app/trade_feed.py
+# -*- coding: utf-8 -*-
+"""
+Paylaşımlı trade akışı: izlenen semboller havuzdaki trade oturumlarına dağıtılır.
+
+Her PUBLISH konusundan sembol çözülür; oturum bir frame'deki tüm işlemleri
+tek çağrıda decode eder (trade_parser.decode_trade_frame), işlem
+trade_hub tamponuna yazılır ve o sembolün /ws/trade abonelerine dağıtılır.
+Son ``_RECENT_IDS`` trade_id'si tutulur: shard geçişinde (session_pool) ya da
+yeniden bağlanışta tekrar gelen işlem ikinci kez yazılmaz.
+"""
+from __future__ import annotations
+
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Set
+
+from .client_channel import OrderedOutbox, Outbox
+from .config import settings
+from .session_pool import SessionPool
+from .symbol_feed import SymbolFeed
+from .trade_hub import trade_hub
+from .trade_parser import normalize_trade
+from .trade_proxy import MatrixTradeSession
+
+log = logging.getLogger("trade_feed")
+
+_RECENT_IDS = 256
+
+
+class TradeFeed(SymbolFeed):
+    name = "trade"
+
+    def __init__(self) -> None:
+        super().__init__(queue_size=64)
+        self.pool = SessionPool(
+            "trade",
+            factory=lambda cb: MatrixTradeSession(
+                on_publish=cb, on_decode_error=self._decode_error
+            ),
+            on_publish=self._on_publish,
+        )
+        self._decode_errors = 0
+        self._duplicates = 0
+        self._recent: Dict[str, Deque[str]] = {}
+        self._recent_ids: Dict[str, Set[str]] = {}
+
+    async def _start(self, symbol: str) -> None:
+        await self.pool.add(symbol)
+
+    async def _stop(self, symbol: str) -> None:
+        self._recent.pop(symbol, None)
+        self._recent_ids.pop(symbol, None)
+        await self.pool.remove(symbol)
+
+    def _seen(self, sym: str, trade_id: Any) -> bool:
+        """trade_id yakın zamanda görüldüyse True; değilse kaydeder."""
+        if not trade_id:
+            return False
+        ids = self._recent_ids.get(sym)
+        if ids is None:
+            ids = self._recent_ids[sym] = set()
+            self._recent[sym] = deque()
+        if trade_id in ids:
+            return True
+        order = self._recent[sym]
+        order.append(trade_id)
+        ids.add(trade_id)
+        if len(order) > _RECENT_IDS:
+            ids.discard(order.popleft())
+        return False
+
+    def _decode_error(self) -> None:
+        self._decode_errors += 1
+
+    async def _on_publish(self, sym: str, topic: str, t: Dict[str, Any]) -> None:
+        # t: MatrixTradeSession'ın frame başına toplu çözdüğü işlem
+        if sym not in self._refs:
+            return
+        if self._seen(sym, t.get("trade_id")):
+            self._duplicates += 1
+            return
+        t = normalize_trade(t, sym)
+        try:
+            await trade_hub.add(sym, t)
+        except Exception:
+            log.exception("[%s]: trade_hub.add failed", sym)
+        # işlem akışı: her mesaj ayrı, "son değer" tutulmaz
+        self.publish(sym, {"symbol": sym, "trade": t}, keep_last=False)
+
+    def _outbox(self, symbol: str) -> Outbox:
+        # işlemler sırayla ve kayıpsız; sürekli geride kalan istemci kapatılır
+        return OrderedOutbox(self._queue_size, grace=settings.CLIENT_SLOW_GRACE_SEC)
+
+    def stats(self) -> Dict[str, Any]:
+        out = super().stats()
+        out["decode_errors"] = self._decode_errors
+        out["duplicates"] = self._duplicates
+        out["pool"] = self.pool.stats()
+        return out
+
+
+trade_feed = TradeFeed()
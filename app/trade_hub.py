@@ -1,25 +1,251 @@
 # app/trade_hub.py
-import asyncio
-from collections import deque
-from typing import Dict, Deque, Any, List
+"""
+Sembol başına kolon tabanlı (columnar) işlem halkası.
 
+Her işlem dict yerine tipli dizilere yazılır: fiyat, adet, zaman, yön ve
+aracı kurum kodları (kodlar hub genelinde intern edilip indeksle tutulur).
+Ekleme sırasında günlük hacim, tutar, VWAP, yüksek/düşük ve alış/satış
+hacmi güncellenir; son-N ve zaman penceresi sorguları yalnızca istenen
+satırları okur.
+"""
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+RING_SIZE = 400
+_DAY_MS = 86_400_000
+_TZ_OFFSET_MS = 3 * 3_600_000  # Borsa İstanbul (UTC+3) gün sınırı
+
+SIDE_NONE = 0
+SIDE_BUY = 1   # "b"
+SIDE_SELL = 2  # "a" / "s"
+_SIDE_STR = ("", "b", "a")
+
+
+def _side_code(side: Any) -> int:
+    s = (str(side or "")[:1]).lower()
+    if s == "b":
+        return SIDE_BUY
+    if s in ("a", "s"):
+        return SIDE_SELL
+    return SIDE_NONE
+
+
+class _Brokers:
+    """Aracı kurum kodu <-> küçük tamsayı (hub genelinde ortak)."""
+
+    __slots__ = ("_ids", "_names")
 
-class TradeHub:
     def __init__(self) -> None:
-        self._lock = asyncio.Lock()
-        self._store: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._ids: Dict[str, int] = {"": 0}
+        self._names: List[str] = [""]
+
+    def id(self, name: Any) -> int:
+        name = str(name or "")
+        i = self._ids.get(name)
+        if i is None:
+            i = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return i
+
+    def name(self, i: int) -> str:
+        return self._names[i]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class TradeRing:
+    __slots__ = (
+        "size", "n", "head", "_brokers",
+        "price", "qty", "ts", "side", "buyer", "seller", "trade_id",
+        "day", "count", "volume", "turnover", "buy_volume", "sell_volume",
+        "high", "low", "open", "last", "version",
+    )
+
+    def __init__(self, brokers: _Brokers, size: int = RING_SIZE) -> None:
+        self.size = size
+        self.n = 0      # dolu satır
+        self.head = 0   # bir sonraki yazma indeksi
+        self._brokers = brokers
+        self.price = array("d", bytes(8 * size))
+        self.qty = array("q", bytes(8 * size))
+        self.ts = array("q", bytes(8 * size))
+        self.side = array("B", bytes(size))
+        self.buyer = array("I", bytes(4 * size))
+        self.seller = array("I", bytes(4 * size))
+        self.trade_id: List[Optional[str]] = [None] * size
+        self.version = 0  # her add'de artar (snapshot cache anahtarı)
+        self.day = -1
+        self._reset_day(-1)
+
+    def _reset_day(self, day: int) -> None:
+        self.day = day
+        self.count = 0
+        self.volume = 0
+        self.turnover = 0.0
+        self.buy_volume = 0
+        self.sell_volume = 0
+        self.high: Optional[float] = None
+        self.low: Optional[float] = None
+        self.open: Optional[float] = None
+        self.last: Optional[float] = None
+
+    # ---- yazma ----
+    def add(self, t: Dict[str, Any]) -> None:
+        price = float(t.get("price") or 0.0)
+        qty = int(t.get("qty") or 0)
+        ts = int(t.get("ts") or 0)
+        if ts <= 0:
+            # zamansız işlem: gün 0'a düşüp günü sıfırlamasın / "önceki gün"
+            # sayılıp toplamlardan düşmesin -> alındığı an
+            ts = int(time.time() * 1000)
+        side = _side_code(t.get("side"))
 
+        i = self.head
+        self.price[i] = price
+        self.qty[i] = qty
+        self.ts[i] = ts
+        self.side[i] = side
+        self.buyer[i] = self._brokers.id(t.get("buyer"))
+        self.seller[i] = self._brokers.id(t.get("seller"))
+        self.trade_id[i] = t.get("trade_id") or None
+        self.head = i + 1 if i + 1 < self.size else 0
+        if self.n < self.size:
+            self.n += 1
+        self.version += 1
+
+        day = (ts + _TZ_OFFSET_MS) // _DAY_MS
+        if day != self.day:
+            if day < self.day:
+                return  # geç gelen önceki gün işlemi: toplamlara katma
+            self._reset_day(day)
+        self.count += 1
+        self.volume += qty
+        self.turnover += price * qty
+        if side == SIDE_BUY:
+            self.buy_volume += qty
+        elif side == SIDE_SELL:
+            self.sell_volume += qty
+        if price > 0:
+            if self.open is None:
+                self.open = price
+            if self.high is None or price > self.high:
+                self.high = price
+            if self.low is None or price < self.low:
+                self.low = price
+            self.last = price
+
+    # ---- okuma ----
+    def _row(self, i: int, symbol: str) -> Dict[str, Any]:
+        name = self._brokers.name
+        return {
+            "symbol": symbol,
+            "trade_id": self.trade_id[i],
+            "price": self.price[i],
+            "qty": self.qty[i],
+            "side": _SIDE_STR[self.side[i]],
+            "ts": self.ts[i],
+            "buyer": name(self.buyer[i]),
+            "seller": name(self.seller[i]),
+        }
+
+    def _indices(self, limit: int):
+        """En yeniden eskiye en fazla ``limit`` satır indeksi."""
+        i = self.head
+        size = self.size
+        for _ in range(min(limit, self.n)):
+            i = i - 1 if i else size - 1
+            yield i
+
+    def last_n(self, symbol: str, limit: int) -> List[Dict[str, Any]]:
+        return [self._row(i, symbol) for i in self._indices(limit)]
+
+    def since(self, symbol: str, since_ms: int, limit: int = RING_SIZE) -> List[Dict[str, Any]]:
+        out = []
+        for i in self._indices(limit):
+            if self.ts[i] < since_ms:
+                break
+            out.append(self._row(i, symbol))
+        return out
+
+    def window(self, since_ms: int) -> Dict[str, Any]:
+        """``since_ms``'ten bu yana halkadaki işlemlerin toplamları."""
+        vol = buy = sell = 0
+        turnover = 0.0
+        cnt = 0
+        for i in self._indices(self.n):
+            if self.ts[i] < since_ms:
+                break
+            q = self.qty[i]
+            cnt += 1
+            vol += q
+            turnover += self.price[i] * q
+            s = self.side[i]
+            if s == SIDE_BUY:
+                buy += q
+            elif s == SIDE_SELL:
+                sell += q
+        return {
+            "count": cnt,
+            "volume": vol,
+            "turnover": turnover,
+            "vwap": turnover / vol if vol else None,
+            "buy_volume": buy,
+            "sell_volume": sell,
+        }
+
+    def aggregates(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "volume": self.volume,
+            "turnover": self.turnover,
+            "vwap": self.turnover / self.volume if self.volume else None,
+            "buy_volume": self.buy_volume,
+            "sell_volume": self.sell_volume,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "last": self.last,
+        }
+
+
+class TradeHub:
+    def __init__(self, size: int = RING_SIZE) -> None:
+        self._size = size
+        self._brokers = _Brokers()
+        self._store: Dict[str, TradeRing] = {}
+
+    # Tek yazar (trade_feed) event loop içinde yazar; okumalar kilitsizdir.
     async def add(self, symbol: str, trade: Dict[str, Any]) -> None:
-        async with self._lock:
-            dq = self._store.setdefault(symbol, deque(maxlen=400))
-            dq.append(trade)
+        ring = self._store.get(symbol)
+        if ring is None:
+            ring = self._store[symbol] = TradeRing(self._brokers, self._size)
+        ring.add(trade)
 
     async def get_last(self, symbol: str, limit: int = 6) -> List[Dict[str, Any]]:
-        async with self._lock:
-            dq = self._store.get(symbol, deque())
-            if not dq:
-                return []
-            return list(dq)[-limit:][::-1]  # en yeniler önde
+        ring = self._store.get(symbol)
+        return ring.last_n(symbol, limit) if ring else []  # en yeniler önde
+
+    async def get_since(self, symbol: str, since_ms: int, limit: int = RING_SIZE) -> List[Dict[str, Any]]:
+        ring = self._store.get(symbol)
+        return ring.since(symbol, since_ms, limit) if ring else []
+
+    def aggregates(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Günlük hacim/tutar/VWAP/alış-satış hacmi; işlem yoksa None."""
+        ring = self._store.get(symbol)
+        return ring.aggregates() if ring and ring.count else None
+
+    def version(self, symbol: str) -> int:
+        ring = self._store.get(symbol)
+        return ring.version if ring else 0
+
+    def window(self, symbol: str, since_ms: int) -> Optional[Dict[str, Any]]:
+        ring = self._store.get(symbol)
+        return ring.window(since_ms) if ring else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"symbols": len(self._store), "brokers": len(self._brokers)}
 
 
 trade_hub = TradeHub()
@@ -1,110 +1,189 @@
 # app/trade_parser.py
 # -*- coding: utf-8 -*-
 """
-MQTT PUBLISH payload'ındaki tradefeed.Trade mesajını (proto3)
-google protobuf'a ihtiyaç duymadan decode eder.
+MQTT PUBLISH payload'ındaki tradefeed.Trade mesajının (proto3) tek,
+kanonik decoder'ı; google protobuf'a ihtiyaç duymaz.
 Alanlar:
-  1: topic (string)
-  2: symbol (string)
-  3: price (float - wire type 5, 32-bit)
-  4: qty (varint)
-  5: side (string)  -> "a" (ask / satış), "b" (bid / alış)
-  6: ts (varint)
-  7: buyer (string)
-  8: seller (string)
+  1: symbol   (string)
+  2: trade_id (string)
+  3: price    (float - wire type 5, 32-bit)
+  4: qty      (varint)
+  5: side     (string)  -> "a" (ask / satış), "b" (bid / alış)
+  6: ts       (varint)
+  7: buyer    (string)
+  8: seller   (string)
+
+Bilinen alanların tag baytları önceden tabloya çevrilir; tek baytlık
+varint'ler ve float'lar hızlı yoldan okunur. bytes ya da memoryview kabul
+edilir. decode_trades / decode_trade_frame toplu çözümleme içindir; canlı
+yol (MatrixTradeSession) her WS frame'ini decode_trade_frame ile çözer.
 """
 from __future__ import annotations
+
 import struct
-from typing import Dict, Any, Tuple
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_F32 = struct.Struct("<f").unpack_from
+
+_VARINT, _STR, _F32_T = 0, 2, 5
+
+# tag baytı -> (tip, anahtar)
+_FIELDS: Dict[int, Tuple[int, str]] = {
+    (1 << 3) | 2: (_STR, "symbol"),
+    (2 << 3) | 2: (_STR, "trade_id"),
+    (3 << 3) | 5: (_F32_T, "price"),
+    (4 << 3) | 0: (_VARINT, "qty"),
+    (5 << 3) | 2: (_STR, "side"),
+    (6 << 3) | 0: (_VARINT, "ts"),
+    (7 << 3) | 2: (_STR, "buyer"),
+    (8 << 3) | 2: (_STR, "seller"),
+}
+_DISPATCH: List[Optional[Tuple[int, str]]] = [_FIELDS.get(b) for b in range(128)]
 
 
-def _get_varint(b: bytes, i: int) -> Tuple[int, int]:
-    """varint -> (value, new_index)"""
-    val = 0
-    shift = 0
+def _varint(buf, i: int) -> Tuple[int, int]:
+    x = 0
+    s = 0
     while True:
-        if i >= len(b):
-            raise ValueError("varint out of range")
-        c = b[i]
+        b = buf[i]
         i += 1
-        val |= (c & 0x7F) << shift
-        if (c & 0x80) == 0:
-            break
-        shift += 7
-        if shift > 63:
+        x |= (b & 0x7F) << s
+        if b < 0x80:
+            return x, i
+        s += 7
+        if s > 63:
             raise ValueError("varint too long")
-    return val, i
 
 
-def _get_len_delimited(b: bytes, i: int) -> Tuple[bytes, int]:
-    ln, i = _get_varint(b, i)
-    if i + ln > len(b):
-        raise ValueError("len-delimited out of range")
-    return b[i : i + ln], i + ln
-
-
-def decode_trade(payload: bytes) -> Dict[str, Any]:
+def decode_trade(payload) -> Dict[str, Any]:
+    """Tek Trade mesajı -> dict (yalnızca mevcut alanlar). Bozuk girdide ValueError."""
     out: Dict[str, Any] = {}
+    # ~80 baytlık payload'da tek kopya, memoryview dilimlemekten ucuz (bkz. bench)
+    buf = payload if type(payload) is bytes else bytes(payload)
+    L = len(buf)
     i = 0
-    L = len(payload)
-    while i < L:
-        key, i = _get_varint(payload, i)
-        field_no = key >> 3
-        wtype = key & 0x7
-
-        if wtype == 0:  # varint
-            val, i = _get_varint(payload, i)
-            if field_no == 4:
-                out["qty"] = val
-            elif field_no == 6:
-                out["ts"] = val
-            else:
-                # başka varint alan yok şu an
-                pass
-
-        elif wtype == 2:  # length-delimited (string/bytes)
-            chunk, i = _get_len_delimited(payload, i)
-            try:
-                s = chunk.decode("utf-8", "ignore")
-            except Exception:
-                s = ""
-            if field_no == 1:
-                out["topic"] = s
-            elif field_no == 2:
-                out["symbol"] = s
-            elif field_no == 5:
-                out["side"] = s
-            elif field_no == 7:
-                out["buyer"] = s
-            elif field_no == 8:
-                out["seller"] = s
-
-        elif wtype == 5:  # 32-bit (float)
-            if i + 4 > L:
-                break
-            val = struct.unpack("<f", payload[i : i + 4])[0]
-            i += 4
-            if field_no == 3:
-                out["price"] = float(val)
-
-        else:
-            # 64-bit veya diğer tipler beklenmiyor; atla
-            if wtype == 1:  # 64-bit
+    dispatch = _DISPATCH
+    try:
+        while i < L:
+            tag = buf[i]
+            i += 1
+            spec = dispatch[tag] if tag < 0x80 else None
+            if spec is not None:
+                kind, key = spec
+                if kind == _STR:
+                    ln = buf[i]
+                    if ln < 0x80:
+                        i += 1
+                    else:
+                        ln, i = _varint(buf, i)
+                    j = i + ln
+                    if j > L:
+                        raise ValueError("len-delimited out of range")
+                    out[key] = str(buf[i:j], "utf-8", "replace")
+                    i = j
+                elif kind == _VARINT:
+                    v = buf[i]
+                    if v < 0x80:
+                        i += 1
+                    else:
+                        v, i = _varint(buf, i)
+                    out[key] = v
+                else:
+                    if i + 4 > L:
+                        raise ValueError("f32 out of range")
+                    out[key] = _F32(buf, i)[0]
+                    i += 4
+                continue
+
+            # bilinmeyen alan: tipine göre atla
+            if tag >= 0x80:
+                tag, i = _varint(buf, i - 1)
+            wt = tag & 7
+            if wt == 0:
+                _, i = _varint(buf, i)
+            elif wt == 2:
+                ln, i = _varint(buf, i)
+                i += ln
+            elif wt == 5:
+                i += 4
+            elif wt == 1:
                 i += 8
-            elif wtype == 3 or wtype == 4:
-                # start/end group (proto2), beklemiyoruz
-                pass
             else:
-                # bilinmeyen -> kır
                 break
+    except IndexError:
+        raise ValueError("truncated trade payload") from None
+    return out
+
+
+def decode_trades(payloads: Iterable) -> List[Dict[str, Any]]:
+    """Toplu çözümleme; bozuk payload'lar atlanır."""
+    out = []
+    append = out.append
+    for p in payloads:
+        try:
+            t = decode_trade(p)
+        except ValueError:
+            continue
+        if t:
+            append(t)
+    return out
+
 
-    # defaults
-    out.setdefault("topic", "")
-    out.setdefault("symbol", "")
-    out.setdefault("price", None)
-    out.setdefault("qty", None)
-    out.setdefault("side", "")
-    out.setdefault("ts", None)
-    out.setdefault("buyer", "")
-    out.setdefault("seller", "")
+def decode_trade_frame(
+    decoder, frame, on_error: Optional[Callable[[], None]] = None
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Bir WS frame'indeki tüm PUBLISH'leri tek çağrıda çözer: [(topic, trade)].
+    ``decoder``: mqtt_codec.MqttStreamDecoder (bağlantı başına). Bozuk
+    payload atlanır ve ``on_error`` çağrılır.
+    """
+    out = []
+    append = out.append
+    for topic, payload in decoder.feed(frame):
+        if not topic:
+            continue
+        try:
+            t = decode_trade(payload)
+        except ValueError:
+            if on_error is not None:
+                on_error()
+            continue
+        if t:
+            append((topic, t))
     return out
+
+
+def normalize_trade(t: dict, sym: str) -> dict:
+    if not t.get("symbol"):
+        t["symbol"] = sym
+    # side tek harf (a/b) ve küçük
+    if t.get("side"):
+        t["side"] = str(t["side"]).lower()[:1]
+    # ts mantıklı değilse şimdi
+    try:
+        ts = int(t.get("ts") or 0)
+    except Exception:
+        ts = 0
+    if ts < 1_500_000_000_000 or ts > 4_102_444_800_000:
+        ts = int(time.time() * 1000)
+    t["ts"] = ts
+    t["buyer"] = (
+        t.get("buyer") or t.get("buyer_code") or t.get("buyerTag") or t.get("b") or ""
+    )
+    t["seller"] = (
+        t.get("seller")
+        or t.get("seller_code")
+        or t.get("sellerTag")
+        or t.get("s")
+        or ""
+    )
+    try:
+        t["price"] = float(t.get("price") or 0.0)
+    except Exception:
+        t["price"] = 0.0
+    try:
+        t["qty"] = int(t.get("qty") or 0)
+    except Exception:
+        t["qty"] = 0
+    return t
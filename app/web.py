@@ -1,61 +1,53 @@
 # app/web.py
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
 from fastapi import (
+    APIRouter,
     FastAPI,
-    Request,
-    WebSocket,
-    WebSocketDisconnect,
-    Response,
     Header,
     HTTPException,
     Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
 )
-import gzip
-from typing import Optional, Dict, Any, List, Set
-import asyncio
-import base64
-import struct
-import time
-import math
-from .market_proxy import MatrixMarketClient, MatrixMarketHeatmapClient
-from .quote_hub import quote_hub
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from starlette.status import HTTP_204_NO_CONTENT
+from fastapi.templating import Jinja2Templates
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.status import HTTP_204_NO_CONTENT
 from starlette.websockets import WebSocketState
-from .market_proxy import MatrixMarketClient
-import asyncio
-import base64
-import json
-import logging
-import time
-import httpx
-import struct
-from starlette.websockets import WebSocketDisconnect
+
+from . import wire
+from .broadcast import Broadcaster
+from .client_channel import Outbox, pump
 from .config import settings
-from .depth_hub import hub
-from .snapshot import render_depth_png
-from .depth_proxy import MatrixDepthClient, token_manager
-from .trade_proxy import MatrixTradeClient
-import struct, asyncio
-from .market_proxy import MatrixMarketClient
-from .trade_proxy import MatrixTradeClient
+from .depth_feed import depth_feed
 from .depth_hub import hub as depth_hub
+from .depth_proxy import token_manager
+from .heatmap import HeatmapTracker
+from .ingest import ingest
+from .market_feed import market_feed
+from .mqtt_handshake import handshake_stats
+from .quote_hub import quote_hub
+from .render_pool import PoolSaturated, render_pool
+from .routers import symbols as symbols_router
+from .sector_agg import parse_sectors, sector_agg
+from .snapshot import FORMATS as SNAPSHOT_FORMATS
+from .snapshot_cache import snapshot_cache
+from .snapshot_fetch import snapshot_fetch
+from .snapshot_service import depth_snapshot
+from .trade_feed import trade_feed
 from .trade_hub import trade_hub
-from fastapi import Body
-from typing import Optional
-from starlette.responses import JSONResponse
-from .config import settings
-import urllib.parse
-
-# app/routers/symbols.py
-from fastapi import APIRouter, Response, Query
-import httpx, json, time, logging
-from typing import Optional
-from app.config import settings
-from app.depth_proxy import token_manager  # TokenManager (get() mevcut)
-from app.routers import symbols as symbols_router
 
 
 router = APIRouter()
@@ -389,11 +381,11 @@ templates = Jinja2Templates(directory="app/templates")
 
 
 # --- Utils ---
-async def _safe_send(ws: WebSocket, obj) -> bool:
+async def _safe_send(ws: WebSocket, obj, fmt: str = wire.JSON) -> bool:
     if ws.application_state != WebSocketState.CONNECTED:
         return False
     try:
-        await ws.send_json(obj)
+        await wire.send(ws, obj, fmt)
         return True
     except WebSocketDisconnect:
         return False
@@ -401,92 +393,108 @@ async def _safe_send(ws: WebSocket, obj) -> bool:
         log.warning("Client closed while sending: %s", e)
         return False
     except Exception:
-        log.exception("send_json failed")
+        log.exception("send failed")
         return False
 
 
+async def _drain_incoming(ws: WebSocket, on_text=None) -> None:
+    while True:
+        msg = await ws.receive()
+        if msg.get("type") == "websocket.disconnect":
+            return
+        text = msg.get("text")
+        if on_text is not None and text:
+            on_text(text)
+
+
+async def _forward_queue(
+    ws: WebSocket, queue: Outbox, on_text=None, fmt: str = wire.JSON
+) -> None:
+    """
+    Feed outbox'ını istemciye aktarır; iki taraftan biri kapanınca döner.
+    ``on_text``: istemciden gelen metin mesajları için (ör. keyframe isteği).
+    ``fmt``: wire.JSON / wire.BINARY (bağlantıda müzakere edilen).
+    Yavaş istemci (SlowConsumer) pump içinde 1013 ile kapatılır.
+    """
+    writer = asyncio.create_task(pump(ws, queue, fmt))
+    reader = asyncio.create_task(_drain_incoming(ws, on_text))
+    try:
+        await asyncio.wait({writer, reader}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        writer.cancel()
+        reader.cancel()
+        await asyncio.gather(writer, reader, return_exceptions=True)
+
+
 HEATMAP_SYMBOLS = tuple(settings.HEATMAP_SYMBOLS)
-HEATMAP_SYMBOL_SET = {s.upper() for s in HEATMAP_SYMBOLS}
-_HEATMAP_BATCH_SIZE = 20
-_heatmap_clients: Set[WebSocket] = set()
-_heatmap_clients_lock = asyncio.Lock()
+HEATMAP_ALL = settings.HEATMAP_UNIVERSE == "all"
+_heatmap = HeatmapTracker(
+    HEATMAP_SYMBOLS,
+    min_interval=settings.HEATMAP_FLUSH_MIN_SEC,
+    max_interval=settings.HEATMAP_FLUSH_MAX_SEC,
+)
+# görünüm -> yayıncı: "all" (tüm evren), "sectors" (sektör satırları),
+# "sector:KOD" (sektör üyeleri); taşan istemci kuyruğu görünümün snapshot'ı ile değiştirilir
+_heatmap_views: Dict[str, Broadcaster] = {}
 _heatmap_task_lock = asyncio.Lock()
 _heatmap_dirty = asyncio.Event()
-_heatmap_stream_task: Optional[asyncio.Task] = None
+_heatmap_universe_task: Optional[asyncio.Task] = None
 _heatmap_broadcast_task: Optional[asyncio.Task] = None
 
-if len(HEATMAP_SYMBOLS) != 60:
-    log.warning("[HEATMAP]: expected 60 symbols, got %d", len(HEATMAP_SYMBOLS))
 
+def _heatmap_members(view: str) -> frozenset:
+    return frozenset(sector_agg.members(view.split(":", 1)[1]))
 
-def _extract_symbol_from_topic(topic: str) -> Optional[str]:
-    if not topic:
-        return None
-    try:
-        tail = topic.split("/", 2)[-1]
-    except Exception:
-        return None
-    if "@" in tail:
-        tail = tail.split("@", 1)[0]
-    sym = tail.strip().upper()
-    return sym or None
 
+def _heatmap_snapshot(view: str) -> Dict[str, Any]:
+    if view == "sectors":
+        return sector_agg.snapshot()
+    if view.startswith("sector:"):
+        return _heatmap.snapshot(_heatmap_members(view))
+    return _heatmap.snapshot()
 
-def _build_heatmap_batches(quotes: List[Dict[str, Any]], ts_ms: int):
-    if not quotes:
-        return
-    batch_size = _HEATMAP_BATCH_SIZE
-    total = max(1, math.ceil(len(quotes) / batch_size))
-    for idx in range(total):
-        sl = quotes[idx * batch_size : (idx + 1) * batch_size]
-        yield {
-            "type": "batch",
-            "index": idx,
-            "total": total,
-            "ts": ts_ms,
-            "quotes": sl,
-        }
-
-
-async def _heatmap_collect_quotes() -> List[Dict[str, Any]]:
-    snap = await quote_hub.snapshot()
-    out: List[Dict[str, Any]] = []
-    for sym in HEATMAP_SYMBOLS:
-        q = snap.get(sym)
-        if not q:
-            continue
-        out.append(
-            {
-                "symbol": sym,
-                "last": q.get("last"),
-                "prev_close": q.get("prev_close"),
-                "change_pct": q.get("change_pct"),
-                "updated_at": q.get("updated_at"),
-            }
+
+def _heatmap_since(view: str, epoch: Optional[int], version: int) -> Dict[str, Any]:
+    if view == "sectors":
+        return sector_agg.since(epoch, version)
+    if view.startswith("sector:"):
+        return _heatmap.since(epoch, version, _heatmap_members(view))
+    return _heatmap.since(epoch, version)
+
+
+def _heatmap_view(view: str) -> Broadcaster:
+    b = _heatmap_views.get(view)
+    if b is None:
+        b = _heatmap_views[view] = Broadcaster(
+            f"heatmap:{view}", resync=lambda: _heatmap_snapshot(view)
         )
-    return out
+    return b
 
 
-async def _broadcast_heatmap_message(message: Dict[str, Any]) -> None:
-    async with _heatmap_clients_lock:
-        targets = list(_heatmap_clients)
-    if not targets:
-        return
-    stale: List[WebSocket] = []
-    for ws in targets:
-        try:
-            await ws.send_json(message)
-        except WebSocketDisconnect:
-            stale.append(ws)
-        except RuntimeError:
-            stale.append(ws)
-        except Exception:
-            log.exception("[HEATMAP]: send_json failed")
-            stale.append(ws)
-    if stale:
-        async with _heatmap_clients_lock:
-            for ws in stale:
-                _heatmap_clients.discard(ws)
+def _heatmap_meta(view: str) -> Dict[str, Any]:
+    if view == "sectors":
+        symbols: List[str] = []
+    elif view.startswith("sector:"):
+        members = _heatmap_members(view)
+        symbols = [s for s in _heatmap.symbols if s in members]
+    else:
+        symbols = list(_heatmap.symbols)
+    return {
+        "type": "meta",
+        "view": view,
+        "symbols": symbols,
+        "sectors": [{"sector": r["sector"], "name": r["name"]} for r in sector_agg.snapshot()["rows"]],
+    }
+
+
+def _on_heatmap_quote(symbol: str, changed: Dict[str, Any], merged: Dict[str, Any]) -> None:
+    # quote_hub dinleyicisi: market_feed her kotayı tek yerde işler
+    hit = _heatmap.mark(symbol, changed)
+    if sector_agg.on_quote(symbol, changed, merged) or hit:
+        _heatmap_dirty.set()
+
+
+quote_hub.listen(_on_heatmap_quote)
 
 
 @app.get("/webapp/news", response_class=HTMLResponse)
@@ -517,176 +525,103 @@ def heatmap_webapp(request: Request, symbol: str = "ASELS"):
 
 
 async def _heatmap_broadcast_loop():
+    # Yalnızca son flush'tan bu yana değişen semboller/sektörler, yeni sürümle gider
     try:
         while True:
             await _heatmap_dirty.wait()
             _heatmap_dirty.clear()
-            await asyncio.sleep(0.2)
-            quotes = await _heatmap_collect_quotes()
-            if not quotes:
-                continue
-            ts_ms = int(time.time() * 1000)
-            for payload in _build_heatmap_batches(quotes, ts_ms):
-                await _broadcast_heatmap_message(payload)
+            await asyncio.sleep(_heatmap.interval)
+            delta = _heatmap.flush()
+            rows = sector_agg.flush()
+            for view, b in list(_heatmap_views.items()):
+                if view == "sectors":
+                    if rows is not None:
+                        b.broadcast(rows)
+                elif delta is None:
+                    continue
+                elif view.startswith("sector:"):
+                    # boş da olsa gider: istemcinin sürümü ilerler, resume gerekmez
+                    b.broadcast(HeatmapTracker.view(delta, _heatmap_members(view)))
+                else:
+                    b.broadcast(delta)
+            if delta is not None:
+                backlog = max((b.backlog() for b in _heatmap_views.values()), default=0)
+                _heatmap.adapt(len(delta["quotes"]), backlog)
     except asyncio.CancelledError:
         pass
 
 
-async def _heatmap_stream_loop():
-    if not HEATMAP_SYMBOLS:
-        log.warning("[HEATMAP]: no symbols configured; stream loop exiting")
-        return
-    client = MatrixMarketHeatmapClient(symbols=HEATMAP_SYMBOLS)
+async def _heatmap_universe_loop():
+    """
+    Heatmap evrenini market_feed üzerinden abone tutar (SessionPool konuları
+    bağlantılara böler). Sektör listesi sectoral-brief'ten periyodik yenilenir;
+    HEATMAP_UNIVERSE=all ise evren sektörlerdeki tüm sembollerdir.
+    """
+    subscribed: Set[str] = set()
+    loaded = None
     try:
-        async for topic, payload in client.connect_and_stream():
-            sym = _extract_symbol_from_topic(topic)
-            if not sym or sym not in HEATMAP_SYMBOL_SET:
-                continue
-            decoded = _decode_market_payload(payload)
-            if not decoded:
-                continue
-            existing = await quote_hub.get(sym) or {}
-            merged = dict(existing)
-            merged["symbol"] = sym
-
-            last_old = existing.get("last") if existing else None
-            prev_old = existing.get("prev_close") if existing else None
-            prev_change_pct = existing.get("change_pct") if existing else None
-
-            last_val = decoded.get("last")
-            last_changed = False
-            if last_val is not None:
-                last_changed = last_val != last_old
-                merged["last"] = last_val
-
-            prev_val = decoded.get("prev_close")
-            prev_changed = False
-            if prev_val is not None:
-                prev_changed = prev_val != prev_old
-                merged["prev_close"] = prev_val
-
-            for key, value in decoded.items():
-                if key in {"last", "prev_close", "change_pct"}:
-                    continue
-                if value is not None:
-                    merged[key] = value
-
-            merged_last = merged.get("last")
-            merged_prev = merged.get("prev_close")
-
-            if last_changed or prev_changed:
-                if merged_last is not None and merged_prev not in (None, 0):
-                    merged["change_pct"] = (
-                        (merged_last - merged_prev) / merged_prev * 100.0
-                    )
-                else:
-                    if prev_change_pct is not None:
-                        merged["change_pct"] = prev_change_pct
-                    else:
-                        merged.pop("change_pct", None)
-            else:
-                new_change = decoded.get("change_pct")
-                if new_change is not None:
-                    merged["change_pct"] = new_change
-                elif prev_change_pct is not None:
-                    merged["change_pct"] = prev_change_pct
-                else:
-                    merged.pop("change_pct", None)
+        while True:
+            try:
+                sectors = parse_sectors(await symbols_router.load_sectoral_brief())
+            except Exception as e:
+                log.warning("[HEATMAP]: sectoral-brief alınamadı: %s", e)
+                sectors = {}
+            if sectors and sectors != loaded:
+                loaded = sectors
+                sector_agg.load(sectors)
+                log.info("[HEATMAP]: %d sectors, %d symbols", len(sectors), len(sector_agg.universe()))
+                for view, b in list(_heatmap_views.items()):
+                    if view != "all":
+                        b.broadcast(_heatmap_meta(view))
+                        b.broadcast(_heatmap_snapshot(view))
+
+            universe = sector_agg.universe() if HEATMAP_ALL and loaded else HEATMAP_SYMBOLS
+            want = set(universe)
+            for sym in universe:
+                if sym not in subscribed:
+                    # tek sembolün hatası döngüyü (ve kalan evreni) düşürmesin;
+                    # başarısız olan sonraki turda yeniden denenir
+                    try:
+                        await market_feed.acquire(sym)
+                    except Exception:
+                        log.exception("[HEATMAP]: %s subscribe failed", sym)
+                        continue
+                    subscribed.add(sym)
+            for sym in subscribed - want:
+                subscribed.discard(sym)
+                await _heatmap_release(sym)
+
+            if _heatmap.set_symbols(universe):
+                for view, b in list(_heatmap_views.items()):
+                    if view != "sectors":
+                        b.broadcast(_heatmap_meta(view))
+                        b.broadcast(_heatmap_snapshot(view))
+
+            # sektör listesi gelene kadar sık dene
+            await asyncio.sleep(settings.HEATMAP_UNIVERSE_REFRESH_SEC if loaded else 30.0)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        for sym in subscribed:
+            await _heatmap_release(sym)
 
-            merged["updated_at"] = int(time.time() * 1000)
 
-            await quote_hub.set(sym, merged)
-            _heatmap_dirty.set()
-    except asyncio.CancelledError:
-        raise
+async def _heatmap_release(sym: str) -> None:
+    try:
+        await market_feed.release(sym)
+    except Exception:
+        log.exception("[HEATMAP]: %s unsubscribe failed", sym)
 
 
 async def _ensure_heatmap_tasks() -> None:
-    global _heatmap_stream_task, _heatmap_broadcast_task
+    global _heatmap_universe_task, _heatmap_broadcast_task
     async with _heatmap_task_lock:
-        if _heatmap_stream_task is None or _heatmap_stream_task.done():
-            _heatmap_stream_task = asyncio.create_task(_heatmap_stream_loop())
+        if _heatmap_universe_task is None or _heatmap_universe_task.done():
+            _heatmap_universe_task = asyncio.create_task(_heatmap_universe_loop())
         if _heatmap_broadcast_task is None or _heatmap_broadcast_task.done():
             _heatmap_broadcast_task = asyncio.create_task(_heatmap_broadcast_loop())
 
 
-async def _heatmap_send_snapshot(ws: WebSocket) -> None:
-    quotes = await _heatmap_collect_quotes()
-    if not quotes:
-        return
-    ts_ms = int(time.time() * 1000)
-    for payload in _build_heatmap_batches(quotes, ts_ms):
-        await ws.send_json(payload)
-
-
-# ---- minimal protobuf-like decoder for Trade ----
-# fields: 1=symbol(str), 2=trade_id(str), 3=price(f32), 4=qty(varint),
-#         5=side(str),   6=ts(varint),    7=buyer(str),  8=seller(str)
-def _read_varint(buf: bytes, i: int):
-    x = 0
-    s = 0
-    while True:
-        b = buf[i]
-        i += 1
-        x |= (b & 0x7F) << s
-        if not (b & 0x80):
-            break
-        s += 7
-    return x, i
-
-
-def _read_len_delim(buf: bytes, i: int):
-    ln, i = _read_varint(buf, i)
-    j = i + ln
-    return buf[i:j], j
-
-
-def _read_f32_le(buf: bytes, i: int):
-    v = struct.unpack_from("<f", buf, i)[0]
-    return float(v), i + 4
-
-
-def _decode_trade_payload(u8: bytes) -> dict:
-    out = {}
-    i = 0
-    L = len(u8)
-    while i < L:
-        tag, i = _read_varint(u8, i)
-        field_no = tag >> 3
-        wt = tag & 7
-        if wt == 0:  # varint
-            v, i = _read_varint(u8, i)
-            if field_no == 4:
-                out["qty"] = v
-            elif field_no == 6:
-                out["ts"] = v
-        elif wt == 2:  # len-delimited (strings)
-            s, i = _read_len_delim(u8, i)
-            try:
-                val = s.decode("utf-8")
-            except Exception:
-                val = ""
-            if field_no == 1:
-                out["symbol"] = val
-            elif field_no == 2:
-                out["trade_id"] = val
-            elif field_no == 5:
-                out["side"] = val
-            elif field_no == 7:
-                out["buyer"] = val
-            elif field_no == 8:
-                out["seller"] = val
-        elif wt == 5:  # 32-bit (price)
-            v, i = _read_f32_le(u8, i)
-            if field_no == 3:
-                out["price"] = v
-        elif wt == 1:  # 64-bit skip
-            i += 8
-        else:
-            break
-    return out
-
-
 # --- Health ---
 @app.get("/healthz")
 def healthz():
@@ -711,504 +646,76 @@ def depth_webapp(request: Request, symbol: str):
 # --- DEPTH WS ---
 @app.websocket("/ws/depth/{symbol}")
 async def ws_depth(websocket: WebSocket, symbol: str):
-    await websocket.accept()
+    fmt = await wire.accept(websocket)
     sym = (symbol or "").upper()
     cid = f"{sym}#{id(websocket) & 0xFFFFFF:x}"
     log.info("[%s]: client connected (DEPTH)", cid)
 
-    depth_client = MatrixDepthClient(
-        symbol=sym,
-        connect_template_b64=settings.CONNECT_TEMPLATE_B64,
-    )
+    if not await _safe_send(websocket, {"status": "connected", "symbol": sym}):
+        return
+
+    # Tek upstream, çok istemci: depth_feed sembol başına bir bağlantı tutar
+    ingest.touch(sym)
+    queue = await depth_feed.subscribe(sym)
 
-    async def safe_send(obj) -> bool:
-        if websocket.application_state != WebSocketState.CONNECTED:
-            return False
+    def _on_text(text: str) -> None:
+        # istemci sürüm boşluğu gördü: kuyruğu tam tabloyla değiştir
         try:
-            await websocket.send_json(obj)
-            return True
-        except WebSocketDisconnect:
-            return False
+            op = json.loads(text).get("op")
         except Exception:
-            log.exception("[%s]: send_json failed", cid)
-            return False
-
-    await safe_send({"status": "connected", "symbol": sym})
+            return
+        if op == "keyframe":
+            depth_feed.resync(sym, queue)
 
-    backoff = 0.8
     try:
-        while websocket.application_state == WebSocketState.CONNECTED:
-            try:
-                async for levels in depth_client.connect_and_stream():
-                    # >>> HUBLARI BESLE <<<
-                    try:
-                        await depth_hub.set(sym, levels)
-                    except Exception:
-                        log.exception("[%s]: depth_hub.set failed", cid)
-
-                    ok = await safe_send({"symbol": sym, "levels": levels})
-                    if not ok:
-                        return
-                    backoff = 0.8
-            except WebSocketDisconnect:
-                return
-            except Exception:
-                log.error(
-                    "[%s]: depth runner error; retrying shortly", cid, exc_info=True
-                )
-                await safe_send({"status": "reconnecting"})
-                await asyncio.sleep(backoff)
-                backoff = min(backoff * 1.7, 10.0)
+        await _forward_queue(websocket, queue, _on_text, fmt)
     finally:
+        await depth_feed.unsubscribe(sym, queue)
         log.info("[%s]: client disconnected (DEPTH)", cid)
 
 
 # --- TRADE WS (JSON standardize) ---
 @app.websocket("/ws/trade/{symbol}")
 async def ws_trade(ws: WebSocket, symbol: str):
-    await ws.accept()
+    fmt = await wire.accept(ws)
     sym = (symbol or "").upper()
     cid = f"TRADE#{sym}"
     log.info("[%s]: client connected", cid)
 
-    # <-- BURADA: tuple/list gelirse düzelt
-    raw_tmpl = (
-        getattr(settings, "TRADE_CONNECT_TEMPLATE_B64", "")
-        or settings.CONNECT_TEMPLATE_B64
-    )
-    if isinstance(raw_tmpl, (tuple, list)):
-        raw_tmpl = raw_tmpl[0] if raw_tmpl else ""
-    tmpl_b64 = (raw_tmpl or "").strip()
-
-    client = MatrixTradeClient(
-        symbol=sym,
-        connect_template_b64=tmpl_b64,
-    )
-
-    # bytes gelirse son çare minidecoder; dict gelirse aynen kullanırız
-    import struct
-
-    def _read_varint(buf: bytes, i: int):
-        x = 0
-        s = 0
-        while True:
-            b = buf[i]
-            i += 1
-            x |= (b & 0x7F) << s
-            if not (b & 0x80):
-                break
-            s += 7
-        return x, i
-
-    def _read_len(buf: bytes, i: int):
-        ln, i = _read_varint(buf, i)
-        j = i + ln
-        return buf[i:j], j
-
-    def _read_f32(buf: bytes, i: int):
-        return float(struct.unpack_from("<f", buf, i)[0]), i + 4
-
-    def _mini_decode(u8: bytes) -> dict:
-        out = {}
-        i = 0
-        L = len(u8)
-        while i < L:
-            tag, i = _read_varint(u8, i)
-            f, wt = tag >> 3, tag & 7
-            if wt == 0:
-                v, i = _read_varint(u8, i)
-                if f == 4:
-                    out["qty"] = v
-                elif f == 6:
-                    out["ts"] = v
-            elif wt == 2:
-                s, i = _read_len(u8, i)
-                try:
-                    s = s.decode("utf-8")
-                except:
-                    s = ""
-                if f == 1:
-                    out["symbol"] = s
-                elif f == 2:
-                    out["trade_id"] = s
-                elif f == 5:
-                    out["side"] = s
-                elif f == 7:
-                    out["buyer"] = s
-                elif f == 8:
-                    out["seller"] = s
-            elif wt == 5:
-                v, i = _read_f32(u8, i)
-                if f == 3:
-                    out["price"] = v
-            elif wt == 1:
-                i += 8
-            else:
-                break
-        return out
-
-    def _normalize(t: dict) -> dict:
-        # sembol zorunlu değilse sabitle
-        if not t.get("symbol"):
-            t["symbol"] = sym
-        # side tek harf (a/b) ve küçük
-        if t.get("side"):
-            t["side"] = str(t["side"]).lower()[:1]
-        # ts mantıklı değilse şimdi
-        try:
-            ts = int(t.get("ts") or 0)
-        except:
-            ts = 0
-        if ts < 1_500_000_000_000 or ts > 4_102_444_800_000:
-            import time as _time
-
-            t["ts"] = int(_time.time() * 1000)
-        else:
-            t["ts"] = ts
-        # fallback anahtar isimleri (buyer/seller)
-        t["buyer"] = (
-            t.get("buyer")
-            or t.get("buyer_code")
-            or t.get("buyerTag")
-            or t.get("b")
-            or ""
-        )
-        t["seller"] = (
-            t.get("seller")
-            or t.get("seller_code")
-            or t.get("sellerTag")
-            or t.get("s")
-            or ""
-        )
-        # sayı tipleri
-        try:
-            t["price"] = float(t.get("price") or 0.0)
-        except:
-            t["price"] = 0.0
-        try:
-            t["qty"] = int(t.get("qty") or 0)
-        except:
-            t["qty"] = 0
-        return t
-
-    backoff = 0.8
+    # Tüm semboller tek trade oturumunda; her PUBLISH bir kez decode edilir
+    ingest.touch(sym)
+    queue = await trade_feed.subscribe(sym)
     try:
-        while ws.application_state == WebSocketState.CONNECTED:
-            try:
-                async for item in client.connect_and_stream():
-                    if isinstance(item, dict):
-                        t = _normalize(item)
-                        # >>> HUBLARI BESLE <<<
-                        try:
-                            await trade_hub.add(sym, t)
-                        except Exception:
-                            log.exception("[%s]: trade_hub.add failed", cid)
-                        try:
-                            await ws.send_json({"symbol": sym, "trade": t})
-                        except WebSocketDisconnect:
-                            return
-                        except Exception:
-                            log.exception("[%s]: send_json failed", cid)
-                        continue
-
-                    if isinstance(item, (bytes, bytearray)):
-                        try:
-                            t = _mini_decode(bytes(item))
-                            if t:
-                                t = _normalize(t)
-                                try:
-                                    await trade_hub.add(sym, t)
-                                except Exception:
-                                    log.exception(
-                                        "[%s]: trade_hub.add failed (bytes)", cid
-                                    )
-                                await ws.send_json({"symbol": sym, "trade": t})
-                                continue
-                        except Exception:
-                            pass
-                        try:
-                            import base64
-
-                            b64 = base64.b64encode(bytes(item)).decode("ascii")
-                            await ws.send_text(b64)
-                        except WebSocketDisconnect:
-                            return
-
-            except WebSocketDisconnect:
-                return
-            except Exception:
-                log.exception("[%s]: trade runner error; retry", cid)
-                await asyncio.sleep(backoff)
-                backoff = min(backoff * 1.7, 10.0)
+        await _forward_queue(ws, queue, fmt=fmt)
     finally:
+        await trade_feed.unsubscribe(sym, queue)
         log.info("[%s]: client disconnected", cid)
 
 
-def _vread(u8, i):
-    x = 0
-    s = 0
-    while True:
-        b = u8[i]
-        i += 1
-        x |= (b & 0x7F) << s
-        if not (b & 0x80):
-            break
-        s += 7
-    return x, i
-
-
-def _f64(u8, i):
-    v = struct.unpack_from("<d", u8, i)[0]
-    return float(v), i + 8
-
-
-def _decode_market_payload(raw: bytes) -> dict:
-    """raw → {last, bid, ask, high, low, ceiling, floor, volume, prev_close, change_pct}"""
-    u8 = raw
-    i = 0
-    L = len(u8)
-    m = {}
-    while i < L:
-        tag, i = _vread(u8, i)
-        f, wt = (tag >> 3), (tag & 7)
-        if wt == 1:
-            v, i = _f64(u8, i)
-            m[f] = v
-        elif wt == 0:
-            v, i = _vread(u8, i)
-            m[f] = float(v)
-        elif wt == 2:
-            ln, i = _vread(u8, i)
-            i += ln
-        elif wt == 5:
-            i += 4
-        else:
-            break
-
-    def first(*keys):
-        for k in keys:
-            v = m.get(k)
-            if v is not None:
-                return v
-        return None
-
-    last = first(5, 25)
-    bid = first(10, 42)
-    ask = first(6)
-    high = first(8, 13, 54)
-    low = first(12, 55)
-    ceil = first(26, 21)
-    floor = first(27, 22)
-    vol = first(14, 48)
-    prev = first(9, 62, 47)  # provider "prev_close" (ekranda alış olarak kullanıyorduk)
-    # fark hesabında GERÇEK ÖNCEKİ = bid (bizim kural)
-    change_pct = None
-    if last is not None and bid not in (None, 0):
-        change_pct = (last - bid) / bid * 100.0
-
-    return {
-        "last": last,
-        "bid": bid,
-        "ask": ask,
-        "high": high,
-        "low": low,
-        "ceiling": ceil,
-        "floor": floor,
-        "volume": vol,
-        "prev_close": bid,
-        "change_pct": change_pct,
-    }
-
-
-async def _get_quote_once(symbol: str, timeout: float = 1.0) -> dict:
-    """Market WS’den tek paket alır."""
-    cli = MatrixMarketClient(
-        symbol=symbol,
-        connect_template_b64=getattr(settings, "MARKET_CONNECT_TEMPLATE_B64", "")
-        or settings.CONNECT_TEMPLATE_B64,
-    )
-    try:
-
-        async def _runner():
-            async for payload in cli.connect_and_stream():
-                return _decode_market_payload(payload)
-
-        return await asyncio.wait_for(_runner(), timeout=timeout)
-    except Exception:
-        return {}
-
-
-def _norm_trade(t: dict, sym: str) -> dict:
-    if not t.get("symbol"):
-        t["symbol"] = sym
-    t["buyer"] = (
-        t.get("buyer") or t.get("buyer_code") or t.get("buyerTag") or t.get("b") or ""
-    )
-    t["seller"] = (
-        t.get("seller")
-        or t.get("seller_code")
-        or t.get("sellerTag")
-        or t.get("s")
-        or ""
-    )
-    try:
-        t["price"] = float(t.get("price") or 0.0)
-    except:
-        t["price"] = 0.0
-    try:
-        t["qty"] = int(t.get("qty") or 0)
-    except:
-        t["qty"] = 0
-    if t.get("side"):
-        t["side"] = str(t["side"]).lower()[:1]
-    try:
-        ts = int(t.get("ts") or 0)
-        if ts < 1_500_000_000_000 or ts > 4_102_444_800_000:
-            import time as _time
-
-            ts = int(_time.time() * 1000)
-    except:
-        import time as _time
-
-        ts = int(_time.time() * 1000)
-    t["ts"] = ts
-    return t
-
-
-async def _collect_last_trades(
-    symbol: str, n: int = 5, timeout: float = 1.2
-) -> list[dict]:
-    """Kısa bir süre dinleyip ilk N işlemi alır."""
-    client = MatrixTradeClient(
-        symbol=symbol,
-        connect_template_b64=(
-            getattr(settings, "TRADE_CONNECT_TEMPLATE_B64", "")
-            or settings.CONNECT_TEMPLATE_B64
-        ),
-    )
-    out: list[dict] = []
-
-    async def _runner():
-        async for item in client.connect_and_stream():
-            if isinstance(item, dict):
-                out.append(_norm_trade(item, symbol))
-            elif isinstance(item, (bytes, bytearray)):
-                # minimal decoder (3=price f32, 4=qty varint, 6=ts varint, 5=side str, 7/8 buyer/seller str)
-                buf = bytes(item)
-                i = 0
-
-                def v():
-                    nonlocal i, buf
-                    x = 0
-                    s = 0
-                    while True:
-                        b = buf[i]
-                        i += 1
-                        x |= (b & 0x7F) << s
-                        if not (b & 0x80):
-                            break
-                        s += 7
-                    return x
-
-                def s():
-                    nonlocal i, buf
-                    ln = v()
-                    j = i + ln
-                    b = buf[i:j]
-                    i = j
-                    try:
-                        return b.decode("utf-8")
-                    except:
-                        return ""
-
-                def f32():
-                    nonlocal i, buf
-                    val = struct.unpack_from("<f", buf, i)[0]
-                    i += 4
-                    return float(val)
-
-                t = {}
-                while i < len(buf):
-                    tag = v()
-                    f = tag >> 3
-                    wt = tag & 7
-                    if wt == 0:
-                        val = v()
-                        if f == 4:
-                            t["qty"] = val
-                        if f == 6:
-                            t["ts"] = val
-                    elif wt == 2:
-                        val = s()
-                        if f == 1:
-                            t["symbol"] = val
-                        elif f == 2:
-                            t["trade_id"] = val
-                        elif f == 5:
-                            t["side"] = val
-                        elif f == 7:
-                            t["buyer"] = val
-                        elif f == 8:
-                            t["seller"] = val
-                    elif wt == 5:
-                        val = f32()
-                        if f == 3:
-                            t["price"] = val
-                    elif wt == 1:
-                        i += 8
-                    else:
-                        break
-                if t:
-                    out.append(_norm_trade(t, symbol))
-            if len(out) >= n:
-                break
-
-    try:
-        await asyncio.wait_for(_runner(), timeout=timeout)
-    except Exception:
-        pass
-    return out
-
-
 @app.get("/api/snapshot/depth.png")
 async def snapshot_depth(
+    request: Request,
     symbol: str,
     size: str = Query("mobile", pattern="^(mobile|square|wide)$"),
     scale: int = Query(2, ge=1, le=3),
+    fmt: str = Query("png", pattern="^(png|webp|jpeg)$"),
+    q: Optional[int] = Query(None, ge=0, le=100),
+    native: bool = Query(False),
 ):
-    sym = symbol.upper()
-
-    levels = await depth_hub.get_last(sym, timeout=1.0) or []
-    trades = await trade_hub.get_last(sym, limit=5) or []
-
-    # Basit quote (eldeki verilerden)
-    quote = {}
+    # fmt/q: çıktı biçimi ve kalitesi (PNG'de zlib seviyesi 0-9);
+    # native: supersampling yok, çıktı preset x scale çözünürlüğünde
     try:
-        last_price = (
-            float(trades[0]["price"])
-            if trades and trades[0].get("price") is not None
-            else None
+        _, img = await depth_snapshot(
+            symbol, size=size, scale=scale, fmt=fmt, quality=q, native=native
         )
-    except Exception:
-        last_price = None
-
-    # Not: Eğer market snapshot akıyorsa oradan da besleyebilirsin.
-    quote["last"] = last_price
-
-    # Volümü yaklaşık hesap: son 5'in toplamı
-    try:
-        vol = sum(int(t.get("qty") or 0) for t in trades) or None
-    except Exception:
-        vol = None
-    quote["volume"] = vol
-
-    # Önceki kapanış (işlem yoksa boş kalsın)
-    quote["prev_close"] = None
-
-    png = render_depth_png(
-        levels=levels, trades=trades, symbol=sym, quote=quote, size=size, scale=scale
-    )
-    return Response(content=png, media_type="image/png")
+    except PoolSaturated:
+        return Response(status_code=503, headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        return Response(status_code=504)
+    headers = img.headers()
+    if request.headers.get("if-none-match") == img.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=img.body, media_type=SNAPSHOT_FORMATS[fmt][1], headers=headers)
 
 
 # --- Admin ---
@@ -1259,6 +766,22 @@ def diag():
         "jwt_present": bool(jwt),
         "jwt_exp_unix": exp,
         "jwt_exp_human": _exp(exp) if exp else None,
+        "feeds": {
+            "depth": depth_feed.stats(),
+            "market": market_feed.stats(),
+            "trade": trade_feed.stats(),
+        },
+        "depth_hub": depth_hub.stats(),
+        "trade_hub": trade_hub.stats(),
+        "ingest": ingest.stats(),
+        "handshake": handshake_stats(),
+        "heatmap": _heatmap.stats(),
+        "snapshot_cache": snapshot_cache.stats(),
+        "render_pool": render_pool.stats(),
+        "snapshot_fetch": snapshot_fetch.stats(),
+        "heatmap_sectors": sector_agg.stats(),
+        "heatmap_broadcast": {v: b.stats() for v, b in _heatmap_views.items()},
+        "wire": wire.stats(),
     }
 
 
@@ -1725,28 +1248,36 @@ async def logo(symbol: str):
 
 @app.websocket("/ws/heatmap")
 async def ws_heatmap(ws: WebSocket):
-    await ws.accept()
+    fmt = await wire.accept(ws)
     cid = f"HEATMAP#{id(ws) & 0xFFFFFF:x}"
-    log.info("[%s]: client connected (HEATMAP)", cid)
+    # ?view=sectors: sektör satırları; ?sector=KOD: sektör üyeleri; varsayılan tüm evren
+    sector = (ws.query_params.get("sector") or "").strip().upper()
+    if sector:
+        view = f"sector:{sector}"
+    elif (ws.query_params.get("view") or "").lower() == "sectors":
+        view = "sectors"
+    else:
+        view = "all"
+    log.info("[%s]: client connected (HEATMAP %s)", cid, view)
 
-    async with _heatmap_clients_lock:
-        _heatmap_clients.add(ws)
+    # istemcinin kendi outbox'ı ve yazıcı görevi; meta + ilk durum da oradan gider
+    clients = _heatmap_view(view)
+    clients.add(ws, fmt)
+
+    def _resume_from(epoch, raw) -> Dict[str, Any]:
+        # ?epoch=e&since=v / {"op":"resume","epoch":e,"version":v}: v'den beri
+        # değişenler; epoch bu sürecinki değilse (yeniden başlatma) snapshot
+        try:
+            return _heatmap_since(view, int(epoch), int(raw))
+        except (TypeError, ValueError):
+            return _heatmap_snapshot(view)
 
     try:
         await _ensure_heatmap_tasks()
-        try:
-            await ws.send_json({"type": "meta", "symbols": list(HEATMAP_SYMBOLS)})
-        except WebSocketDisconnect:
-            return
-        except Exception:
-            log.exception("[%s]: failed to send heatmap meta", cid)
-        else:
-            try:
-                await _heatmap_send_snapshot(ws)
-            except WebSocketDisconnect:
-                return
-            except Exception:
-                log.exception("[%s]: failed to send initial heatmap snapshot", cid)
+        clients.send_to(ws, _heatmap_meta(view), key="meta")
+        clients.send_to(
+            ws, _resume_from(ws.query_params.get("epoch"), ws.query_params.get("since"))
+        )
 
         while True:
             try:
@@ -1760,38 +1291,36 @@ async def ws_heatmap(ws: WebSocket):
                 continue
             if msg.get("type") == "websocket.disconnect":
                 break
+            text = msg.get("text")
+            if text:
+                try:
+                    req = json.loads(text)
+                except Exception:
+                    continue
+                if isinstance(req, dict) and req.get("op") == "resume":
+                    clients.replace(ws, _resume_from(req.get("epoch"), req.get("version")))
     finally:
-        async with _heatmap_clients_lock:
-            _heatmap_clients.discard(ws)
+        clients.discard(ws)
+        if not clients and view != "all" and _heatmap_views.get(view) is clients:
+            del _heatmap_views[view]
         log.info("[%s]: client disconnected (HEATMAP)", cid)
 
 
 @app.websocket("/ws/market/{symbol}")
 async def ws_market(ws: WebSocket, symbol: str):
-    await ws.accept()
+    fmt = await wire.accept(ws)
     sym = (symbol or "").upper().strip()
     log.info("[MARKET#%s]: client connected", sym)
 
-    client = MatrixMarketClient(
-        symbol=sym,
-        connect_template_b64=getattr(settings, "MARKET_CONNECT_TEMPLATE_B64", "")
-        or settings.CONNECT_TEMPLATE_B64,
-    )
+    # Tüm market izleyicileri tek upstream oturumunu paylaşır
+    ingest.touch(sym)
+    queue = await market_feed.subscribe(sym)
     try:
-        async for payload in client.connect_and_stream():
-            try:
-                b64 = base64.b64encode(payload).decode("ascii")
-                await ws.send_text(b64)
-            except (
-                WebSocketDisconnect,
-                RuntimeError,
-            ):  # RuntimeError: close after close
-                break
-    except WebSocketDisconnect:
-        pass
+        await _forward_queue(ws, queue, fmt=fmt)
     except Exception:
         log.exception("[MARKET#%s]: market stream error", sym)
     finally:
+        await market_feed.unsubscribe(sym, queue)
         log.info("[MARKET#%s]: client disconnected", sym)
 
 
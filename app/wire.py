@@ -0,0 +1,218 @@
+# app/wire.py
+# -*- coding: utf-8 -*-
+"""
+İstemci WebSocket'leri için mesaj kodlaması.
+
+Varsayılan JSON'dur. İstemci ``mx.bin.v1`` alt protokolünü (subprotocol)
+isterse ya da URL'de ``?fmt=bin`` verirse, bilinen mesajlar sabit düzenli
+ikili (little-endian) çerçeve olarak gider; diğerleri (status, meta) yine
+JSON metindir. Çözücü: static/wire.js.
+
+Çerçeveler (ilk bayt tür; str8 = u8 uzunluk + UTF-8; None = NaN):
+  0x01 depth keyframe : str8 symbol, u32 version, u8 n, n x 6 f64
+                        (bid_order, bid_qty, bid_price, ask_price, ask_qty, ask_order)
+  0x02 depth yama     : str8 symbol, u32 version, u16 n, n x (u8 satır, u8 kolon, f64)
+  0x03 trade          : str8 symbol, str8 trade_id, f64 price, f64 qty, u8 side,
+                        f64 ts, str8 buyer, str8 seller
+  0x04 quote delta    : str8 symbol, u8 full, u8 n, n x (u8 alan, f64)
+                        (alan = market_parser.QUOTE_FIELDS sırası)
+  0x05 heatmap        : u8 tür (0 snapshot, 1 delta), u32 epoch, u32 version, u32 base,
+                        f64 ts, u16 n,
+                        n x (str8 symbol, f64 last, f64 prev_close, f64 change_pct, f64 updated_at)
+
+Mesajlar abone sayısından bağımsız olarak format başına bir kez kodlanır
+(kimlik bazlı küçük önbellek). Bu yüzden yayınlanan mesaj nesneleri
+değişmezdir: bir kez ``encode`` edilen dict sonradan değiştirilmez, yeni
+içerik için yeni nesne üretilir (bkz. market_feed._merge_quote).
+"""
+from __future__ import annotations
+
+import json
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+from starlette.websockets import WebSocket
+
+from .depth_diff import DEPTH_COLUMNS
+from .market_parser import QUOTE_FIELDS
+
+SUBPROTOCOL = "mx.bin.v1"
+JSON = "json"
+BINARY = "bin"
+
+T_DEPTH, T_PATCH, T_TRADE, T_QUOTE, T_HEATMAP = 1, 2, 3, 4, 5
+
+_NAN = float("nan")
+_QUOTE_IDX = {k: i for i, k in enumerate(QUOTE_FIELDS)}
+
+_ROW = struct.Struct("<6d")
+_CELL = struct.Struct("<BBd")
+_QCELL = struct.Struct("<Bd")
+_TILE = struct.Struct("<4d")
+_U32U8 = struct.Struct("<IB")
+_U32U16 = struct.Struct("<IH")
+_F64 = struct.Struct("<d")
+_F64x2 = struct.Struct("<dd")
+_HM_HEAD = struct.Struct("<BBIIIdH")
+
+_CACHE_MAX = 512
+_cache: "OrderedDict[Tuple[int, str], Tuple[Any, Union[str, bytes]]]" = OrderedDict()
+_stats = {"encodes": 0, "hits": 0, "encode_ns": 0}
+
+
+def negotiate(ws: WebSocket) -> str:
+    """İstemcinin istediği format (alt protokol öncelikli, sonra ?fmt=)."""
+    if SUBPROTOCOL in (ws.scope.get("subprotocols") or ()):
+        return BINARY
+    return BINARY if ws.query_params.get("fmt") == BINARY else JSON
+
+
+async def accept(ws: WebSocket) -> str:
+    """Bağlantıyı kabul eder; istenmişse alt protokolü onaylar. Formatı döner."""
+    fmt = negotiate(ws)
+    offered = SUBPROTOCOL in (ws.scope.get("subprotocols") or ())
+    await ws.accept(subprotocol=SUBPROTOCOL if offered else None)
+    return fmt
+
+
+def _num(v) -> float:
+    return _NAN if v is None else float(v)
+
+
+def _str8(s) -> bytes:
+    b = str(s or "").encode("utf-8")[:255]
+    return bytes((len(b),)) + b
+
+
+def _depth(msg: Dict[str, Any]) -> bytes:
+    levels = msg["levels"]
+    parts = [bytes((T_DEPTH,)), _str8(msg.get("symbol")), _U32U8.pack(msg.get("version") or 0, len(levels))]
+    pack = _ROW.pack
+    for r in levels:
+        parts.append(pack(*[_num(r.get(c)) for c in DEPTH_COLUMNS]))
+    return b"".join(parts)
+
+
+def _patch(msg: Dict[str, Any]) -> bytes:
+    patch = msg["patch"]
+    parts = [bytes((T_PATCH,)), _str8(msg.get("symbol")), _U32U16.pack(msg.get("version") or 0, len(patch))]
+    pack = _CELL.pack
+    for i, c, v in patch:
+        parts.append(pack(i, c, _num(v)))
+    return b"".join(parts)
+
+
+def _trade(msg: Dict[str, Any]) -> bytes:
+    t = msg["trade"]
+    side = t.get("side") or ""
+    return b"".join(
+        (
+            bytes((T_TRADE,)),
+            _str8(msg.get("symbol") or t.get("symbol")),
+            _str8(t.get("trade_id")),
+            _F64x2.pack(_num(t.get("price")), _num(t.get("qty"))),
+            bytes((ord(side[0]) if side else 0,)),
+            _F64.pack(_num(t.get("ts"))),
+            _str8(t.get("buyer")),
+            _str8(t.get("seller")),
+        )
+    )
+
+
+def _quote(msg: Dict[str, Any]) -> bytes:
+    q = msg["quote"]
+    cells = [(_QUOTE_IDX[k], v) for k, v in q.items() if k in _QUOTE_IDX and v is not None]
+    parts = [bytes((T_QUOTE,)), _str8(msg.get("symbol")), bytes((1 if msg.get("full") else 0, len(cells)))]
+    pack = _QCELL.pack
+    for i, v in cells:
+        parts.append(pack(i, float(v)))
+    return b"".join(parts)
+
+
+def _heatmap(msg: Dict[str, Any]) -> bytes:
+    quotes = msg["quotes"]
+    delta = msg.get("type") == "delta"
+    parts = [
+        _HM_HEAD.pack(
+            T_HEATMAP,
+            1 if delta else 0,
+            msg.get("epoch") or 0,
+            msg.get("version") or 0,
+            (msg.get("base") or 0) if delta else 0,
+            _num(msg.get("ts")),
+            len(quotes),
+        )
+    ]
+    pack = _TILE.pack
+    for q in quotes:
+        parts.append(_str8(q.get("symbol")))
+        parts.append(
+            pack(_num(q.get("last")), _num(q.get("prev_close")), _num(q.get("change_pct")), _num(q.get("updated_at")))
+        )
+    return b"".join(parts)
+
+
+def _binary(msg: Any) -> Optional[bytes]:
+    if not isinstance(msg, dict):
+        return None
+    if "levels" in msg:
+        return _depth(msg)
+    if "patch" in msg:
+        return _patch(msg)
+    if "trade" in msg:
+        return _trade(msg)
+    if "quote" in msg:
+        return _quote(msg)
+    if msg.get("type") in ("snapshot", "delta"):
+        return _heatmap(msg)
+    return None
+
+
+def encode(msg: Any, fmt: str = JSON) -> Union[str, bytes]:
+    """
+    Mesajı istenen formata kodlar; aynı mesaj nesnesi için sonuç paylaşılır.
+    Önbellek ``id(msg)`` ile anahtarlanır ve içeriğe bakmaz: ``msg`` (ve içindeki
+    dict/listeler) ilk kodlamadan sonra değiştirilmemelidir, yoksa eski çerçeve
+    gider. Değişiklik gerekiyorsa kopya üzerinde yapın.
+    """
+    if isinstance(msg, (str, bytes)):
+        return msg
+    key = (id(msg), fmt)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] is msg:
+        _stats["hits"] += 1
+        return hit[1]
+    t0 = time.perf_counter_ns()
+    data = _binary(msg) if fmt == BINARY else None
+    if data is None:
+        data = json.dumps(msg, separators=(",", ":"), ensure_ascii=False)
+    _stats["encode_ns"] += time.perf_counter_ns() - t0
+    _stats["encodes"] += 1
+    # mesaj referansı tutulur: id() yeniden kullanılamaz
+    _cache[key] = (msg, data)
+    if len(_cache) > _CACHE_MAX:
+        _cache.popitem(last=False)
+    return data
+
+
+async def send_frame(ws: WebSocket, data: Union[str, bytes]) -> None:
+    """Önceden kodlanmış çerçeveyi yazar (bytes -> ikili, str -> metin)."""
+    if isinstance(data, bytes):
+        await ws.send_bytes(data)
+    else:
+        await ws.send_text(data)
+
+
+async def send(ws: WebSocket, msg: Any, fmt: str = JSON) -> None:
+    await send_frame(ws, encode(msg, fmt))
+
+
+def stats() -> Dict[str, Any]:
+    n = _stats["encodes"]
+    return {
+        "encodes": n,
+        "cache_hits": _stats["hits"],
+        "encode_us_avg": round(_stats["encode_ns"] / n / 1000, 2) if n else None,
+    }
@@ -5,6 +5,9 @@ from app.bot import setup_webhook_app, on_startup, on_shutdown
 from app.logging_setup import *  # noqa
 from app.depth_proxy import token_manager
 from app.auto_jwt_refresher import AutoJWTRefresher
+from app.ingest import ingest
+from app.render_pool import render_pool
+from app.snapshot_fetch import snapshot_fetch
 
 # YENİ: sembol doğrulama router'ı
 from app.routers import symbols as symbols_router
@@ -19,11 +22,16 @@ _refresher = AutoJWTRefresher(token_manager)
 @fastapi_app.on_event("startup")
 async def _startup():
     _refresher.start()
+    await ingest.start()
+    render_pool.start()
     await on_startup()
 
 @fastapi_app.on_event("shutdown")
 async def _shutdown():
     await _refresher.stop()
+    await ingest.stop()
+    await snapshot_fetch.stop()
+    render_pool.stop()
     await on_shutdown()
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MQTT çözücü benchmark'ı: eski frame-başına ayrıştırıcı vs MqttStreamDecoder.
+
+Kullanım:
+    python -m scripts.bench_mqtt_codec [--packets 200000] [--payload 180]
+
+Üç senaryo ölçülür (paket/saniye):
+  - single : her WS frame'inde tek PUBLISH
+  - batch  : her frame'de 16 PUBLISH
+  - split  : paketler frame sınırında bölünmüş (eski yol bunları kaybeder)
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.mqtt_codec import MqttStreamDecoder  # noqa: E402
+
+
+# ---- eski yol (proxy'lerdeki _iter_publish_payloads kopyası) ----
+def _legacy_read_vlq(buf, i):
+    m = 1
+    val = 0
+    n = 0
+    L = len(buf)
+    while True:
+        if i + n >= L:
+            raise ValueError("VLQ out of range")
+        b = buf[i + n]
+        n += 1
+        val += (b & 0x7F) * m
+        if (b & 0x80) == 0:
+            break
+        m *= 128
+        if m > (128**3):
+            raise ValueError("VLQ too large")
+    return val, n
+
+
+def legacy_iter(data: bytes):
+    i = 0
+    L = len(data)
+    while i < L:
+        if i + 2 > L:
+            break
+        fixed = data[i]
+        i += 1
+        try:
+            rem_len, n_vlq = _legacy_read_vlq(data, i)
+        except Exception:
+            return
+        i += n_vlq
+        if i + rem_len > L:
+            break
+        packet = data[i : i + rem_len]
+        i += rem_len
+        if (fixed >> 4) & 0x0F != 0x03:
+            continue
+        tlen = int.from_bytes(packet[0:2], "big")
+        topic_b = packet[2 : 2 + tlen]
+        j = 2 + tlen
+        if (fixed >> 1) & 0x03:
+            j += 2
+        yield topic_b.decode("utf-8", "ignore"), packet[j:]
+
+
+# ---- veri ----
+def _enc_vlq(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        d = n % 128
+        n //= 128
+        if n:
+            d |= 0x80
+        out.append(d)
+        if not n:
+            return bytes(out)
+
+
+def _publish(topic: str, payload: bytes) -> bytes:
+    tb = topic.encode()
+    body = len(tb).to_bytes(2, "big") + tb + payload
+    return b"\x30" + _enc_vlq(len(body)) + body
+
+
+def build_frames(n: int, payload_len: int, per_frame: int, split: bool):
+    syms = ["THYAO", "GARAN", "AKBNK", "ASELS", "SISE", "KCHOL", "EREGL", "BIMAS"]
+    payload = bytes(range(256)) * (payload_len // 256 + 1)
+    pkts = [
+        _publish(f"mx/trade/{syms[k % len(syms)]}@lvl2", payload[:payload_len])
+        for k in range(n)
+    ]
+    frames = [b"".join(pkts[k : k + per_frame]) for k in range(0, n, per_frame)]
+    if split:
+        stream = b"".join(frames)
+        step = max(16, len(pkts[0]) * per_frame // 2 + 7)
+        frames = [stream[k : k + step] for k in range(0, len(stream), step)]
+    return frames
+
+
+def run(name: str, frames, fn) -> float:
+    t0 = time.perf_counter()
+    count = fn(frames)
+    dt = time.perf_counter() - t0
+    rate = count / dt if dt else 0.0
+    print(f"  {name:<8} {count:>9d} pkt  {dt * 1000:8.1f} ms  {rate:12,.0f} pkt/s")
+    return rate
+
+
+def _legacy(frames) -> int:
+    n = 0
+    for fr in frames:
+        for _t, _p in legacy_iter(fr):
+            n += 1
+    return n
+
+
+def _codec(frames) -> int:
+    dec = MqttStreamDecoder()
+    n = 0
+    for fr in frames:
+        for _t, _p in dec.feed(fr):
+            n += 1
+    return n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packets", type=int, default=200_000)
+    ap.add_argument("--payload", type=int, default=180)
+    args = ap.parse_args()
+
+    cases = [("single", 1, False), ("batch", 16, False), ("split", 4, True)]
+    for label, per_frame, split in cases:
+        frames = build_frames(args.packets, args.payload, per_frame, split)
+        print(f"[{label}] frames={len(frames)} payload={args.payload}B")
+        before = run("before", frames, _legacy)
+        after = run("after", frames, _codec)
+        if before:
+            print(f"  speedup  x{after / before:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kota güncelleme benchmark'ı: eski dict-of-dicts QuoteHub vs QuoteTable.
+
+Kullanım:
+    python -m scripts.bench_quote_table [--n 200000] [--symbols 500]
+
+Senaryolar (ns/tick):
+  - locked : eski heatmap yolu (await get + dict kopyası + merge + await set)
+  - dict   : kilitsiz dict kopyası + merge (önceki senkron merge)
+  - table  : QuoteTable.merge (yerinde kolon güncellemesi)
+ve yayın başına okuma: snapshot() ile tüm haritanın kopyası vs dirty
+bitlerden yalnızca değişen satırların kolon okuması (her okumadan önce bir tick).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.market_parser import change_pct  # noqa: E402
+from app.quote_hub import QuoteTable, mask  # noqa: E402
+
+
+# ---- eski yol (QuoteHub kopyası) ----
+class LegacyHub:
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+        self._q = {}
+
+    async def get(self, symbol):
+        async with self._lock:
+            return self._q.get(symbol)
+
+    async def set(self, symbol, q):
+        async with self._lock:
+            self._q[symbol] = q
+
+    async def snapshot(self):
+        async with self._lock:
+            return dict(self._q)
+
+    def merge(self, symbol, decoded):
+        existing = self._q.get(symbol)
+        merged = dict(existing) if existing else {"symbol": symbol}
+        changed = {}
+        for key, value in decoded.items():
+            if value is not None and merged.get(key) != value:
+                merged[key] = value
+                changed[key] = value
+        if not changed:
+            return changed
+        if "last" in changed or "prev_close" in changed:
+            pct = change_pct(merged.get("last"), merged.get("prev_close"))
+            if pct is not None and pct != merged.get("change_pct"):
+                merged["change_pct"] = pct
+                changed["change_pct"] = pct
+        merged["updated_at"] = int(time.time() * 1000)
+        self._q[symbol] = merged
+        return changed
+
+
+async def legacy_locked(hub: LegacyHub, ticks) -> None:
+    for sym, d in ticks:
+        cur = dict(await hub.get(sym) or {"symbol": sym})
+        for k, v in d.items():
+            cur[k] = v
+        cur["change_pct"] = change_pct(cur.get("last"), cur.get("prev_close"))
+        await hub.set(sym, cur)
+
+
+# ---- veri ----
+def make_ticks(n: int, n_sym: int):
+    syms = [f"S{k:04d}" for k in range(n_sym)]
+    out = []
+    for k in range(n):
+        px = 100.0 + (k % 97) * 0.05
+        d = {"last": px, "volume": float(1000 + k)}
+        if k % 5 == 0:
+            d["prev_close"] = 99.5
+            d["bid"] = 99.5
+        out.append((syms[k % n_sym], d))
+    return syms, out
+
+
+def run(name: str, n: int, fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"  {name:<9} {dt * 1e9 / n:8.0f} ns/op  {n / dt:12,.0f} op/s")
+    return dt
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--symbols", type=int, default=500)
+    args = ap.parse_args()
+    n = args.n
+    syms, ticks = make_ticks(n, args.symbols)
+
+    print(f"[quote merge] n={n} symbols={args.symbols}")
+    locked_hub = LegacyHub()
+    locked = run("locked", n, lambda: asyncio.run(legacy_locked(locked_hub, ticks)))
+    dict_hub = LegacyHub()
+    run("dict", n, lambda: [dict_hub.merge(s, d) for s, d in ticks])
+    bits = mask("last", "prev_close", "change_pct")
+    table = QuoteTable()
+    table.track(bits)
+    for s in syms:
+        table.intern(s)
+    after = run("table", n, lambda: [table.merge(s, d) for s, d in ticks])
+    print(f"  speedup vs locked x{locked / after:.2f}")
+
+    reads = 2000
+    table.take_dirty(bits)
+    print(f"[broadcast read] reads={reads}")
+
+    async def snapshots() -> None:
+        for _ in range(reads):
+            await dict_hub.snapshot()
+
+    run("snapshot", reads, lambda: asyncio.run(snapshots()))
+
+    def table_reads() -> None:
+        last = table.column("last")
+        for _ in range(reads):
+            table.merge(syms[_ % len(syms)], {"last": float(_)})
+            for i in table.take_dirty(bits):
+                last[i]
+
+    run("dirty", reads, table_reads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot kodlama benchmark'ı: preset başına çizim + kodlama süresi ve bayt.
+
+Kullanım:
+    python -m scripts.bench_snapshot_encode [--n 5] [--presets mobile,wide]
+
+Modlar:
+  - x2         : scale=2 çizim + LANCZOS küçültme (eski varsayılan)
+  - native1    : scale=1, küçültme yok (en hızlı)
+  - native2    : scale=2, küçültme yok (çıktı 2x çözünürlük)
+Kodlamalar: png-opt (eski optimize=True), png-1, png-3, webp-80, jpeg-85.
+Çizim süresi modu başına bir kez, kodlama süresi kodlama başına ölçülür
+(n tekrarın medyanı); taban katmanlar önceden ısıtılır.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.snapshot import _PRESETS, draw_depth, encode_image, warm  # noqa: E402
+
+MODES = (("x2", 2, False), ("native1", 1, True), ("native2", 2, True))
+
+
+def _png_optimize(img) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+ENCODINGS = (
+    ("png-opt", _png_optimize),
+    ("png-1", lambda img: encode_image(img, "png", 1)),
+    ("png-3", lambda img: encode_image(img, "png", 3)),
+    ("webp-80", lambda img: encode_image(img, "webp", 80)),
+    ("jpeg-85", lambda img: encode_image(img, "jpeg", 85)),
+)
+
+
+def sample_data():
+    levels = [
+        {
+            "bid_price": 100.0 - k * 0.05,
+            "bid_qty": 12_000 + k * 731,
+            "bid_order": 10 + k,
+            "ask_price": 100.05 + k * 0.05,
+            "ask_qty": 9_500 + k * 517,
+            "ask_order": 8 + k,
+        }
+        for k in range(10)
+    ]
+    now = int(time.time() * 1000)
+    trades = [
+        {
+            "ts": now - k * 1500,
+            "price": 100.0 + (k % 3) * 0.05,
+            "qty": 250 * (k + 1),
+            "buyer": "GAR",
+            "seller": "YKB",
+            "side": "b" if k % 2 else "s",
+        }
+        for k in range(5)
+    ]
+    quote = {"last": 100.05, "prev_close": 98.4, "high": 101.2, "low": 97.9, "volume": 1_234_567}
+    return levels, trades, quote
+
+
+def timed(n: int, fn):
+    out, ms = None, []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        out = fn()
+        ms.append((time.perf_counter() - t0) * 1000)
+    return out, statistics.median(ms)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=5)
+    ap.add_argument("--presets", default=",".join(_PRESETS))
+    args = ap.parse_args()
+    presets = [p for p in args.presets.split(",") if p in _PRESETS]
+    levels, trades, quote = sample_data()
+    warm(presets, scales=(1, 2))
+
+    for size in presets:
+        print(f"[{size}]")
+        print(f"  {'mode':<8} {'enc':<8} {'pixels':>10} {'draw ms':>8} {'enc ms':>8} {'total':>8} {'KB':>8}")
+        for mode, scale, native in MODES:
+            img, draw_ms = timed(
+                args.n,
+                lambda: draw_depth(levels, trades, "ASTOR", quote=quote, size=size, scale=scale, native=native),
+            )
+            dims = f"{img.width}x{img.height}"
+            for enc, fn in ENCODINGS:
+                body, enc_ms = timed(args.n, lambda: fn(img))
+                print(
+                    f"  {mode:<8} {enc:<8} {dims:>10} {draw_ms:8.1f} {enc_ms:8.1f} "
+                    f"{draw_ms + enc_ms:8.1f} {len(body) / 1024:8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
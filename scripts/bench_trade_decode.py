@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trade payload decoder mikro-benchmark'ı (mesaj başına maliyet).
+
+Kullanım:
+    python -m scripts.bench_trade_decode [--n 200000]
+
+  before : eski el yazımı decoder (trade_feed._mini_decode, bytes kopyası ile)
+  after  : trade_parser.decode_trade (MQTT decoder'dan gelen memoryview)
+  batch  : trade_parser.decode_trade_frame (frame başına tek çağrı, 16 PUBLISH; MQTT çerçeveleme dahil)
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.mqtt_codec import MqttStreamDecoder  # noqa: E402
+from app.trade_parser import decode_trade, decode_trade_frame  # noqa: E402
+from scripts.bench_mqtt_codec import _publish  # noqa: E402
+
+
+# ---- eski yol ----
+def _legacy_varint(buf, i):
+    x = 0
+    s = 0
+    while True:
+        b = buf[i]
+        i += 1
+        x |= (b & 0x7F) << s
+        if not (b & 0x80):
+            break
+        s += 7
+    return x, i
+
+
+def legacy_decode(u8: bytes) -> dict:
+    out = {}
+    i = 0
+    L = len(u8)
+    while i < L:
+        tag, i = _legacy_varint(u8, i)
+        f, wt = tag >> 3, tag & 7
+        if wt == 0:
+            v, i = _legacy_varint(u8, i)
+            if f == 4:
+                out["qty"] = v
+            elif f == 6:
+                out["ts"] = v
+        elif wt == 2:
+            ln, i = _legacy_varint(u8, i)
+            raw = u8[i : i + ln]
+            i += ln
+            try:
+                s = raw.decode("utf-8")
+            except Exception:
+                s = ""
+            if f == 1:
+                out["symbol"] = s
+            elif f == 2:
+                out["trade_id"] = s
+            elif f == 5:
+                out["side"] = s
+            elif f == 7:
+                out["buyer"] = s
+            elif f == 8:
+                out["seller"] = s
+        elif wt == 5:
+            v = struct.unpack_from("<f", u8, i)[0]
+            i += 4
+            if f == 3:
+                out["price"] = float(v)
+        elif wt == 1:
+            i += 8
+        else:
+            break
+    return out
+
+
+# ---- veri ----
+def _vi(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        d = n & 0x7F
+        n >>= 7
+        out.append(d | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def _s(field: int, v: str) -> bytes:
+    b = v.encode()
+    return bytes([(field << 3) | 2]) + _vi(len(b)) + b
+
+
+def sample_trade(k: int) -> bytes:
+    return (
+        _s(1, "THYAO")
+        + _s(2, f"T{100000 + k}")
+        + bytes([(3 << 3) | 5]) + struct.pack("<f", 312.25)
+        + bytes([4 << 3]) + _vi(1500 + k % 700)
+        + _s(5, "b" if k & 1 else "a")
+        + bytes([6 << 3]) + _vi(1_760_000_000_000 + k)
+        + _s(7, "GARAN")
+        + _s(8, "AKBNK")
+    )
+
+
+def run(name: str, n: int, fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"  {name:<7} {dt * 1e9 / n:8.0f} ns/msg  {n / dt:12,.0f} msg/s")
+    return dt
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    args = ap.parse_args()
+    n = args.n
+
+    payloads = [sample_trade(k) for k in range(1024)]
+    assert legacy_decode(payloads[3]) == decode_trade(memoryview(payloads[3]))
+    views = [memoryview(p) for p in payloads]
+    reps = [payloads[k & 1023] for k in range(n)]
+    mvs = [views[k & 1023] for k in range(n)]
+
+    pkts = [_publish("mx/trade/THYAO@lvl2", p) for p in payloads]
+    frames = [b"".join(pkts[(k * 16 + j) & 1023] for j in range(16)) for k in range(n // 16)]
+
+    print(f"[trade decode] n={n}")
+    before = run("before", n, lambda: [legacy_decode(bytes(p)) for p in mvs])
+    after = run("after", n, lambda: [decode_trade(p) for p in mvs])
+    dec = MqttStreamDecoder()
+    batch = run("batch", len(frames) * 16, lambda: [decode_trade_frame(dec, f) for f in frames])
+    run("bytes", n, lambda: [decode_trade(p) for p in reps])
+    print(f"  speedup x{before / after:.2f} (batch incl. MQTT framing: {n / batch:,.0f} msg/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+from app.depth_diff import DEPTH_COLUMNS, MAX_PATCH_CELLS, diff_books
+from app.depth_parser import DEPTH_LEVELS, DepthBook
+
+_BID_PRICE = DEPTH_COLUMNS.index("bid_price")
+_BID_QTY = DEPTH_COLUMNS.index("bid_qty")
+_ASK_PRICE = DEPTH_COLUMNS.index("ask_price")
+
+
+def _book(bids, asks) -> DepthBook:
+    """bids/asks: [(fiyat, adet, emir)], en iyi kademe başta."""
+    b = DepthBook()
+    b.bid_price = array("d", (p for p, _, _ in bids))
+    b.bid_qty = array("q", (q for _, q, _ in bids))
+    b.bid_orders = array("q", (o for _, _, o in bids))
+    b.ask_price = array("d", (p for p, _, _ in asks))
+    b.ask_qty = array("q", (q for _, q, _ in asks))
+    b.ask_orders = array("q", (o for _, _, o in asks))
+    return b
+
+
+def test_same_book_gives_empty_patch():
+    a = _book([(10.0, 100, 2)], [(10.1, 50, 1)])
+    assert diff_books(a, _book([(10.0, 100, 2)], [(10.1, 50, 1)])) == []
+
+
+def test_changed_cell():
+    a = _book([(10.0, 100, 2)], [(10.1, 50, 1)])
+    b = _book([(10.0, 150, 2)], [(10.1, 50, 1)])
+    assert diff_books(a, b) == [[0, _BID_QTY, 150]]
+
+
+def test_level_added():
+    a = _book([(10.0, 100, 2)], [(10.1, 50, 1)])
+    b = _book([(10.0, 100, 2), (9.9, 40, 1)], [(10.1, 50, 1)])
+    patch = diff_books(a, b)
+    assert sorted(patch) == sorted(
+        [[1, DEPTH_COLUMNS.index("bid_order"), 1], [1, _BID_QTY, 40], [1, _BID_PRICE, 9.9]]
+    )
+
+
+def test_level_removed_sends_none():
+    a = _book([(10.0, 100, 2)], [(10.1, 50, 1), (10.2, 70, 3)])
+    b = _book([(10.0, 100, 2)], [(10.1, 50, 1)])
+    patch = diff_books(a, b)
+    assert [1, _ASK_PRICE, None] in patch
+    assert all(row == 1 and v is None for row, _, v in patch)
+    assert len(patch) == 3
+
+
+def test_large_change_falls_back_to_keyframe():
+    n = DEPTH_LEVELS
+    a = _book([(10.0 - i / 10, 100, 1) for i in range(n)], [(10.1 + i / 10, 100, 1) for i in range(n)])
+    # tüm kademeler kaydı: MAX_PATCH_CELLS aşılır
+    b = _book([(20.0 - i / 10, 200, 2) for i in range(n)], [(20.1 + i / 10, 200, 2) for i in range(n)])
+    assert n * len(DEPTH_COLUMNS) > MAX_PATCH_CELLS
+    assert diff_books(a, b) is None
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from array import array
+
+from app.depth_feed import DepthFeed
+from app.depth_hub import hub as depth_hub
+from app.depth_parser import DepthBook
+
+
+class _Feed(DepthFeed):
+    # upstream açılmaz
+    async def _start(self, symbol: str) -> None:
+        pass
+
+    async def _stop(self, symbol: str) -> None:
+        pass
+
+
+def _book(qty: int) -> DepthBook:
+    b = DepthBook()
+    b.bid_price, b.bid_qty, b.bid_orders = array("d", [10.0]), array("q", [qty]), array("q", [1])
+    b.ask_price, b.ask_qty, b.ask_orders = array("d", [10.1]), array("q", [qty]), array("q", [1])
+    return b
+
+
+def test_patch_overflow_resyncs_to_keyframe():
+    async def run():
+        sym = "TSTOVF"
+        feed = _Feed()
+        depth_hub.put(sym, _book(1))
+        q = await feed.subscribe(sym)
+        assert "levels" in await q.get()  # ilk boyama: keyframe
+
+        # okunmayan yama zinciri sınırı aşar
+        for qty in range(2, 2 + feed._queue_size + 1):
+            entry = depth_hub.put(sym, _book(qty))
+            feed.publish(sym, {"symbol": sym, "version": entry.version, "patch": [[0, 1, qty]]}, keep_last=False)
+
+        assert q.qsize() == 1
+        assert q.dropped == feed._queue_size
+        msg = await q.get()
+        assert "patch" not in msg
+        assert msg["version"] == depth_hub.version(sym)
+        assert msg["levels"][0]["bid_qty"] == 2 + feed._queue_size
+        await feed.unsubscribe(sym, q)
+
+    asyncio.run(run())
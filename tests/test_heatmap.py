@@ -0,0 +1,24 @@
+from app.heatmap import HeatmapTracker
+from app.sector_agg import SectorAggregator
+
+
+def test_since_other_epoch_sends_snapshot():
+    t = HeatmapTracker(["AAA", "BBB"])
+    assert t.since(t.epoch, t.version)["type"] == "delta"
+    # yeniden başlamış sunucu: aynı sürüm numarası başka bir sayaca ait
+    other = (t.epoch + 1) & 0xFFFFFFFF
+    msg = t.since(other, t.version)
+    assert msg["type"] == "snapshot"
+    assert msg["epoch"] == t.epoch
+    assert t.since(None, t.version)["type"] == "snapshot"
+
+
+def test_sector_since_other_epoch_sends_snapshot():
+    agg = SectorAggregator()
+    agg.load({"XU": ("Endeks", ("AAA",))})
+    assert agg.since(agg.epoch, agg.version).get("base") == agg.version
+    assert "base" not in agg.since(agg.epoch ^ 1, agg.version)
+
+
+def test_instances_get_distinct_epochs():
+    assert len({HeatmapTracker([]).epoch for _ in range(8)}) > 1
@@ -0,0 +1,36 @@
+import asyncio
+
+from app.ingest import IngestService
+
+
+class _Feed:
+    name = "fake"
+
+    def __init__(self):
+        self.refs = {}
+
+    async def acquire(self, sym):
+        await asyncio.sleep(0)
+        self.refs[sym] = self.refs.get(sym, 0) + 1
+
+    async def release(self, sym):
+        self.refs[sym] -= 1
+
+
+def test_touch_tasks_are_tracked_until_done():
+    async def main():
+        feed = _Feed()
+        svc = IngestService(watchlist=[], feeds=[], promote_max=1, promote_ttl=60)
+        svc.feeds = [feed]
+        await svc.start()
+        svc.touch("AAA")
+        assert len(svc._tasks) == 1
+        svc.touch("BBB")  # AAA LRU'dan düşer
+        await asyncio.gather(*svc._tasks)
+        await asyncio.sleep(0)
+        assert not svc._tasks
+        assert feed.refs == {"AAA": 0, "BBB": 1}
+        await svc.stop()
+        assert feed.refs == {"AAA": 0, "BBB": 0}
+
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import struct
+
+import pytest
+
+from app.market_parser import QUOTE_FIELDS, change_pct, decode_market_quote
+from app.quote_hub import QuoteTable
+
+
+def _vi(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        d = n & 0x7F
+        n >>= 7
+        out.append(d | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def _f64(field: int, v: float) -> bytes:
+    return _vi((field << 3) | 1) + struct.pack("<d", v)
+
+
+def _u(field: int, v: int) -> bytes:
+    return _vi(field << 3) + _vi(v)
+
+
+def _raw_snapshot() -> bytes:
+    """Elle kurulmuş RawSnapshot: birincil alanı eksik olanlarda yedek alanlar."""
+    return (
+        _vi((1 << 3) | 2) + _vi(5) + b"ASELS"  # string alan atlanır
+        + _f64(5, 11.0)      # last
+        + _f64(25, 99.0)     # last yedeği: 5 varken kullanılmaz
+        + _f64(42, 10.0)     # bid (10 yok)
+        + _f64(6, 11.05)     # ask
+        + _f64(54, 11.5)     # high (8, 13 yok)
+        + _f64(12, 10.5)     # low
+        + _f64(21, 12.1)     # ceiling (26 yok)
+        + _f64(27, 9.0)      # floor
+        + _u(14, 123456)     # volume (varint)
+        + _f64(81, 1.5e6)    # turnover (15, 38, 80 yok)
+        + _f64(28, 7.0)      # turnover'ın daha düşük öncelikli yedeği
+        + _vi((3 << 3) | 5) + b"\x00\x00\x00\x00"  # fixed32 atlanır
+        + _f64(47, 10.9)     # best_bid son yedek
+        + _f64(62, 10.95)    # best_bid (9 yok; 62, 47'den önce)
+    )
+
+
+def test_field_mapping_uses_pick_priority():
+    q = decode_market_quote(memoryview(_raw_snapshot()))
+    assert q == {
+        "last": 11.0,
+        "bid": 10.0,
+        "ask": 11.05,
+        "high": 11.5,
+        "low": 10.5,
+        "ceiling": 12.1,
+        "floor": 9.0,
+        "volume": 123456.0,
+        "turnover": 1.5e6,
+        "best_bid": 10.95,
+        "prev_close": 10.0,  # bizim kural: önceki = bid
+    }
+    assert set(q) - {"prev_close"} <= set(QUOTE_FIELDS)
+
+
+def test_primary_field_wins_and_missing_fields_absent():
+    q = decode_market_quote(_f64(25, 5.0) + _f64(5, 6.0) + _f64(9, 4.0) + _f64(47, 3.0))
+    assert q == {"last": 6.0, "best_bid": 4.0}
+
+
+def test_change_pct():
+    assert change_pct(11.0, 10.0) == pytest.approx(10.0)
+    assert change_pct(9.0, 10.0) == pytest.approx(-10.0)
+    assert change_pct(None, 10.0) is None
+    assert change_pct(11.0, 0.0) is None and change_pct(11.0, None) is None
+
+    t = QuoteTable()
+    changed = t.merge("ASELS", decode_market_quote(_raw_snapshot()))
+    assert changed["change_pct"] == pytest.approx(10.0)
+
+
+def test_truncated_payload_raises():
+    with pytest.raises(ValueError):
+        decode_market_quote(_f64(5, 1.0)[:-3])
+    with pytest.raises(ValueError):
+        decode_market_quote(b"\x28")  # varint değeri yok
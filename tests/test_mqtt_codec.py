@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from app.connect_builder import _enc_vlq
+from app.mqtt_codec import MqttStreamDecoder
+
+
+def _publish(topic: str, payload: bytes, qos: int = 0) -> bytes:
+    t = topic.encode()
+    body = len(t).to_bytes(2, "big") + t + (b"\x00\x01" if qos else b"") + payload
+    return bytes([0x30 | (qos << 1)]) + _enc_vlq(len(body)) + body
+
+
+def _feed(dec, frame):
+    return [(t, bytes(p)) for t, p in dec.feed(frame)]
+
+
+def test_multiple_packets_in_one_frame():
+    dec = MqttStreamDecoder()
+    frame = _publish("mx/a", b"1") + _publish("mx/b", b"22", qos=1)
+    assert _feed(dec, frame) == [("mx/a", b"1"), ("mx/b", b"22")]
+    assert dec.pending == 0 and dec.publishes == 2
+
+
+def test_packet_split_across_frames():
+    dec = MqttStreamDecoder()
+    pkt = _publish("mx/depth/ASELS@lvl2", b"x" * 300)  # 2 baytlık uzunluk
+    assert _feed(dec, pkt[:50]) == []
+    assert dec.pending == 50
+    assert _feed(dec, pkt[50:] + _publish("mx/a", b"z")) == [
+        ("mx/depth/ASELS@lvl2", b"x" * 300),
+        ("mx/a", b"z"),
+    ]
+    assert dec.pending == 0 and dec.reassembled == 1
+
+
+def test_split_inside_remaining_length():
+    dec = MqttStreamDecoder()
+    pkt = _publish("mx/a", b"y" * 200)
+    assert pkt[1] & 0x80  # VLQ iki bayt
+    assert _feed(dec, pkt[:2]) == []  # ilk VLQ baytından sonra kesildi
+    assert _feed(dec, pkt[2:]) == [("mx/a", b"y" * 200)]
+
+
+def test_control_packets_dispatched():
+    got = []
+    dec = MqttStreamDecoder(on_connack=got.append, on_suback=got.append)
+    assert _feed(dec, b"\x20\x02\x00\x00" + b"\x90\x03\x12\x34\x00") == []
+    assert got == [0, 0x1234]
+
+
+def test_overlong_vlq_resyncs():
+    dec = MqttStreamDecoder()
+    assert _feed(dec, b"\x30\xff\xff\xff\xff\x01") == []
+    assert dec.resyncs == 1 and dec.pending == 0
+    assert _feed(dec, _publish("mx/a", b"ok")) == [("mx/a", b"ok")]
+
+
+def test_oversized_length_is_not_buffered():
+    dec = MqttStreamDecoder(max_packet=1024)
+    assert _feed(dec, b"\x30" + _enc_vlq(10_000) + b"junk") == []
+    assert dec.resyncs == 1 and dec.pending == 0
+    assert _feed(dec, _publish("mx/a", b"ok")) == [("mx/a", b"ok")]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from app.mqtt_codec import MqttStreamDecoder
+from app.mqtt_handshake import PREAMBLE, MqttHandshake
+from app.mqtt_session import MatrixSession
+
+
+class _Session(MatrixSession):
+    kind = "test"
+
+    def _topic(self, symbol: str) -> str:
+        return f"mx/t/{symbol}"
+
+
+class _FakeWs:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send(self, b: bytes) -> None:
+        await asyncio.sleep(0)  # her gönderimde diğer görevlere sıra ver
+        self.sent.append(bytes(b))
+
+
+def _session() -> _Session:
+    return _Session("wss://test", b"", None, on_publish=lambda t, p: None)
+
+
+def test_begin_burst_not_interleaved_by_concurrent_add():
+    async def run():
+        s = _session()
+        await s.add(["AAA"])  # bağlı değilken: bağlanınca toplu abone olunur
+        ws = _FakeWs()
+        hs = MqttHandshake(s.kind, MqttStreamDecoder(), 10.0)
+        connect = b"\x10\x05CONN!"
+        await asyncio.gather(s._begin(ws, hs, connect), s.add(["BBB"]))
+        return ws.sent
+
+    sent = asyncio.run(run())
+    assert sent[0] == PREAMBLE
+    assert sent[1] == b"\x10\x05CONN!"
+    assert sent[2][0] == 0x82 and b"mx/t/AAA" in sent[2]
+    assert sent[3][0] == 0x82 and b"mx/t/BBB" in sent[3]
+    assert len(sent) == 4
+
+
+def test_add_during_burst_is_sent_after_it():
+    async def run():
+        s = _session()
+        ws = _FakeWs()
+        hs = MqttHandshake(s.kind, MqttStreamDecoder(), 10.0)
+
+        async def late_add():
+            await asyncio.sleep(0)
+            await s.add(["CCC"])
+
+        await asyncio.gather(s._begin(ws, hs, b"\x10\x00"), late_add())
+        return ws.sent
+
+    sent = asyncio.run(run())
+    assert sent[:2] == [PREAMBLE, b"\x10\x00"]
+    assert sent[2][0] == 0x82 and b"mx/t/CCC" in sent[2]
+
+
+def test_connect_template_read_per_connection(monkeypatch):
+    from app.config import settings
+    from app.depth_proxy import MatrixDepthSession
+
+    monkeypatch.setattr(settings, "CONNECT_TEMPLATE_B64", "AAE=")
+    s = MatrixDepthSession(on_publish=lambda t, p: None)
+    assert s._connect_template() == b"\x00\x01"
+    # /admin/connect-template yalnızca settings'i günceller; sonraki bağlantı görür
+    monkeypatch.setattr(settings, "CONNECT_TEMPLATE_B64", "AAI=")
+    assert s._connect_template() == b"\x00\x02"
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.quote_hub import QuoteTable, mask
+
+
+def test_merge_returns_only_changed_fields_and_bumps_version():
+    t = QuoteTable()
+    changed = t.merge("ASELS", {"last": 11.0, "prev_close": 10.0, "volume": 100, "high": None})
+    assert changed == {"last": 11.0, "prev_close": 10.0, "volume": 100, "change_pct": pytest.approx(10.0)}
+    rid = t.id_of("ASELS")
+    assert t.version == 1 and t.row_version[rid] == 1
+
+    # aynı değerler: değişiklik yok, sürüm sabit
+    assert t.merge("ASELS", {"last": 11.0, "volume": 100}) == {}
+    assert t.version == 1
+
+    # yalnızca hacim: change_pct yeniden hesaplanmaz
+    assert t.merge("ASELS", {"last": 11.0, "volume": 150}) == {"volume": 150}
+    assert t.version == 2 and t.row_version[rid] == 2
+
+    t.merge("GARAN", {"last": 5.0})
+    assert t.version == 3
+    assert t.row_version[rid] == 2 and t.row_version[t.id_of("GARAN")] == 3
+
+    row = t.peek("ASELS")
+    assert row["last"] == 11.0 and row.get("bid") is None and row["symbol"] == "ASELS"
+    assert row.get("updated_at") > 0
+
+
+def test_dirty_bits_only_for_tracked_columns():
+    t = QuoteTable()
+    bits = mask("last", "change_pct")
+    t.track(bits)
+    t.merge("A", {"volume": 1})
+    t.merge("B", {"last": 2.0})
+    assert t.dirty_count(bits) == 1
+    assert [t.symbol(i) for i in t.take_dirty(bits)] == ["B"]
+    assert t.take_dirty(bits) == [] and t.dirty_count(bits) == 0
+
+    t.merge("A", {"last": 3.0, "prev_close": 2.0})
+    assert t.dirty[t.id_of("A")] == bits  # prev_close izlenmiyor
+    assert [t.symbol(i) for i in t.take_dirty(mask("change_pct"))] == ["A"]
+    # last biti alınmadı: hâlâ bekliyor
+    assert [t.symbol(i) for i in t.take_dirty(mask("last"))] == ["A"]
+
+
+def test_listeners_get_changed_fields():
+    t = QuoteTable()
+    seen = []
+    t.listen(lambda sym, changed, row: seen.append((sym, dict(changed), row["last"])))
+    t.merge("A", {"last": 1.0})
+    t.merge("A", {"last": 1.0})
+    assert seen == [("A", {"last": 1.0}, 1.0)]
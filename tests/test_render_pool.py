@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import render_pool as rp
+
+
+def _slow_job(kwargs):
+    time.sleep(kwargs["sleep"])
+    return b"img", kwargs["sleep"] * 1000
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes(monkeypatch):
+    monkeypatch.setattr(rp, "_render_job", _slow_job)
+
+    async def run():
+        pool = rp.RenderPool(workers=1, queue_max=1, timeout=0.05)
+        pool._pool = ThreadPoolExecutor(1)  # spawn yerine thread: test hızlı kalsın
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.render(sleep=0.3)
+        assert pool.stats()["inflight"] == 1
+        with pytest.raises(rp.PoolSaturated):  # worker hâlâ meşgul
+            await pool.render(sleep=0.0)
+        await asyncio.sleep(0.4)
+        assert pool.stats()["inflight"] == 0
+        assert await pool.render(sleep=0.0) == b"img"
+        assert pool.stats()["inflight"] == 0
+        pool._pool.shutdown(wait=True)
+
+    asyncio.run(run())
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from app.session_pool import SessionPool
+
+
+class _FakeSession:
+    connected = True
+
+    def __init__(self, on_publish) -> None:
+        self.on_publish = on_publish
+        self.topics = set()
+
+    def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def add(self, symbols):
+        self.topics.update(symbols)
+
+    async def remove(self, symbols):
+        self.topics.difference_update(symbols)
+
+
+def _pool(max_topics: int, got: list) -> SessionPool:
+    return SessionPool(
+        "test",
+        factory=_FakeSession,
+        on_publish=lambda sym, topic, payload: got.append((sym, bytes(payload))),
+        max_topics=max_topics,
+        rebalance_sec=3600,
+    )
+
+
+def test_pending_migration_counts_toward_max_topics():
+    async def run():
+        p = _pool(2, [])
+        for s in ("A", "B", "C"):
+            await p.add(s)
+        hot, cold = p._shards  # hot: A, B; cold: C
+        p._rate.update({"A": 10.0, "B": 1.0, "C": 0.0})
+        moved = await p.rebalance()
+        assert p._pending[moved] is cold
+        # cold: 1 sembol + 1 bekleyen geçiş = dolu; yeni sembol yeni shard açar
+        await p.add("D")
+        assert p._owner["D"] not in (hot, cold)
+        assert len(p._shards) == 3
+        if p._rebalance_task:
+            p._rebalance_task.cancel()
+
+    asyncio.run(run())
+
+
+def test_migration_hands_over_on_first_target_publish():
+    async def run():
+        got = []
+        p = _pool(2, got)
+        for s in ("A", "B", "C"):
+            await p.add(s)
+        hot, cold = p._shards
+        p._rate.update({"A": 10.0, "B": 1.0, "C": 0.0})
+        sym = await p.rebalance()
+        hot.session.on_publish(f"mx/t/{sym}", memoryview(b"src"))
+        cold.session.on_publish(f"mx/t/{sym}", memoryview(b"dst"))
+        hot.session.on_publish(f"mx/t/{sym}", memoryview(b"late"))  # artık sahip değil
+        await asyncio.gather(*p._tasks)
+        assert got == [(sym, b"src"), (sym, b"dst")]
+        assert p._owner[sym] is cold and sym not in hot.session.topics
+        if p._rebalance_task:
+            p._rebalance_task.cancel()
+
+    asyncio.run(run())
+
+
+def test_trade_feed_drops_replayed_trade_ids():
+    from app.trade_feed import TradeFeed
+
+    f = TradeFeed()
+    assert not f._seen("ASELS", "t1")
+    assert f._seen("ASELS", "t1")
+    assert not f._seen("ASELS", "")  # trade_id yoksa ayıklanmaz
+    assert not f._seen("ASELS", "")
+    assert not f._seen("THYAO", "t1")
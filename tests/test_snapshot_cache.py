@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from app.snapshot_cache import SnapshotCache
+
+
+class _Renderer:
+    def __init__(self, body: bytes = b"png", delay: float = 0.01) -> None:
+        self.body = body
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.body
+
+
+def test_concurrent_requests_share_one_render():
+    async def run():
+        c = SnapshotCache(ttl=10)
+        r = _Renderer()
+        out = await asyncio.gather(*(c.get(("ASELS", 1), r) for _ in range(5)))
+        assert r.calls == 1
+        assert all(e is out[0] for e in out)
+        assert (await c.get(("ASELS", 1), r)) is out[0]  # cache'ten
+        st = c.stats()
+        assert (st["misses"], st["joined"], st["hits"], st["inflight"]) == (1, 4, 1, 0)
+
+    asyncio.run(run())
+
+
+def test_render_error_reaches_all_waiters_and_is_not_cached():
+    async def run():
+        c = SnapshotCache(ttl=10)
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("render failed")
+
+        res = await asyncio.gather(*(c.get("k", boom) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(e, RuntimeError) for e in res)
+        r = _Renderer()
+        await c.get("k", r)
+        assert r.calls == 1
+
+    asyncio.run(run())
+
+
+def test_entries_expire_after_ttl():
+    async def run():
+        c = SnapshotCache(ttl=0.05)
+        r = _Renderer(delay=0)
+        await c.get("k", r)
+        await c.get("k", r)
+        assert r.calls == 1
+        await asyncio.sleep(0.08)
+        await c.get("k", r)
+        assert r.calls == 2
+
+    asyncio.run(run())
+
+
+def test_etag_follows_content():
+    async def run():
+        c = SnapshotCache(ttl=10)
+        a = await c.get(1, _Renderer(b"aaa", 0))
+        b = await c.get(2, _Renderer(b"bbb", 0))
+        a2 = await c.get(3, _Renderer(b"aaa", 0))
+        assert a.etag != b.etag
+        assert a.etag == a2.etag
+        assert a.etag.startswith('"') and a.etag.endswith('"')
+        h = a.headers(max_age=5)
+        assert h["ETag"] == a.etag and h["Cache-Control"] == "private, max-age=5"
+        assert h["Last-Modified"].endswith("GMT")
+
+    asyncio.run(run())
+
+
+def test_lru_eviction_by_byte_budget():
+    async def run():
+        c = SnapshotCache(ttl=10, max_bytes=10)
+        await c.get("a", _Renderer(b"x" * 4, 0))
+        await c.get("b", _Renderer(b"x" * 4, 0))
+        await c.get("a", _Renderer())  # a en son kullanılan
+        await c.get("c", _Renderer(b"x" * 4, 0))  # b atılır
+        assert list(c._entries) == ["a", "c"]
+        assert c.stats()["bytes"] == 8 and c.stats()["evicted"] == 1
+
+        big = await c.get("big", _Renderer(b"x" * 11, 0))  # bütçeden büyük: saklanmaz
+        assert big.body == b"x" * 11 and "big" not in c._entries
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from app.snapshot_fetch import SnapshotFetcher
+from app.symbol_feed import SymbolFeed
+
+
+class _Feed(SymbolFeed):
+    def __init__(self, name: str, fail: bool = False) -> None:
+        super().__init__()
+        self.name = name
+        self.fail = fail
+        self.starts = 0
+        self.stops = 0
+
+    async def _start(self, symbol: str) -> None:
+        self.starts += 1
+        if self.fail:
+            raise ConnectionError("upstream down")
+
+    async def _stop(self, symbol: str) -> None:
+        self.stops += 1
+
+
+def test_shared_fetch_times_out_on_silent_feed_and_releases_on_stop():
+    async def run():
+        fast, silent = _Feed("fast"), _Feed("silent")
+        f = SnapshotFetcher(feeds=[fast, silent], timeout=0.05, linger=60)
+
+        async def publish_soon():
+            await asyncio.sleep(0.01)
+            fast.publish("ASELS", {"v": 1})
+
+        asyncio.create_task(publish_soon())
+        res = await asyncio.gather(f.fetch("asels"), f.fetch("ASELS"), f.fetch("ASELS"))
+        assert res == [{"fast": True, "silent": False}] * 3
+        st = f.stats()
+        assert (st["fetches"], st["acquisitions"], st["joined"], st["timeouts"]) == (3, 1, 2, 1)
+        # akışlar linger süresince açık; geçici abonelikler kapandı
+        assert fast._refs == {"ASELS": 1} and silent._refs == {"ASELS": 1}
+        assert not fast.has_subscribers("ASELS") and not silent.has_subscribers("ASELS")
+
+        # tutulan sembolde ikinci toplama beklemez
+        assert await f.fetch("ASELS") == {"fast": True, "silent": False}
+        assert f.stats()["timeouts"] == 1 and fast.starts == 1
+
+        await f.stop()
+        assert fast._refs == {} and silent._refs == {}
+        assert fast.stops == 1 and silent.stops == 1
+        assert f.stats()["held"] == []
+
+    asyncio.run(run())
+
+
+def test_linger_expiry_releases_refs():
+    async def run():
+        feed = _Feed("depth")
+        feed.publish("ASELS", {"v": 1})
+        f = SnapshotFetcher(feeds=[feed], timeout=0.05, linger=0.05)
+        assert await f.fetch("ASELS") == {"depth": True}
+        assert feed._refs == {"ASELS": 1}
+        await asyncio.sleep(0.1)
+        assert feed._refs == {} and feed.stops == 1
+        assert not f._tasks and f.stats()["held"] == []
+
+    asyncio.run(run())
+
+
+def test_failed_start_is_not_released():
+    async def run():
+        ok, bad = _Feed("ok"), _Feed("bad", fail=True)
+        f = SnapshotFetcher(feeds=[ok, bad], timeout=0.02, linger=60)
+        assert await f.fetch("ASELS") == {"ok": False, "bad": False}
+        assert bad._refs == {}
+        await f.stop()
+        assert ok.stops == 1 and bad.stops == 0
+
+    asyncio.run(run())
+
+
+def test_max_symbols_closes_oldest():
+    async def run():
+        feed = _Feed("depth")
+        f = SnapshotFetcher(feeds=[feed], timeout=0.01, linger=60, max_symbols=2)
+        for sym in ("A", "B", "C"):
+            await f.fetch(sym)
+        assert f.stats()["held"] == ["B", "C"]
+        assert set(feed._refs) == {"B", "C"}
+        await f.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from app.symbol_feed import SymbolFeed
+
+
+class _Feed(SymbolFeed):
+    name = "test"
+
+    def __init__(self, fail: int = 0) -> None:
+        super().__init__()
+        self.fail = fail
+        self.starts = 0
+        self.stops = 0
+
+    async def _start(self, symbol: str) -> None:
+        self.starts += 1
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("upstream down")
+
+    async def _stop(self, symbol: str) -> None:
+        self.stops += 1
+
+
+def test_failed_start_rolls_back_ref_and_retries():
+    async def run():
+        f = _Feed(fail=1)
+        with pytest.raises(ConnectionError):
+            await f.subscribe("asels")
+        assert f._refs == {}
+        assert not f.has_subscribers("ASELS")
+
+        q = await f.subscribe("asels")  # ikinci deneme upstream'i yeniden açar
+        assert f._refs == {"ASELS": 1}
+        assert f.starts == 2
+        await f.unsubscribe("asels", q)
+        assert f._refs == {} and f.stops == 1
+
+    asyncio.run(run())
+
+
+def test_refcount_starts_and_stops_once():
+    async def run():
+        f = _Feed()
+        await f.acquire("X")
+        await f.acquire("X")
+        await f.release("X")
+        assert f.stops == 0
+        await f.release("X")
+        assert (f.starts, f.stops) == (1, 1)
+
+    asyncio.run(run())
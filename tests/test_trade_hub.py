@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from app.trade_hub import TradeHub, TradeRing, _Brokers, _DAY_MS
+
+# 2026-10-16 12:00 (UTC+3) civarı
+T0 = 1_760_605_200_000
+
+
+def _ring(size: int = 4) -> TradeRing:
+    return TradeRing(_Brokers(), size)
+
+
+def _t(k: int, ts: int, price: float = 10.0, qty: int = 1, side: str = "b") -> dict:
+    return {"trade_id": f"T{k}", "price": price, "qty": qty, "ts": ts, "side": side,
+            "buyer": "GARAN", "seller": "AKBNK"}
+
+
+def test_wraparound_keeps_last_n_newest_first():
+    r = _ring(4)
+    for k in range(6):
+        r.add(_t(k, T0 + k))
+    assert r.n == 4
+    assert [x["trade_id"] for x in r.last_n("X", 10)] == ["T5", "T4", "T3", "T2"]
+    assert [x["trade_id"] for x in r.last_n("X", 2)] == ["T5", "T4"]
+    row = r.last_n("X", 1)[0]
+    assert row["symbol"] == "X" and row["buyer"] == "GARAN" and row["side"] == "b"
+    # halka dolsa da gün toplamı tüm işlemleri sayar
+    assert r.count == 6 and r.version == 6
+
+
+def test_since_and_window_boundaries():
+    r = _ring(8)
+    for k in range(5):
+        r.add(_t(k, T0 + k * 1000, price=10.0 + k, qty=k + 1, side="b" if k % 2 else "a"))
+    # since_ms dahil
+    assert [x["trade_id"] for x in r.since("X", T0 + 3000)] == ["T4", "T3"]
+    assert [x["trade_id"] for x in r.since("X", T0 + 3001)] == ["T4"]
+    assert r.since("X", T0 + 5000) == []
+    assert len(r.since("X", 0, limit=2)) == 2
+
+    w = r.window(T0 + 3000)
+    assert w["count"] == 2 and w["volume"] == 4 + 5
+    assert w["turnover"] == pytest.approx(13.0 * 4 + 14.0 * 5)
+    assert w["vwap"] == pytest.approx((13.0 * 4 + 14.0 * 5) / 9)
+    assert w["buy_volume"] == 4 and w["sell_volume"] == 5
+    assert r.window(T0 + 10_000) == {
+        "count": 0, "volume": 0, "turnover": 0.0, "vwap": None, "buy_volume": 0, "sell_volume": 0,
+    }
+
+
+def test_daily_aggregates():
+    r = _ring()
+    r.add(_t(1, T0, price=10.0, qty=100, side="b"))
+    r.add(_t(2, T0 + 1, price=12.0, qty=50, side="a"))
+    r.add(_t(3, T0 + 2, price=9.0, qty=50, side="s"))
+    r.add(_t(4, T0 + 3, price=11.0, qty=0, side=""))
+    a = r.aggregates()
+    assert a["count"] == 4 and a["volume"] == 200
+    assert a["turnover"] == pytest.approx(1000 + 600 + 450)
+    assert a["vwap"] == pytest.approx(2050 / 200)
+    assert a["buy_volume"] == 100 and a["sell_volume"] == 100
+    assert (a["open"], a["high"], a["low"], a["last"]) == (10.0, 12.0, 9.0, 11.0)
+
+
+def test_day_rollover_resets_totals():
+    r = _ring()
+    r.add(_t(1, T0, price=10.0, qty=5))
+    r.add(_t(2, T0 + _DAY_MS, price=20.0, qty=3))
+    a = r.aggregates()
+    assert a["count"] == 1 and a["volume"] == 3
+    assert a["open"] == a["high"] == a["low"] == a["last"] == 20.0
+    # halka günler arası kaydı tutar
+    assert [x["trade_id"] for x in r.last_n("X", 5)] == ["T2", "T1"]
+
+
+def test_late_previous_day_trade_is_excluded_from_totals():
+    r = _ring()
+    r.add(_t(1, T0 + _DAY_MS, price=20.0, qty=3))
+    r.add(_t(2, T0, price=99.0, qty=1000))
+    a = r.aggregates()
+    assert a["count"] == 1 and a["volume"] == 3 and a["high"] == 20.0
+    assert r.last_n("X", 1)[0]["trade_id"] == "T2"
+
+
+def test_missing_ts_uses_arrival_time():
+    now = int(time.time() * 1000)
+    r = _ring()
+    r.add(_t(1, now, qty=2))
+    r.add(_t(2, 0, qty=3))  # zamansız: önceki gün sayılmamalı
+    assert r.aggregates()["volume"] == 5
+    assert r.last_n("X", 1)[0]["ts"] >= now
+
+    r2 = _ring()
+    r2.add({"trade_id": "T1", "price": 5.0, "qty": 1})  # ilk işlem zamansız
+    r2.add(_t(2, now, qty=1))
+    assert r2.aggregates()["count"] == 2
+
+
+def test_hub_queries():
+    async def run():
+        hub = TradeHub(size=8)
+        assert await hub.get_since("X", 0) == [] and hub.window("X", 0) is None
+        assert hub.aggregates("X") is None and hub.version("X") == 0
+        for k in range(3):
+            await hub.add("X", _t(k, T0 + k * 1000, qty=1))
+        assert [x["trade_id"] for x in await hub.get_since("X", T0 + 1000)] == ["T2", "T1"]
+        assert hub.window("X", T0 + 1000)["count"] == 2
+        assert [x["trade_id"] for x in await hub.get_last("X", 1)] == ["T2"]
+        assert hub.aggregates("X")["count"] == 3 and hub.version("X") == 3
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import struct
+
+from app.mqtt_codec import MqttStreamDecoder
+from app.trade_parser import decode_trade, decode_trade_frame, decode_trades
+from app.trade_proxy import MatrixTradeSession
+from tests.test_mqtt_codec import _publish
+
+
+def _s(field: int, v: str) -> bytes:
+    b = v.encode()
+    return bytes([(field << 3) | 2, len(b)]) + b
+
+
+def _trade(trade_id: str, qty: int) -> bytes:
+    return (
+        _s(1, "ASELS")
+        + _s(2, trade_id)
+        + bytes([(3 << 3) | 5]) + struct.pack("<f", 12.5)
+        + bytes([4 << 3, qty])
+        + _s(5, "b")
+    )
+
+
+_BAD = b"\x20"  # varint alanı yarım
+
+
+def test_decode_trade_fields():
+    t = decode_trade(memoryview(_trade("T1", 7)))
+    assert t == {"symbol": "ASELS", "trade_id": "T1", "price": 12.5, "qty": 7, "side": "b"}
+
+
+def test_decode_trades_skips_bad_payloads():
+    out = decode_trades([_trade("T1", 1), _BAD, _trade("T2", 2)])
+    assert [t["trade_id"] for t in out] == ["T1", "T2"]
+
+
+def test_decode_trade_frame_decodes_every_publish():
+    errors = []
+    frame = (
+        _publish("mx/trade/ASELS@lvl2", _trade("T1", 1))
+        + _publish("mx/trade/ASELS@lvl2", _BAD)
+        + _publish("mx/trade/GARAN@lvl2", _trade("T2", 2))
+    )
+    out = decode_trade_frame(MqttStreamDecoder(), frame, lambda: errors.append(1))
+    assert [(topic, t["trade_id"]) for topic, t in out] == [
+        ("mx/trade/ASELS@lvl2", "T1"),
+        ("mx/trade/GARAN@lvl2", "T2"),
+    ]
+    assert errors == [1]
+
+
+def test_trade_session_hands_decoded_trades_to_on_publish():
+    async def run():
+        got, errors = [], []
+        s = MatrixTradeSession(
+            on_publish=lambda topic, t: got.append((topic, t["qty"])),
+            connect_template_b64="EAA=",
+            on_decode_error=lambda: errors.append(1),
+        )
+        await s._dispatch(
+            _publish("mx/trade/ASELS@lvl2", _trade("T1", 3)) + _publish("mx/trade/ASELS@lvl2", _BAD)
+        )
+        assert got == [("mx/trade/ASELS@lvl2", 3)]
+        assert errors == [1]
+
+    asyncio.run(run())
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+import struct
+
+from app import wire
+from app.market_parser import QUOTE_FIELDS
+
+
+class _Reader:
+    """static/wire.js reader() ile aynı okuma sırası."""
+
+    def __init__(self, data: bytes) -> None:
+        self.b = data
+        self.i = 0
+
+    def _take(self, fmt: str):
+        v = struct.unpack_from(fmt, self.b, self.i)
+        self.i += struct.calcsize(fmt)
+        return v[0] if len(v) == 1 else v
+
+    def u8(self):
+        return self._take("<B")
+
+    def u16(self):
+        return self._take("<H")
+
+    def u32(self):
+        return self._take("<I")
+
+    def f64(self):
+        return self._take("<d")
+
+    def str(self):
+        n = self.u8()
+        s = self.b[self.i : self.i + n].decode()
+        self.i += n
+        return s
+
+    def done(self) -> bool:
+        return self.i == len(self.b)
+
+
+def _bin(msg) -> _Reader:
+    data = wire.encode(msg, wire.BINARY)
+    assert isinstance(data, bytes)
+    return _Reader(data)
+
+
+def test_depth_keyframe_layout():
+    levels = [
+        {"bid_order": 3, "bid_qty": 100, "bid_price": 10.0, "ask_price": 10.1, "ask_qty": 50, "ask_order": 1},
+        {"bid_order": None, "bid_qty": None, "bid_price": None, "ask_price": 10.2, "ask_qty": 7, "ask_order": 2},
+    ]
+    r = _bin({"symbol": "ASELS", "version": 42, "levels": levels})
+    assert r.u8() == wire.T_DEPTH and r.str() == "ASELS"
+    assert r.u32() == 42 and r.u8() == 2
+    assert [r.f64() for _ in range(6)] == [3, 100, 10.0, 10.1, 50, 1]
+    row2 = [r.f64() for _ in range(6)]
+    assert all(math.isnan(v) for v in row2[:3]) and row2[3:] == [10.2, 7, 2]
+    assert r.done()
+
+
+def test_depth_patch_layout():
+    r = _bin({"symbol": "ASELS", "version": 7, "patch": [[0, 1, 150], [9, 5, None]]})
+    assert r.u8() == wire.T_PATCH and r.str() == "ASELS"
+    assert r.u32() == 7 and r.u16() == 2
+    assert (r.u8(), r.u8(), r.f64()) == (0, 1, 150.0)
+    row, col, v = r.u8(), r.u8(), r.f64()
+    assert (row, col) == (9, 5) and math.isnan(v)
+    assert r.done()
+
+
+def test_trade_layout():
+    t = {"symbol": "ASELS", "trade_id": "T1", "price": 12.5, "qty": 300, "side": "b",
+         "ts": 1_760_000_000_000, "buyer": "GARAN", "seller": "AKBNK"}
+    r = _bin({"symbol": "ASELS", "trade": t})
+    assert r.u8() == wire.T_TRADE
+    assert (r.str(), r.str()) == ("ASELS", "T1")
+    assert (r.f64(), r.f64()) == (12.5, 300.0)
+    assert chr(r.u8()) == "b" and r.f64() == 1_760_000_000_000
+    assert (r.str(), r.str()) == ("GARAN", "AKBNK")
+    assert r.done()
+
+
+def test_quote_layout_uses_quote_fields_index():
+    r = _bin({"symbol": "ASELS", "quote": {"last": 11.0, "change_pct": 1.5, "bid": None, "x": 1}, "full": True})
+    assert r.u8() == wire.T_QUOTE and r.str() == "ASELS"
+    assert r.u8() == 1 and r.u8() == 2  # full, n (None / bilinmeyen alan yok)
+    cells = {QUOTE_FIELDS[r.u8()]: r.f64() for _ in range(2)}
+    assert cells == {"last": 11.0, "change_pct": 1.5}
+    assert r.done()
+
+
+def test_heatmap_layout():
+    q = {"symbol": "ASELS", "last": 11.0, "prev_close": 10.0, "change_pct": 10.0, "updated_at": 1000}
+    r = _bin({"type": "delta", "epoch": 0xDEADBEEF, "version": 5, "base": 4, "ts": 2000, "quotes": [q]})
+    assert r.u8() == wire.T_HEATMAP and r.u8() == 1
+    assert (r.u32(), r.u32(), r.u32()) == (0xDEADBEEF, 5, 4)
+    assert r.f64() == 2000 and r.u16() == 1
+    assert r.str() == "ASELS"
+    assert [r.f64() for _ in range(4)] == [11.0, 10.0, 10.0, 1000]
+    assert r.done()
+
+    snap = _bin({"type": "snapshot", "epoch": 1, "version": 5, "base": 4, "ts": 0, "quotes": []})
+    assert snap.u8() == wire.T_HEATMAP and snap.u8() == 0
+    assert (snap.u32(), snap.u32(), snap.u32()) == (1, 5, 0)  # snapshot'ta base yok
+
+
+def test_other_messages_stay_json():
+    msg = {"status": "connected", "symbol": "ASELS"}
+    assert json.loads(wire.encode(msg, wire.BINARY)) == msg
+    assert json.loads(wire.encode({"symbol": "A", "trade": {"price": 1}})) == {"symbol": "A", "trade": {"price": 1}}
+
+
+def test_encode_cache_is_per_object():
+    msg = {"symbol": "A", "quote": {"last": 1.0}}
+    a = wire.encode(msg, wire.BINARY)
+    assert wire.encode(msg, wire.BINARY) is a
+    # eşit içerikli yeni nesne ayrı kodlanır (sonuç aynı)
+    b = wire.encode({"symbol": "A", "quote": {"last": 1.0}}, wire.BINARY)
+    assert b == a